@@ -0,0 +1,192 @@
+from __future__ import division, print_function, unicode_literals
+from bisect import bisect_left
+from itertools import islice
+
+
+class HTLSFontIndex:
+	"""
+	Name, category, subcategory and case of every glyph in a font, gathered in a single pass
+	and kept up to date incrementally.
+	"""
+
+	def __init__(self, font, categories):
+		self.font = font
+		self.categories = categories
+
+		# key: glyph name, value: (category, subcategory, case)
+		self.glyphs = {}
+		# key: glyph id, value: glyph name, used to detect renamed glyphs
+		self.names_by_id = {}
+		# key: glyph id, value: lastChange of the glyph when it was read, used to detect changed glyphs
+		self.last_changes = {}
+		# key: category, value: list of subcategories in order of first appearance
+		self.sub_categories = {}
+		# glyph names in font order, as keys so that removing one does not scan all of them
+		self.names = {}
+		# list of the names, built on first request
+		self.names_list = None
+
+		# search indexes over the glyph names, built on first search
+		self.sorted_names = None
+		self.trigrams = None
+		# key: (category, subcategory, case), value: list of glyph names, built on first request
+		self.glyph_groups = None
+
+		self.rebuild()
+
+	def __contains__(self, glyph_name):
+		return glyph_name in self.glyphs
+
+	def __len__(self):
+		return len(self.glyphs)
+
+	def rebuild(self):
+		self.glyphs = {}
+		self.names_by_id = {}
+		self.last_changes = {}
+		self.sub_categories = {category: [] for category in self.categories}
+		self.names = {}
+		self.names_list = None
+		self.sorted_names = None
+		self.trigrams = None
+		self.glyph_groups = None
+
+		for glyph in self.font.glyphs:
+			self.add_glyph(glyph)
+
+	def info(self, glyph_name):
+		return self.glyphs.get(glyph_name)
+
+	def name_list(self):
+		if self.names_list is None:
+			self.names_list = list(self.names)
+		return self.names_list
+
+	def add_glyph(self, glyph):
+		name = glyph.name
+		if not name:
+			return
+		if name not in self.glyphs:
+			self.names[name] = None
+			self.names_list = None
+			self.sorted_names = None
+			self.trigrams = None
+		self.glyphs[name] = (glyph.category, glyph.subCategory, glyph.case)
+		self.glyph_groups = None
+		self.names_by_id[glyph.id] = name
+		self.last_changes[glyph.id] = glyph.lastChange
+		self.add_sub_category(glyph.category, glyph.subCategory)
+
+	def add_sub_category(self, category, sub_category):
+		if category in self.sub_categories and sub_category and sub_category not in self.sub_categories[category]:
+			self.sub_categories[category].append(sub_category)
+
+	def rebuild_sub_categories(self):
+		# subcategories whose glyphs were removed or recategorised are dropped
+		self.sub_categories = {category: [] for category in self.categories}
+		for name in self.names:
+			category, sub_category, case = self.glyphs[name]
+			self.add_sub_category(category, sub_category)
+
+	def remove_glyph(self, glyph_name):
+		if glyph_name not in self.glyphs:
+			return
+		del self.glyphs[glyph_name]
+		del self.names[glyph_name]
+		self.names_list = None
+		self.sorted_names = None
+		self.trigrams = None
+		self.glyph_groups = None
+
+	def update_glyph(self, glyph):
+		"""Re-read a single glyph, returns True if anything changed."""
+		old_name = self.names_by_id.get(glyph.id)
+		# the old name stays if another glyph has taken it, that glyph is re-read as well
+		if old_name and old_name != glyph.name and not self.font.glyphs[old_name]:
+			self.remove_glyph(old_name)
+		old_info = self.glyphs.get(glyph.name)
+		self.add_glyph(glyph)
+		return old_name != glyph.name or old_info != self.glyphs.get(glyph.name)
+
+	def refresh(self, full=False):
+		"""
+		Re-read the glyphs that were renamed or changed since they were last read, found by their name and lastChange,
+		and drop the glyphs that were removed. With full, every glyph is re-read, for changes that may not touch
+		lastChange, like Update Glyph Info. Returns True if anything changed.
+		"""
+		changed = False
+		glyph_ids = set()
+		for glyph in self.font.glyphs:
+			glyph_ids.add(glyph.id)
+			if full or self.names_by_id.get(glyph.id) != glyph.name \
+				or self.last_changes.get(glyph.id) != glyph.lastChange:
+				if self.update_glyph(glyph):
+					changed = True
+
+		for glyph_id in [glyph_id for glyph_id in self.names_by_id if glyph_id not in glyph_ids]:
+			glyph_name = self.names_by_id.pop(glyph_id)
+			del self.last_changes[glyph_id]
+			# another glyph may have taken the name in the meantime
+			if not self.font.glyphs[glyph_name]:
+				self.remove_glyph(glyph_name)
+			changed = True
+
+		if changed:
+			self.rebuild_sub_categories()
+		return changed
+
+	def refresh_glyphs(self, glyphs):
+		"""Re-read only the given glyphs, for example the selected ones. Returns True if anything changed."""
+		changed = False
+		for glyph in glyphs:
+			if self.update_glyph(glyph):
+				changed = True
+		if changed:
+			self.rebuild_sub_categories()
+		return changed
+
+	def groups(self):
+		if self.glyph_groups is None:
+			self.glyph_groups = {}
+			for name in self.names:
+				self.glyph_groups.setdefault(self.glyphs[name], []).append(name)
+		return self.glyph_groups
+
+	def prefix_matches(self, prefix):
+		if self.sorted_names is None:
+			self.sorted_names = sorted(self.names)
+		start = bisect_left(self.sorted_names, prefix)
+		# every name starting with the prefix sorts before the prefix followed by the highest code point
+		end = bisect_left(self.sorted_names, prefix + "\U0010ffff", start)
+		return self.sorted_names[start:end]
+
+	def substring_matches(self, text):
+		if len(text) < 3:
+			# too short for the trigrams, the names are only read as far as they are needed
+			return (name for name in self.names if text in name)
+
+		if self.trigrams is None:
+			self.trigrams = {}
+			for name in self.names:
+				for i in range(len(name) - 2):
+					self.trigrams.setdefault(name[i:i + 3], set()).add(name)
+
+		candidates = None
+		for i in range(len(text) - 2):
+			names = self.trigrams.get(text[i:i + 3])
+			if not names:
+				return []
+			candidates = names if candidates is None else candidates & names
+		return sorted(name for name in candidates if text in name)
+
+	def search(self, text, limit=200):
+		"""At most limit glyph names starting with the text, followed by the names containing it."""
+		if not text:
+			return self.name_list()[:limit]
+
+		results = self.prefix_matches(text)[:limit]
+		if limit is None or len(results) < limit:
+			prefix_matches = set(results)
+			matches = (name for name in self.substring_matches(text) if name not in prefix_matches)
+			results += islice(matches, None if limit is None else limit - len(results))
+		return results
@@ -0,0 +1,52 @@
+from __future__ import division, print_function, unicode_literals
+import os
+import sys
+import types
+
+# the plugin's Resources folder, where HTLSLibrary and the other plugin modules live
+RESOURCES = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class HeadlessGlyphs:
+	"""Stand-in for the Glyphs application object."""
+
+	def __init__(self):
+		self.font = None
+		self.fonts = []
+		self.defaults = {}
+
+
+def message(title="", message="", OKButton=None):
+	print("%s: %s" % (title, message))
+
+
+def install():
+	"""
+	Register in-memory stand-ins for the GlyphsApp and Foundation modules, unless the real ones can be imported,
+	so HTLSLibrary and the other plugin modules load outside of Glyphs.
+	"""
+	if RESOURCES not in sys.path:
+		sys.path.insert(0, RESOURCES)
+
+	try:
+		import GlyphsApp
+		import Foundation
+		return False
+	except ImportError:
+		pass
+
+	from HTLSHeadless import geometry, model
+
+	glyphs_app = types.ModuleType("GlyphsApp")
+	glyphs_app.Glyphs = HeadlessGlyphs()
+	glyphs_app.Message = message
+	for name in ["GSFont", "GSFontMaster", "GSGlyph", "GSLayer", "GSPath", "GSNode", "GSComponent"]:
+		setattr(glyphs_app, name, getattr(model, name))
+
+	foundation = types.ModuleType("Foundation")
+	for name in ["NSMakePoint", "NSMakeRect", "NSMinX", "NSMaxX", "NSMinY", "NSMaxY"]:
+		setattr(foundation, name, getattr(geometry, name))
+
+	sys.modules["GlyphsApp"] = glyphs_app
+	sys.modules["Foundation"] = foundation
+	return True
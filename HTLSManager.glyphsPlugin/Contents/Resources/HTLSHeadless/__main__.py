@@ -0,0 +1,246 @@
+from __future__ import division, print_function, unicode_literals
+import argparse
+import json
+import os
+import sys
+import time
+
+if __package__ in (None, ""):
+	sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import HTLSHeadless
+
+HTLSHeadless.install()
+
+from HTLSLibrary import HTLSDiagnostics, HTLSParameterFit, format_fit
+from HTLSHeadless import benchmark, daemon, golden
+from HTLSHeadless.export import export_results, diff_exports, format_change
+from HTLSHeadless.sources import load_font, save_font
+from HTLSHeadless.spacer import select_layers, space_font, apply_results, summarize, parse_shard, shard_keys, \
+	write_results, merge_results
+from HTLSHeadless.watch import SourceWatcher
+
+
+def names(text):
+	return [name.strip() for name in text.split(",") if name.strip()] if text else None
+
+
+def space(options):
+	start = time.time()
+	font = load_font(options.source)
+	keys = select_layers(font, names(options.glyphs), names(options.masters))
+	shard = None
+	if options.shard:
+		if not options.sidecar or options.write or options.output:
+			print("A shard is written to its own result file with --sidecar, combine the shards with merge.")
+			return 1
+		index, count = parse_shard(options.shard)
+		keys = shard_keys(keys, index, count, options.shard_by)
+		shard = {"index": index, "count": count, "by": options.shard_by}
+	results, entries = space_font(font, keys, options.processes)
+	summary = summarize(results)
+	summary["duration"] = time.time() - start
+
+	diagnostics = HTLSDiagnostics()
+	diagnostics.entries = entries
+	if diagnostics:
+		print(diagnostics.report())
+
+	if options.sidecar:
+		write_results(options.sidecar, font, results, shard)
+		print("Wrote results to %s" % options.sidecar)
+
+	if options.export:
+		print("Exported %s rows to %s" % (export_results(options.export, results), options.export))
+
+	if options.write or options.output:
+		apply_results(font, results)
+		print("Wrote %s" % save_font(font, options.output))
+
+	print("%(total)s layers: %(spaced)s spaced, %(unchanged)s unchanged, %(skipped)s skipped, %(failed)s failed "
+		"in %(duration).1f s" % summary)
+	return 1 if summary["failed"] else 0
+
+
+def diff(options):
+	counts = {"added": 0, "removed": 0, "moved": 0}
+	for change, old, new in diff_exports(options.old, options.new, options.threshold):
+		counts[change] += 1
+		print(format_change(change, old, new))
+	print("%(moved)s moved, %(added)s added, %(removed)s removed" % counts)
+	return 1 if any(counts.values()) else 0
+
+
+def fit(options):
+	font = load_font(options.source)
+	if options.targets:
+		# {master name: {glyph name: [LSB, RSB]}}
+		with open(options.targets) as f:
+			targets = json.load(f)
+	else:
+		# the control glyphs are spaced the way they should be
+		targets = {
+			master.name: {
+				glyph_name: [font.glyphs[glyph_name].layers[master.id].LSB, font.glyphs[glyph_name].layers[master.id].RSB]
+				for glyph_name in names(options.glyphs) if font.glyphs[glyph_name]
+			} for master in font.masters
+		}
+
+	fits = {}
+	for master_name, master_targets in targets.items():
+		master = font.masters[master_name]
+		if master is None:
+			print("%s: no such master" % master_name)
+			continue
+		diagnostics = HTLSDiagnostics()
+		parameter_fit = HTLSParameterFit(master, master_targets, diagnostics)
+		fits[master_name] = parameter_fit.fit_factor(options.rule) if options.rule else parameter_fit.fit()
+		if diagnostics:
+			print(diagnostics.report())
+		print("%s: %s" % (master_name, format_fit(fits[master_name]) if fits[master_name] else "not enough targets"))
+
+	if options.json:
+		with open(options.json, "w") as f:
+			json.dump(fits, f, indent=4)
+	return 0 if all(fits.values()) else 1
+
+
+def merge(options):
+	if not options.write and not options.output:
+		print("Nothing to write, give --write or --output.")
+		return 1
+	font = load_font(options.source)
+	results = merge_results(font, options.results)
+	spaced = apply_results(font, results)
+	print("Merged %s results, %s layers spaced" % (len(results), spaced))
+	print("Wrote %s" % save_font(font, options.output))
+	return 0
+
+
+def watch(options):
+	if not options.sidecar and not options.output:
+		print("Nothing to write, give --sidecar or --output.")
+		return 1
+	watcher = SourceWatcher(options.source, names(options.masters), options.processes, options.sidecar, options.output)
+	watcher.run(options.interval)
+	return 0
+
+
+def main(arguments=None):
+	parser = argparse.ArgumentParser(prog="HTLSHeadless", description="HT Letterspacer outside of Glyphs.")
+	commands = parser.add_subparsers(dest="command")
+	commands.required = True
+
+	space_parser = commands.add_parser(
+		"space",
+		help="space a source with the rules and parameters stored in it",
+		description="Space a .glyphs file, .glyphspackage, UFO or designspace with the HTLS Manager rules and "
+			"master parameters stored in it."
+	)
+	space_parser.add_argument("source")
+	space_parser.add_argument("--glyphs", help="comma separated glyph names, all glyphs if not given")
+	space_parser.add_argument("--masters", help="comma separated master names or IDs, all masters if not given")
+	space_parser.add_argument("--processes", type=int, default=os.cpu_count() or 1, help="spacing processes to run")
+	space_parser.add_argument("--sidecar", help="write the computed sidebearings to this JSON file")
+	space_parser.add_argument("--export", help="export the results per glyph and master to a .csv or JSON lines file")
+	space_parser.add_argument("--shard", help="space only one shard of the layers, like 3/8, needs --sidecar")
+	space_parser.add_argument(
+		"--shard-by", choices=["hash", "range"], default="hash",
+		help="spread layers over shards by a hash of glyph and master, or by ranges of glyphs"
+	)
+	destination = space_parser.add_mutually_exclusive_group()
+	destination.add_argument("--write", action="store_true", help="write the sidebearings back into the source")
+	destination.add_argument("--output", help="write a spaced copy of the source to this path")
+
+	diff_parser = commands.add_parser(
+		"diff",
+		help="compare two exports",
+		description="Compare two exports of space --export and list the layers whose sidebearings moved by more than "
+			"the threshold. Exits with 1 if there are any, so it can gate changes."
+	)
+	diff_parser.add_argument("old")
+	diff_parser.add_argument("new")
+	diff_parser.add_argument("--threshold", type=float, default=0, help="units a sidebearing may move unreported")
+
+	fit_parser = commands.add_parser(
+		"fit",
+		help="fit area and depth, or a rule factor, per master to target sidebearings",
+		description="Find the paramArea and paramDepth of every master that space control glyphs closest to target "
+			"sidebearings, by least squares. With --rule, find the factor of that rule instead."
+	)
+	fit_parser.add_argument("source")
+	fit_parser.add_argument("--targets", help="JSON file like {\"Regular\": {\"n\": [80, 75], \"o\": [48, null]}}")
+	fit_parser.add_argument(
+		"--glyphs", default="n,o,H,O", help="without --targets, fit to the current sidebearings of these glyphs"
+	)
+	fit_parser.add_argument("--rule", help="ID of a font rule whose factor is fitted to the glyphs using it")
+	fit_parser.add_argument("--json", help="also write the fitted parameters and residuals to this file")
+
+	merge_parser = commands.add_parser(
+		"merge",
+		help="write the result files of several shards into the source",
+		description="Combine the result files of shards spaced with space --shard and write them into the source."
+	)
+	merge_parser.add_argument("source")
+	merge_parser.add_argument("results", nargs="+", help="result files, .json or .json.gz")
+	destination = merge_parser.add_mutually_exclusive_group()
+	destination.add_argument("--write", action="store_true", help="write the sidebearings back into the source")
+	destination.add_argument("--output", help="write a spaced copy of the source to this path")
+
+	watch_parser = commands.add_parser(
+		"watch",
+		help="space a source again whenever it changes",
+		description="Watch a .glyphs file, .glyphspackage, UFO or designspace and space the glyphs that changed, "
+			"the composites built from them and the glyphs that use them as reference glyph."
+	)
+	watch_parser.add_argument("source")
+	watch_parser.add_argument("--masters", help="comma separated master names or IDs, all masters if not given")
+	watch_parser.add_argument("--processes", type=int, default=1, help="spacing processes to run")
+	watch_parser.add_argument("--interval", type=float, default=0.5, help="seconds between checks for changes")
+	watch_parser.add_argument("--sidecar", help="keep the computed sidebearings in this JSON file")
+	# writing into the watched source would start the next run
+	watch_parser.add_argument("--output", help="keep a spaced copy of the source at this path")
+
+	daemon_parser = commands.add_parser(
+		"daemon",
+		help="run a local spacing service that keeps sources loaded",
+		description="Serve spacing requests over a Unix socket, one JSON object per line. Commands: open, space, "
+			"close, status and shutdown, see HTLSHeadless.daemon."
+	)
+	daemon_parser.add_argument("--socket", default=daemon.SOCKET, help="path of the socket")
+
+	request_parser = commands.add_parser("request", help="send one JSON request to a running daemon")
+	request_parser.add_argument("message", help="the request, like {\"command\": \"status\"}")
+	request_parser.add_argument("--socket", default=daemon.SOCKET, help="path of the socket")
+
+	commands.add_parser("bench", help="benchmark the engine, see bench --help", add_help=False)
+	commands.add_parser("golden", help="compare engines with golden stage results, see golden --help", add_help=False)
+
+	# the benchmark and the golden results have their own options
+	arguments = sys.argv[1:] if arguments is None else arguments
+	if arguments[:1] == ["bench"]:
+		return benchmark.main(arguments[1:])
+	if arguments[:1] == ["golden"]:
+		return golden.main(arguments[1:])
+
+	options = parser.parse_args(arguments)
+	if options.command == "watch":
+		return watch(options)
+	if options.command == "merge":
+		return merge(options)
+	if options.command == "diff":
+		return diff(options)
+	if options.command == "fit":
+		return fit(options)
+	if options.command == "daemon":
+		daemon.serve(options.socket)
+		return 0
+	if options.command == "request":
+		response = daemon.send(json.loads(options.message), options.socket)
+		print(json.dumps(response, indent=4))
+		return 0 if response.get("ok") else 1
+	return space(options)
+
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,191 @@
+from __future__ import division, print_function, unicode_literals
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+if __package__ in (None, ""):
+	sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import HTLSHeadless
+
+HTLSHeadless.install()
+
+from HTLSLibrary import HTLSEngine, HTLSProfiler
+from HTLSHeadless.outlines import build_font
+from HTLSHeadless.sources import load_font
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "benchmark.json")
+
+# the synthetic glyphs measured together, by the kind of outline
+KINDS = {
+	"stems": ["H", "l", "n"],
+	"bowls": ["O", "o", "zero"],
+	"composites": ["oacute"],
+	"tall brackets": ["bracketleft"],
+	"high node count": ["registered"],
+}
+
+CASES = [
+	("1000 upright", 1000, (0,)),
+	("1000 italic", 1000, (12,)),
+	("2048 upright", 2048, (0,)),
+	("2048 italic", 2048, (12,)),
+]
+
+
+def run_case(font, repeat):
+	layers = [glyph.layers[master.id] for glyph in font.glyphs for master in font.masters]
+
+	# the fastest of the repeated runs is the least disturbed by other processes
+	best = None
+	profiler = None
+	for i in range(repeat):
+		run_profiler = HTLSProfiler()
+		start = time.perf_counter()
+		for layer in layers:
+			HTLSEngine(layer, profiler=run_profiler).current_layer_sidebearings()
+		duration = time.perf_counter() - start
+		if best is None or duration < best:
+			best = duration
+			profiler = run_profiler
+
+	kinds = {}
+	for kind, names in KINDS.items():
+		seconds = [
+			sum(timing[1] for timing in stages.values())
+			for (glyph_name, master_name), stages in profiler.glyphs.items()
+			if glyph_name.split(".")[0] in names
+		]
+		if seconds:
+			kinds[kind] = sum(seconds) / len(seconds) * 1000
+
+	return {
+		"glyphs": len(layers),
+		"seconds": best,
+		"glyphsPerSecond": len(layers) / best,
+		"stages": {stage: seconds / calls * 1000 for stage, (calls, seconds) in profiler.stages.items()},
+		"kinds": kinds,
+	}
+
+
+# settings a run must share with the baseline to be compared with it
+RUN_SETTINGS = ["copies", "repeat"]
+
+
+def run_settings(options):
+	return {
+		"copies": options.copies,
+		"repeat": options.repeat,
+		"host": platform.node(),
+		"machine": platform.machine(),
+		"python": platform.python_version(),
+	}
+
+
+def compare(results, baseline, tolerance):
+	"""Lines comparing the throughput of every case with the baseline cases, and whether any case regressed."""
+	lines = []
+	regressed = False
+	for name, result in results.items():
+		if name not in baseline:
+			lines.append("%-14s %8.1f glyphs/s (no baseline)" % (name, result["glyphsPerSecond"]))
+			continue
+		if result["glyphs"] != baseline[name]["glyphs"]:
+			lines.append("%-14s not comparable, %s layers against %s in the baseline" % (
+				name, result["glyphs"], baseline[name]["glyphs"]
+			))
+			continue
+		ratio = result["glyphsPerSecond"] / baseline[name]["glyphsPerSecond"]
+		status = ""
+		if ratio < 1 - tolerance:
+			status = "REGRESSION"
+			regressed = True
+		elif ratio > 1 + tolerance:
+			status = "faster"
+		lines.append("%-14s %8.1f glyphs/s, baseline %8.1f (%+.0f%%) %s" % (
+			name,
+			result["glyphsPerSecond"],
+			baseline[name]["glyphsPerSecond"],
+			(ratio - 1) * 100,
+			status
+		))
+	return lines, regressed
+
+
+def report(results):
+	lines = []
+	for name, result in results.items():
+		lines.append("%s: %s layers in %.3f s, %.1f glyphs/s" % (
+			name, result["glyphs"], result["seconds"], result["glyphsPerSecond"]
+		))
+		for stage, milliseconds in sorted(result["stages"].items(), key=lambda item: -item[1]):
+			lines.append("    %-20s %8.3f ms per call" % (stage, milliseconds))
+		for kind, milliseconds in result["kinds"].items():
+			lines.append("    %-20s %8.3f ms per glyph" % (kind, milliseconds))
+	return "\n".join(lines)
+
+
+def main(arguments=None):
+	parser = argparse.ArgumentParser(description="Benchmark the HT Letterspacer engine on synthetic outlines.")
+	parser.add_argument("--copies", type=int, default=5, help="repeat the synthetic glyph set to this many copies")
+	parser.add_argument("--repeat", type=int, default=3, help="runs per case, the fastest one counts")
+	parser.add_argument("--baseline", default=BASELINE, help="baseline file to compare with")
+	parser.add_argument("--save-baseline", action="store_true", help="write the results as the new baseline")
+	parser.add_argument("--tolerance", type=float, default=0.2, help="relative slowdown reported as a regression")
+	parser.add_argument(
+		"--any-host", action="store_true",
+		help="fail on regressions against a baseline recorded on another host too, they are only reported otherwise"
+	)
+	parser.add_argument("--json", help="also write the results to this file")
+	parser.add_argument("sources", nargs="*", help=".glyphs, .glyphspackage, UFO or designspace sources to measure too")
+	options = parser.parse_args(arguments)
+
+	results = {}
+	for name, upm, italic_angles in CASES:
+		font = build_font(upm, italic_angles, options.copies, parameters={"paramArea": 400, "paramDepth": 12})
+		results[name] = run_case(font, options.repeat)
+	for path in options.sources:
+		results[os.path.basename(path)] = run_case(load_font(path), options.repeat)
+
+	print(report(results))
+
+	if options.json:
+		with open(options.json, "w") as f:
+			json.dump(results, f, indent=4, sort_keys=True)
+
+	settings = run_settings(options)
+	if options.save_baseline:
+		with open(options.baseline, "w") as f:
+			json.dump({"settings": settings, "results": results}, f, indent=4, sort_keys=True)
+		print("Saved baseline to %s" % options.baseline)
+		return 0
+
+	if not os.path.exists(options.baseline):
+		return 0
+	with open(options.baseline) as f:
+		baseline = json.load(f)
+	baseline_settings = baseline.get("settings") or {}
+	different = [
+		"%s %s (baseline %s)" % (name, settings[name], baseline_settings.get(name))
+		for name in RUN_SETTINGS if settings[name] != baseline_settings.get(name)
+	]
+	if different:
+		print("Not comparable with the baseline, the runs differ in: %s" % ", ".join(different))
+		return 0
+
+	lines, regressed = compare(results, baseline["results"], options.tolerance)
+	print("\n".join(lines))
+	if (settings["host"], settings["machine"]) != (baseline_settings.get("host"), baseline_settings.get("machine")):
+		print("The baseline was recorded on %s (%s), timings from another host are only indicative." % (
+			baseline_settings.get("host"), baseline_settings.get("machine")
+		))
+		if not options.any_host:
+			return 0
+	return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
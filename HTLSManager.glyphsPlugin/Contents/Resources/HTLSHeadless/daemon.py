@@ -0,0 +1,246 @@
+from __future__ import division, print_function, unicode_literals
+import json
+import os
+import socket
+import socketserver
+import tempfile
+import threading
+import time
+import HTLSHeadless
+
+HTLSHeadless.install()
+
+from HTLSLibrary import HTLSDiagnostics, HTLSRuleIndex, read_config
+from HTLSHeadless.sources import load_font, save_font
+from HTLSHeadless.spacer import select_layers, space_layers, apply_results, summarize
+from HTLSHeadless.watch import snapshot
+
+SOCKET = os.path.join(tempfile.gettempdir(), "htls-%s.sock" % os.getuid())
+
+# master parameters a request can override, with the engine's defaults
+PARAMETERS = {"paramArea": 400, "paramDepth": 12}
+
+
+class LoadedSource:
+	"""
+	A source kept in memory with its rule index, the margin profiles of its layers and the results computed for it,
+	until its files change on disk. The profiles do not depend on the parameters, so spacing with other parameters
+	only closes the polygons again.
+	"""
+
+	def __init__(self, path):
+		self.path = path
+		self.font = None
+		self.state = None
+		self.rule_index = None
+		# key: (glyph name, master ID), value: margin profile, see HTLSEngine
+		self.profiles = {}
+		# key: (glyph name, master ID, parameters), value: result
+		self.results = {}
+		self.loaded = None
+		self.hits = 0
+		self.misses = 0
+
+	def refresh(self):
+		state = snapshot(self.path)
+		if self.font is not None and state == self.state:
+			return False
+		self.font = load_font(self.path)
+		self.state = state
+		self.rule_index = HTLSRuleIndex(read_config(self.font))
+		self.profiles = {}
+		self.results = {}
+		self.loaded = time.time()
+		return True
+
+	def space(self, keys, parameters=None):
+		"""
+		Results for the given layers, with the parameters of some masters replaced, as
+		{master name or ID: {"paramArea": 300}}. Layers spaced before with the same parameters are not measured again.
+		"""
+		parameters = parameters or {}
+		results = {}
+		diagnostics = HTLSDiagnostics()
+		for master in self.font.masters:
+			overrides = parameters.get(master.name) or parameters.get(master.id) or {}
+			overrides = {name: int(overrides[name]) for name in PARAMETERS if name in overrides}
+			master_keys = [key for key in keys if key[1] == master.id]
+			# results are kept by the parameters they were computed with, whether they were overridden or not
+			effective = dict(overrides)
+			for name, default in PARAMETERS.items():
+				if name in overrides:
+					continue
+				try:
+					effective[name] = int(master.customParameters[name] or default)
+				except (ValueError, TypeError):
+					# like the engine, parameters that are not integers are replaced by the defaults
+					for glyph_name, master_id in master_keys:
+						diagnostics.add(
+							"invalid-parameters",
+							glyph_name,
+							master.name,
+							"%s must be an integer with no decimals, using %s instead." % (name, default)
+						)
+					effective[name] = overrides[name] = default
+			parameter_key = tuple(sorted(effective.items()))
+			missing = [key for key in master_keys if key + (parameter_key,) not in self.results]
+			self.hits += len(master_keys) - len(missing)
+			self.misses += len(missing)
+
+			if missing:
+				original = {name: master.customParameters[name] for name in overrides}
+				master.customParameters.update(overrides)
+				try:
+					master_results, master_entries = space_layers(self.font, missing, self.rule_index, self.profiles)
+				finally:
+					for name, value in original.items():
+						if value is None:
+							master.customParameters.pop(name, None)
+						else:
+							master.customParameters[name] = value
+				diagnostics.entries += master_entries
+				for result in master_results:
+					self.results[(result["glyph"], result["masterId"], parameter_key)] = result
+
+			for key in master_keys:
+				results[key] = self.results[key + (parameter_key,)]
+		return [results[key] for key in keys], diagnostics.entries
+
+
+class SpacingDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+	"""
+	Local spacing service for build tools and scripts. Sources stay loaded between requests, so parsing, outline
+	caches and results are shared by every client. Requests and responses are JSON objects, one per line.
+	"""
+
+	daemon_threads = True
+
+	def __init__(self, socket_path=SOCKET):
+		if os.path.lexists(socket_path):
+			# the path is predictable, never remove what another user put there
+			if os.lstat(socket_path).st_uid != os.getuid():
+				raise OSError("%s belongs to another user, not replacing it" % socket_path)
+			os.unlink(socket_path)
+		socketserver.UnixStreamServer.__init__(self, socket_path, SpacingRequestHandler)
+		self.socket_path = socket_path
+		# key: path, value: LoadedSource
+		self.sources = {}
+		# the fonts are shared, requests are handled one at a time
+		self.lock = threading.Lock()
+		self.started = time.time()
+
+	def server_bind(self):
+		# clients can have sources written, so only the current user may connect, from the moment the socket exists
+		umask = os.umask(0o177)
+		try:
+			socketserver.UnixStreamServer.server_bind(self)
+		finally:
+			os.umask(umask)
+		os.chmod(self.server_address, 0o600)
+
+	def source(self, path):
+		path = os.path.normpath(os.path.abspath(path))
+		if path not in self.sources:
+			self.sources[path] = LoadedSource(path)
+		loaded = self.sources[path]
+		loaded.refresh()
+		return loaded
+
+	def handle_message(self, message):
+		command = message.get("command")
+		with self.lock:
+			if command == "open":
+				loaded = self.source(message["path"])
+				return {
+					"glyphs": len(loaded.font.glyphs),
+					"masters": [{"name": master.name, "id": master.id} for master in loaded.font.masters],
+				}
+			if command == "space":
+				return self.space(message)
+			if command == "close":
+				path = os.path.normpath(os.path.abspath(message["path"]))
+				return {"closed": self.sources.pop(path, None) is not None}
+			if command == "status":
+				return {
+					"uptime": time.time() - self.started,
+					"sources": [
+						{
+							"path": path,
+							"results": len(loaded.results),
+							"profiles": len(loaded.profiles),
+							"hits": loaded.hits,
+							"misses": loaded.misses,
+						}
+						for path, loaded in self.sources.items()
+					],
+				}
+			if command == "shutdown":
+				threading.Thread(target=self.shutdown).start()
+				return {}
+		raise ValueError("Unknown command: %s" % command)
+
+	def space(self, message):
+		"""
+		Space glyphs of a source. Optional keys: glyphs and masters (lists of names), parameters (see
+		LoadedSource.space), and write (true) or output (a path) to save the spaced source.
+		"""
+		loaded = self.source(message["path"])
+		keys = select_layers(loaded.font, message.get("glyphs"), message.get("masters"))
+		results, entries = loaded.space(keys, message.get("parameters"))
+		response = {"summary": summarize(results), "results": results, "diagnostics": entries}
+
+		if message.get("write") or message.get("output"):
+			if message.get("parameters"):
+				raise ValueError("Spacing with other parameters is not written, set them in the source instead")
+			apply_results(loaded.font, results)
+			response["path"] = save_font(loaded.font, message.get("output"))
+			# the font in memory no longer matches the source it was read from
+			loaded.font = None
+		return response
+
+	def server_close(self):
+		socketserver.UnixStreamServer.server_close(self)
+		if os.path.exists(self.socket_path):
+			os.unlink(self.socket_path)
+
+
+class SpacingRequestHandler(socketserver.StreamRequestHandler):
+	def handle(self):
+		for line in self.rfile:
+			if not line.strip():
+				continue
+			try:
+				response = self.server.handle_message(json.loads(line.decode("utf-8")))
+				response["ok"] = True
+			except Exception as e:
+				response = {"ok": False, "error": repr(e)}
+			self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+			self.wfile.flush()
+
+
+def send(message, socket_path=SOCKET):
+	"""Send one request to a running daemon and return its response."""
+	client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+	try:
+		client.connect(socket_path)
+		client.sendall(json.dumps(message).encode("utf-8") + b"\n")
+		data = b""
+		while not data.endswith(b"\n"):
+			chunk = client.recv(65536)
+			if not chunk:
+				break
+			data += chunk
+	finally:
+		client.close()
+	return json.loads(data.decode("utf-8"))
+
+
+def serve(socket_path=SOCKET):
+	server = SpacingDaemon(socket_path)
+	print("Spacing daemon listening on %s, press Ctrl-C to stop." % socket_path)
+	try:
+		server.serve_forever()
+	except KeyboardInterrupt:
+		pass
+	finally:
+		server.server_close()
@@ -0,0 +1,104 @@
+from __future__ import division, print_function, unicode_literals
+import csv
+import json
+
+# columns of an export, in order
+FIELDS = [
+	"glyph", "master", "masterId", "status", "rule", "factor", "reference",
+	"LSB", "RSB", "newLSB", "newRSB", "skipReason",
+]
+
+
+def row_key(row):
+	return row["glyph"], row["masterId"]
+
+
+def export_results(path, results):
+	"""
+	Write one row per glyph and master to a CSV file, or to a JSON lines file for any other extension. Rows are
+	sorted by glyph name and master ID, so two exports can be compared in a single pass.
+	"""
+	rows = sorted(results, key=row_key)
+	with open(path, "w", encoding="utf-8", newline="") as f:
+		if path.lower().endswith(".csv"):
+			writer = csv.DictWriter(f, FIELDS, extrasaction="ignore")
+			writer.writeheader()
+			for row in rows:
+				writer.writerow({field: "" if row.get(field) is None else row[field] for field in FIELDS})
+		else:
+			for row in rows:
+				f.write(json.dumps({field: row.get(field) for field in FIELDS}) + "\n")
+	return len(rows)
+
+
+def number(value):
+	# CSV files have empty cells and text instead of None and numbers
+	if value is None or value == "":
+		return None
+	return float(value)
+
+
+def read_export(path):
+	"""The rows of an export, one at a time."""
+	with open(path, encoding="utf-8", newline="") as f:
+		if path.lower().endswith(".csv"):
+			for row in csv.DictReader(f):
+				for field in ["factor", "LSB", "RSB", "newLSB", "newRSB"]:
+					row[field] = number(row.get(field))
+				yield row
+		else:
+			for line in f:
+				if line.strip():
+					yield json.loads(line)
+
+
+def sidebearings(row):
+	# the sidebearings a run leaves the layer with, the previous ones if it was not spaced
+	lsb = row["newLSB"] if row["newLSB"] is not None else row["LSB"]
+	rsb = row["newRSB"] if row["newRSB"] is not None else row["RSB"]
+	return lsb, rsb
+
+
+def diff_exports(old_path, new_path, threshold=0):
+	"""
+	Compare two exports in a single pass over both, without reading either into memory. Yields (change, old row,
+	new row) for layers that were added or removed, and for layers whose LSB or RSB moved by more than the
+	threshold.
+	"""
+	old_rows = read_export(old_path)
+	new_rows = read_export(new_path)
+	old = next(old_rows, None)
+	new = next(new_rows, None)
+	while old is not None or new is not None:
+		if new is None or (old is not None and row_key(old) < row_key(new)):
+			yield "removed", old, None
+			old = next(old_rows, None)
+		elif old is None or row_key(new) < row_key(old):
+			yield "added", None, new
+			new = next(new_rows, None)
+		else:
+			old_lsb, old_rsb = sidebearings(old)
+			new_lsb, new_rsb = sidebearings(new)
+			if moved(old_lsb, new_lsb, threshold) or moved(old_rsb, new_rsb, threshold):
+				yield "moved", old, new
+			old = next(old_rows, None)
+			new = next(new_rows, None)
+
+
+def moved(old, new, threshold):
+	if old is None or new is None:
+		return old is not new
+	return abs(new - old) > threshold
+
+
+def format_change(change, old, new):
+	if change == "removed":
+		return "- %s (%s)" % (old["glyph"], old["master"])
+	if change == "added":
+		return "+ %s (%s)" % (new["glyph"], new["master"])
+	old_lsb, old_rsb = sidebearings(old)
+	new_lsb, new_rsb = sidebearings(new)
+	line = "~ %s (%s): LSB %s -> %s, RSB %s -> %s" % (new["glyph"], new["master"], old_lsb, new_lsb, old_rsb, new_rsb)
+	if old.get("rule") != new.get("rule") or old.get("reference") != new.get("reference"):
+		line += ", rule %s/%s -> %s/%s" % (old.get("rule"), old.get("reference"), new.get("rule"), new.get("reference"))
+	return line
@@ -0,0 +1,203 @@
+from __future__ import division, print_function, unicode_literals
+import math
+
+# tolerance for treating polynomial coefficients as zero
+EPSILON = 1e-9
+
+
+class Point:
+	"""
+	Mutable point standing in for NSPoint. It unpacks like a tuple, and pointValue() lets it stand in for the
+	NSValue objects returned by the intersection methods as well.
+	"""
+
+	__slots__ = ["x", "y"]
+
+	def __init__(self, x, y):
+		self.x = x
+		self.y = y
+
+	def __iter__(self):
+		yield self.x
+		yield self.y
+
+	def __getitem__(self, index):
+		return (self.x, self.y)[index]
+
+	def __len__(self):
+		return 2
+
+	def __eq__(self, other):
+		return tuple(self) == tuple(other)
+
+	def __repr__(self):
+		return "<Point %s %s>" % (self.x, self.y)
+
+	def pointValue(self):
+		return self
+
+
+class Size:
+	__slots__ = ["width", "height"]
+
+	def __init__(self, width, height):
+		self.width = width
+		self.height = height
+
+
+class Rect:
+	__slots__ = ["origin", "size"]
+
+	def __init__(self, x, y, width, height):
+		self.origin = Point(x, y)
+		self.size = Size(width, height)
+
+	def __repr__(self):
+		return "<Rect %s %s %s %s>" % (self.origin.x, self.origin.y, self.size.width, self.size.height)
+
+
+def NSMakePoint(x, y):
+	return Point(x, y)
+
+
+def NSMakeRect(x, y, width, height):
+	return Rect(x, y, width, height)
+
+
+def NSMinX(rect):
+	return rect.origin.x
+
+
+def NSMaxX(rect):
+	return rect.origin.x + rect.size.width
+
+
+def NSMinY(rect):
+	return rect.origin.y
+
+
+def NSMaxY(rect):
+	return rect.origin.y + rect.size.height
+
+
+def solve_quadratic(a, b, c):
+	if abs(a) < EPSILON:
+		if abs(b) < EPSILON:
+			return []
+		return [-c / b]
+	discriminant = b * b - 4 * a * c
+	if discriminant < 0:
+		return []
+	root = math.sqrt(discriminant)
+	return [(-b + root) / (2 * a), (-b - root) / (2 * a)]
+
+
+def solve_cubic(a, b, c, d):
+	# real roots of a*t^3 + b*t^2 + c*t + d
+	if abs(a) < EPSILON:
+		return solve_quadratic(b, c, d)
+
+	# depressed cubic t = u - b / 3a, u^3 + p*u + q = 0
+	b, c, d = b / a, c / a, d / a
+	p = c - b * b / 3
+	q = 2 * b * b * b / 27 - b * c / 3 + d
+	offset = -b / 3
+
+	if abs(p) < EPSILON:
+		return [math.copysign(abs(q) ** (1 / 3), -q) + offset]
+
+	discriminant = q * q / 4 + p * p * p / 27
+	if discriminant > EPSILON:
+		root = math.sqrt(discriminant)
+		u = math.copysign(abs(-q / 2 + root) ** (1 / 3), -q / 2 + root)
+		v = math.copysign(abs(-q / 2 - root) ** (1 / 3), -q / 2 - root)
+		return [u + v + offset]
+	if discriminant > -EPSILON:
+		u = math.copysign(abs(q / 2) ** (1 / 3), -q / 2)
+		return [2 * u + offset, -u + offset]
+
+	radius = 2 * math.sqrt(-p / 3)
+	angle = math.acos(max(-1, min(1, 3 * q / (p * radius))))
+	return [radius * math.cos((angle - 2 * math.pi * k) / 3) + offset for k in range(3)]
+
+
+def cubic_point(segment, t):
+	(x0, y0), (x1, y1), (x2, y2), (x3, y3) = segment
+	mt = 1 - t
+	a = mt * mt * mt
+	b = 3 * mt * mt * t
+	c = 3 * mt * t * t
+	d = t * t * t
+	return a * x0 + b * x1 + c * x2 + d * x3, a * y0 + b * y1 + c * y2 + d * y3
+
+
+def segment_intersections(segment, y):
+	"""x positions where a segment, given as two (line) or four (cubic) points, crosses the horizontal line y."""
+	if len(segment) == 2:
+		(x0, y0), (x1, y1) = segment
+		if y0 == y1:
+			return []
+		# half-open, so a line ending exactly on the scan line is only counted once by the path
+		if min(y0, y1) <= y < max(y0, y1):
+			return [x0 + (y - y0) * (x1 - x0) / (y1 - y0)]
+		return []
+
+	(x0, y0), (x1, y1), (x2, y2), (x3, y3) = segment
+	if y < min(y0, y1, y2, y3) or y > max(y0, y1, y2, y3):
+		return []
+	a = -y0 + 3 * y1 - 3 * y2 + y3
+	b = 3 * y0 - 6 * y1 + 3 * y2
+	c = -3 * y0 + 3 * y1
+	d = y0 - y
+	results = []
+	for t in solve_cubic(a, b, c, d):
+		if -EPSILON <= t < 1 - EPSILON:
+			results.append(cubic_point(segment, min(max(t, 0), 1))[0])
+	return results
+
+
+def segment_extremes(segment, dx, dy):
+	"""Minimum and maximum of the projection dx * x + dy * y over a segment."""
+	values = [dx * x + dy * y for x, y in (segment[0], segment[-1])]
+	if len(segment) == 4:
+		# the projection of a cubic is a cubic, its extremes are at the roots of the derivative
+		p0, p1, p2, p3 = [dx * x + dy * y for x, y in segment]
+		a = 3 * (-p0 + 3 * p1 - 3 * p2 + p3)
+		b = 6 * (p0 - 2 * p1 + p2)
+		c = 3 * (p1 - p0)
+		for t in solve_quadratic(a, b, c):
+			if 0 < t < 1:
+				x, y = cubic_point(segment, t)
+				values.append(dx * x + dy * y)
+	return min(values), max(values)
+
+
+def segments_bounds(segments):
+	if not segments:
+		return None
+	min_x, min_y = float("inf"), float("inf")
+	max_x, max_y = float("-inf"), float("-inf")
+	for segment in segments:
+		low, high = segment_extremes(segment, 1, 0)
+		min_x, max_x = min(min_x, low), max(max_x, high)
+		low, high = segment_extremes(segment, 0, 1)
+		min_y, max_y = min(min_y, low), max(max_y, high)
+	return min_x, min_y, max_x, max_y
+
+
+def slanted_extremes(segments, angle, origin_y):
+	"""
+	Minimum and maximum x of the segments measured along the italic angle, through the height origin_y. This is
+	how sidebearings are measured in slanted masters.
+	"""
+	slope = math.tan(math.radians(angle))
+	low, high = float("inf"), float("-inf")
+	for segment in segments:
+		segment_low, segment_high = segment_extremes(segment, 1, -slope)
+		low, high = min(low, segment_low), max(high, segment_high)
+	return low + slope * origin_y, high + slope * origin_y
+
+
+def transform_point(transform, x, y):
+	a, b, c, d, tx, ty = transform
+	return a * x + c * y + tx, b * x + d * y + ty
@@ -0,0 +1,98 @@
+from __future__ import division, print_function, unicode_literals
+import unicodedata
+from HTLSHeadless.model import GSNoCase, GSUppercase, GSLowercase, GSSmallcaps, GSMinor, GSOther
+
+# approximation of the glyph data Glyphs uses to derive category, subcategory and case, from Unicode properties
+
+DIGITS = ["zero", "one", "two", "three", "four", "five", "six", "seven", "eight", "nine"]
+
+# glyph names without a single character or uniXXXX form that spacing rules commonly target
+NAMES = {
+	"space": 0x0020, "exclam": 0x0021, "quotedbl": 0x0022, "numbersign": 0x0023, "dollar": 0x0024,
+	"percent": 0x0025, "ampersand": 0x0026, "quotesingle": 0x0027, "parenleft": 0x0028, "parenright": 0x0029,
+	"asterisk": 0x002A, "plus": 0x002B, "comma": 0x002C, "hyphen": 0x002D, "period": 0x002E, "slash": 0x002F,
+	"colon": 0x003A, "semicolon": 0x003B, "less": 0x003C, "equal": 0x003D, "greater": 0x003E,
+	"question": 0x003F, "at": 0x0040, "bracketleft": 0x005B, "backslash": 0x005C, "bracketright": 0x005D,
+	"asciicircum": 0x005E, "underscore": 0x005F, "grave": 0x0060, "braceleft": 0x007B, "bar": 0x007C,
+	"braceright": 0x007D, "asciitilde": 0x007E, "exclamdown": 0x00A1, "cent": 0x00A2, "sterling": 0x00A3,
+	"yen": 0x00A5, "section": 0x00A7, "copyright": 0x00A9, "guillemetleft": 0x00AB, "registered": 0x00AE,
+	"degree": 0x00B0, "plusminus": 0x00B1, "paragraph": 0x00B6, "periodcentered": 0x00B7,
+	"guillemetright": 0x00BB, "questiondown": 0x00BF, "multiply": 0x00D7, "divide": 0x00F7,
+	"germandbls": 0x00DF, "dotlessi": 0x0131, "endash": 0x2013, "emdash": 0x2014, "quoteleft": 0x2018,
+	"quoteright": 0x2019, "quotesinglbase": 0x201A, "quotedblleft": 0x201C, "quotedblright": 0x201D,
+	"quotedblbase": 0x201E, "dagger": 0x2020, "daggerdbl": 0x2021, "bullet": 0x2022, "ellipsis": 0x2026,
+	"perthousand": 0x2030, "guilsinglleft": 0x2039, "guilsinglright": 0x203A, "fraction": 0x2044,
+	"Euro": 0x20AC, "trademark": 0x2122, "minus": 0x2212,
+}
+
+SUB_CATEGORIES = {
+	"Nd": "Decimal Digit", "No": "Fraction", "Ps": "Parenthesis", "Pe": "Parenthesis", "Pd": "Dash",
+	"Pi": "Quote", "Pf": "Quote", "Sc": "Currency", "Sm": "Math", "Mn": "Nonspacing", "Mc": "Spacing Combining",
+	"Me": "Enclosing", "Zs": "Space", "Lm": "Modifier",
+}
+
+CATEGORIES = {"L": "Letter", "N": "Number", "P": "Punctuation", "S": "Symbol", "M": "Mark", "Z": "Separator"}
+
+ACCENTS = {
+	"acute": "ACUTE", "grave": "GRAVE", "circumflex": "CIRCUMFLEX", "dieresis": "DIAERESIS", "tilde": "TILDE",
+	"ring": "RING ABOVE", "cedilla": "CEDILLA", "caron": "CARON", "macron": "MACRON", "breve": "BREVE",
+	"ogonek": "OGONEK", "dotaccent": "DOT ABOVE",
+}
+
+SUFFIX_CASES = {"sc": GSSmallcaps, "smcp": GSSmallcaps, "c2sc": GSSmallcaps, "sups": GSMinor, "subs": GSMinor,
+	"sinf": GSMinor, "numr": GSMinor, "dnom": GSMinor}
+
+
+def code_point(name):
+	base = name.split(".")[0].split("_")[0]
+	if base in NAMES:
+		return NAMES[base]
+	if base in DIGITS:
+		return 0x30 + DIGITS.index(base)
+	if len(base) == 1:
+		return ord(base)
+	for prefix, length in (("uni", 4), ("u", 5), ("u", 4)):
+		if base.startswith(prefix) and len(base) == len(prefix) + length:
+			try:
+				return int(base[len(prefix):], 16)
+			except ValueError:
+				pass
+	# accented Latin letters like aacute
+	if len(base) > 1 and base[1:] in ACCENTS:
+		letter = "CAPITAL" if base[0].isupper() else "SMALL"
+		try:
+			return ord(unicodedata.lookup("LATIN %s LETTER %s WITH %s" % (letter, base[0].upper(), ACCENTS[base[1:]])))
+		except KeyError:
+			pass
+	return None
+
+
+def glyph_info(name, unicode_value=None):
+	"""(category, subcategory, case) of a glyph, from its Unicode value or, failing that, its name."""
+	if unicode_value is None:
+		unicode_value = code_point(name)
+
+	suffixes = name.split(".")[1:]
+	if unicode_value is None:
+		if name.endswith("comb") or "comb." in name:
+			return "Mark", "Nonspacing", GSNoCase
+		return None, None, GSNoCase
+
+	unicode_category = unicodedata.category(chr(unicode_value))
+	category = CATEGORIES.get(unicode_category[0], "Other")
+	sub_category = SUB_CATEGORIES.get(unicode_category)
+
+	case = GSNoCase
+	if unicode_category == "Lu":
+		case = GSUppercase
+	elif unicode_category == "Ll":
+		case = GSLowercase
+	elif category == "Letter":
+		case = GSOther
+	for suffix in suffixes:
+		if suffix in SUFFIX_CASES:
+			case = SUFFIX_CASES[suffix]
+
+	if name.split(".")[0].endswith("comb"):
+		category, sub_category = "Mark", "Nonspacing"
+	return category, sub_category, case
@@ -0,0 +1,200 @@
+from __future__ import division, print_function, unicode_literals
+import argparse
+import gzip
+import json
+import os
+import sys
+
+if __package__ in (None, ""):
+	sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import HTLSHeadless
+
+HTLSHeadless.install()
+
+from HTLSLibrary import HTLSEngine, area
+from HTLSHeadless.outlines import build_font
+from HTLSHeadless.sources import load_font
+from HTLSHeadless.spacer import select_layers, space_font
+
+# every measured point of every layer, compressed
+GOLDEN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "golden.json.gz")
+
+# largest difference between an engine's stage results and the golden ones, in font units (areas in square units)
+TOLERANCES = {
+	"margins": 0.01,
+	"zones": 0.01,
+	"extremes": 0.01,
+	"polygons": 0.01,
+	"areas": 1,
+	"values": 0.01,
+	"sidebearings": 0,
+}
+
+# rules covering a reference glyph, factors, filters and a category without rules
+RULES = {
+	"Letter": {
+		"uppercase": {"subcategory": "Any", "case": 1, "value": 1.25, "referenceGlyph": "H", "filter": ""},
+		"lowercase": {"subcategory": "Any", "case": 2, "value": 1, "referenceGlyph": "n", "filter": ""},
+	},
+	"Number": {
+		"figures": {"subcategory": "Any", "case": 0, "value": 1.2, "referenceGlyph": "zero", "filter": ""},
+	},
+	"Punctuation": {
+		"brackets": {"subcategory": "Parenthesis", "case": 0, "value": 1.5, "referenceGlyph": "H", "filter": "bracket"},
+	},
+}
+
+CASES = [
+	("1000 upright", 1000, (0,)),
+	("1000 italic", 1000, (12,)),
+	("2048 backslanted", 2048, (-8,)),
+]
+
+
+def corpus(sources=()):
+	"""(name, font) of the synthetic fonts, with and without rules, and of the given sources."""
+	fonts = []
+	for name, upm, italic_angles in CASES:
+		fonts.append((name, build_font(upm, italic_angles, parameters={"paramArea": 400, "paramDepth": 12})))
+		font = build_font(upm, italic_angles, parameters={"paramArea": 320, "paramDepth": 15})
+		font.userData["com.eweracs.HTLSManager.fontRules"] = RULES
+		fonts.append((name + " rules", font))
+	for path in sources:
+		fonts.append((os.path.basename(path), load_font(path)))
+	return fonts
+
+
+def points(margins):
+	return [[round(point.x, 4), round(point.y, 4)] for point in margins] if margins else None
+
+
+def capture(engine, sidebearings):
+	"""The stage results of an engine that spaced a layer, as numbers."""
+	def pair(left, right, convert):
+		return [convert(left), convert(right)] if left is not None and right is not None else None
+
+	return {
+		"margins": pair(engine.l_total_margins, engine.r_total_margins, points),
+		"zones": pair(engine.l_zone_margins, engine.r_zone_margins, points),
+		"extremes": pair(engine.l_extreme, engine.r_extreme, lambda point: [round(point.x, 4), round(point.y, 4)]),
+		"polygons": pair(engine.l_polygon, engine.r_polygon, points),
+		"areas": pair(engine.l_polygon, engine.r_polygon, lambda polygon: round(area(polygon), 4)),
+		"values": pair(engine.l_value, engine.r_value, lambda value: round(value, 4)),
+		"sidebearings": list(sidebearings) if sidebearings else None,
+	}
+
+
+def run_engine(font, keys):
+	# the engine of this plugin version, the goldens are captured with it
+	records = {}
+	for glyph_name, master_id in keys:
+		layer = font.glyphs[glyph_name].layers[master_id]
+		engine = HTLSEngine(layer)
+		records["%s/%s" % (glyph_name, layer.master.name)] = capture(engine, engine.current_layer_sidebearings())
+	return records
+
+
+def run_spacer(font, keys):
+	# the headless spacer only reports final sidebearings
+	records = {}
+	results, entries = space_font(font, keys, processes=os.cpu_count() or 1)
+	for result in results:
+		sidebearings = None
+		if result["newLSB"] is not None or result["newRSB"] is not None:
+			sidebearings = [result["newLSB"], result["newRSB"]]
+		records["%s/%s" % (result["glyph"], result["master"])] = {"sidebearings": sidebearings}
+	return records
+
+
+# engines compared with the goldens, alternate engines add themselves here: name, function(font, keys) returning
+# {"glyph/master": {stage: result}}, stages an engine does not report are not compared
+ENGINES = {
+	"HTLSEngine": run_engine,
+	"spacer": run_spacer,
+}
+
+
+def flatten(value):
+	if isinstance(value, list):
+		for item in value:
+			for number in flatten(item):
+				yield number
+	else:
+		yield value
+
+
+def difference(expected, actual):
+	"""Largest difference between two stage results, None if they do not have the same shape."""
+	if expected is None or actual is None:
+		return 0 if expected is actual else None
+	expected = list(flatten(expected))
+	actual = list(flatten(actual))
+	if len(expected) != len(actual):
+		return None
+	largest = 0
+	for a, b in zip(expected, actual):
+		if a is None or b is None:
+			if a is not b:
+				return None
+			continue
+		largest = max(largest, abs(a - b))
+	return largest
+
+
+def compare(golden, records, tolerances=TOLERANCES):
+	"""Lines describing every stage result outside of its tolerance."""
+	lines = []
+	for key, expected in golden.items():
+		if key not in records:
+			lines.append("%s: missing" % key)
+			continue
+		for stage, actual in records[key].items():
+			if stage not in expected:
+				continue
+			largest = difference(expected[stage], actual)
+			if largest is None:
+				lines.append("%s %s: different shape" % (key, stage))
+			elif largest > tolerances.get(stage, 0):
+				lines.append("%s %s: off by %.4f" % (key, stage, largest))
+	return lines
+
+
+def main(arguments=None):
+	parser = argparse.ArgumentParser(
+		description="Compare the stage results of spacing engines with golden results of the current engine."
+	)
+	parser.add_argument("--golden", default=GOLDEN, help="golden results file")
+	parser.add_argument("--save", action="store_true", help="capture new golden results with HTLSEngine")
+	parser.add_argument("--engine", action="append", choices=sorted(ENGINES), help="engines to check, all by default")
+	parser.add_argument("sources", nargs="*", help=".glyphs, .glyphspackage, UFO or designspace sources to add")
+	options = parser.parse_args(arguments)
+
+	fonts = corpus(options.sources)
+	if options.save:
+		golden = {name: run_engine(font, select_layers(font)) for name, font in fonts}
+		with gzip.open(options.golden, "wt", encoding="utf-8") as f:
+			json.dump(golden, f, separators=(",", ":"), sort_keys=True)
+		print("Saved golden results of %s layers to %s" % (sum(len(records) for records in golden.values()), options.golden))
+		return 0
+
+	with gzip.open(options.golden, "rt", encoding="utf-8") as f:
+		golden = json.load(f)
+	failed = False
+	for engine_name in options.engine or sorted(ENGINES):
+		lines = []
+		for name, font in fonts:
+			if name not in golden:
+				print("%s: no golden results, capture them with --save" % name)
+				continue
+			for line in compare(golden[name], ENGINES[engine_name](font, select_layers(font))):
+				lines.append("%s %s" % (name, line))
+		print("%s: %s" % (engine_name, "%s differences" % len(lines) if lines else "matches"))
+		for line in lines:
+			print("    " + line)
+		failed = failed or bool(lines)
+	return 1 if failed else 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
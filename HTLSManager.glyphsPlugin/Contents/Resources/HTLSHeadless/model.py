@@ -0,0 +1,383 @@
+from __future__ import division, print_function, unicode_literals
+import uuid
+from HTLSHeadless.geometry import Point, Rect, segments_bounds, segment_intersections, slanted_extremes, \
+	transform_point
+
+# GSCase values
+GSNoCase = 0
+GSUppercase = 1
+GSLowercase = 2
+GSSmallcaps = 3
+GSMinor = 4
+GSOther = 5
+
+
+class UserData(dict):
+	# like customParameters and userData in Glyphs, missing keys read as None
+	def __missing__(self, key):
+		return None
+
+
+class GlyphList(list):
+	"""List of glyphs that can also be indexed by glyph name, like font.glyphs in Glyphs."""
+
+	def __init__(self, font, glyphs=()):
+		list.__init__(self)
+		self.font = font
+		self.by_name = {}
+		for glyph in glyphs:
+			self.append(glyph)
+
+	def __getitem__(self, key):
+		if isinstance(key, int):
+			return list.__getitem__(self, key)
+		return self.by_name.get(key)
+
+	def __contains__(self, glyph):
+		return glyph in self.by_name or list.__contains__(self, glyph)
+
+	def append(self, glyph):
+		glyph.parent = self.font
+		list.append(self, glyph)
+		self.by_name[glyph.name] = glyph
+
+	def remove(self, glyph):
+		list.remove(self, glyph)
+		self.by_name.pop(glyph.name, None)
+
+
+class GSNode:
+	__slots__ = ["x", "y", "type"]
+
+	def __init__(self, x, y, type="line"):
+		self.x = x
+		self.y = y
+		self.type = type
+
+	@property
+	def position(self):
+		return Point(self.x, self.y)
+
+
+class GSPath:
+	def __init__(self, nodes=None, closed=True):
+		self.nodes = list(nodes or [])
+		self.closed = closed
+
+	def segments(self):
+		"""The outline as a list of line (2 points) and cubic (4 points) segments."""
+		nodes = self.nodes
+		if not nodes:
+			return []
+		# start at the last on-curve node, so every segment ends on the node it is read from
+		start = len(nodes) - 1
+		while start >= 0 and nodes[start].type == "offcurve":
+			start -= 1
+		if start < 0:
+			return []
+		ordered = nodes[start + 1:] + nodes[:start + 1]
+		if not self.closed:
+			ordered = nodes[1:]
+			start_node = nodes[0]
+		else:
+			start_node = nodes[start]
+
+		segments = []
+		previous = (start_node.x, start_node.y)
+		controls = []
+		for node in ordered:
+			if node.type == "offcurve":
+				controls.append((node.x, node.y))
+				continue
+			point = (node.x, node.y)
+			if node.type == "qcurve" or (node.type == "curve" and len(controls) != 2):
+				segments += quadratic_to_cubics(previous, controls, point)
+			elif node.type == "curve":
+				segments.append((previous, controls[0], controls[1], point))
+			else:
+				segments.append((previous, point))
+			previous = point
+			controls = []
+		return segments
+
+	def applyTransform(self, transform):
+		for node in self.nodes:
+			node.x, node.y = transform_point(transform, node.x, node.y)
+
+	def copy(self):
+		return GSPath([GSNode(node.x, node.y, node.type) for node in self.nodes], self.closed)
+
+
+def quadratic_to_cubics(start, controls, end):
+	# TrueType curves, consecutive off-curve points have implied on-curve points halfway between them
+	if not controls:
+		return [(start, end)]
+	segments = []
+	for i, control in enumerate(controls):
+		if i < len(controls) - 1:
+			next_control = controls[i + 1]
+			segment_end = ((control[0] + next_control[0]) / 2, (control[1] + next_control[1]) / 2)
+		else:
+			segment_end = end
+		segments.append((
+			start,
+			(start[0] + 2 / 3 * (control[0] - start[0]), start[1] + 2 / 3 * (control[1] - start[1])),
+			(segment_end[0] + 2 / 3 * (control[0] - segment_end[0]), segment_end[1] + 2 / 3 * (control[1] - segment_end[1])),
+			segment_end
+		))
+		start = segment_end
+	return segments
+
+
+class GSComponent:
+	def __init__(self, name, position=(0, 0), transform=None):
+		self.componentName = name
+		self.parent = None
+		if transform is None:
+			transform = (1, 0, 0, 1, position[0], position[1])
+		self.transform = tuple(transform)
+
+	def decomposed_paths(self, master_id, depth=0):
+		font = self.parent.parent.parent if self.parent and self.parent.parent else None
+		glyph = font.glyphs[self.componentName] if font else None
+		if glyph is None or depth > 20:
+			return []
+		paths = []
+		for path in glyph.layers[master_id].decomposed_paths(depth + 1):
+			path = path.copy()
+			path.applyTransform(self.transform)
+			paths.append(path)
+		return paths
+
+
+class GSLayer:
+	def __init__(self, master_id, width=0, paths=None, components=None, name=None):
+		self.parent = None
+		self.associatedMasterId = master_id
+		self.layerId = master_id
+		self.name = name
+		self.width = width
+		self.paths = list(paths or [])
+		self.components = []
+		self.widthMetricsKey = None
+		self.leftMetricsKey = None
+		self.rightMetricsKey = None
+		self.aligned_width = False
+		self.isMasterLayer = True
+		# the .glif file or the parsed .glyphs layer a layer was read from, for writing the source back
+		self.source_file = None
+		self.source_data = None
+		# how far the outline was moved horizontally since loading, by setting the LSB
+		self.x_offset = 0
+		for component in components or []:
+			self.add_component(component)
+		self.cached_segments = None
+		self.cached_bounds = None
+
+	def add_component(self, component):
+		component.parent = self
+		self.components.append(component)
+		self.cached_segments = None
+		self.cached_bounds = None
+
+	@property
+	def font(self):
+		return self.parent.parent if self.parent else None
+
+	@property
+	def master(self):
+		return self.font.masters[self.associatedMasterId] if self.font else None
+
+	@property
+	def italicAngle(self):
+		master = self.master
+		return master.italicAngle if master else 0
+
+	def hasAlignedWidth(self):
+		return self.aligned_width
+
+	def decomposed_paths(self, depth=0):
+		paths = list(self.paths)
+		for component in self.components:
+			paths += component.decomposed_paths(self.associatedMasterId, depth)
+		return paths
+
+	def copyDecomposedLayer(self):
+		layer = GSLayer(self.associatedMasterId, self.width, [path.copy() for path in self.decomposed_paths()], name=self.name)
+		layer.parent = self.parent
+		return layer
+
+	def segments(self):
+		# only layers without components are cached, as components change when their base glyphs do
+		if self.cached_segments is not None and not self.components:
+			return self.cached_segments
+		segments = []
+		for path in self.decomposed_paths():
+			segments += path.segments()
+		if not self.components:
+			self.cached_segments = segments
+		return segments
+
+	def changed(self):
+		self.cached_segments = None
+		self.cached_bounds = None
+
+	@property
+	def bounds(self):
+		if self.cached_bounds is not None and not self.components:
+			return self.cached_bounds
+		extent = segments_bounds(self.segments())
+		if extent is None:
+			return Rect(0, 0, 0, 0)
+		min_x, min_y, max_x, max_y = extent
+		bounds = Rect(min_x, min_y, max_x - min_x, max_y - min_y)
+		if not self.components:
+			self.cached_bounds = bounds
+		return bounds
+
+	def calculateIntersectionsStartPoint_endPoint_(self, start_point, end_point):
+		# only horizontal measuring lines are needed by the engine
+		y = start_point.y
+		xs = []
+		for segment in self.segments():
+			xs += segment_intersections(segment, y)
+		xs.sort()
+		return [Point(start_point.x, y)] + [Point(x, y) for x in xs] + [Point(end_point.x, y)]
+
+	def sidebearing_extremes(self):
+		segments = self.segments()
+		if not segments:
+			return None
+		master = self.master
+		angle = master.italicAngle if master else 0
+		if angle:
+			return slanted_extremes(segments, angle, master.xHeight / 2)
+		extent = segments_bounds(segments)
+		return extent[0], extent[2]
+
+	@property
+	def LSB(self):
+		extremes = self.sidebearing_extremes()
+		return extremes[0] if extremes else 0
+
+	@LSB.setter
+	def LSB(self, value):
+		extremes = self.sidebearing_extremes()
+		if extremes is None:
+			return
+		shift = value - extremes[0]
+		self.x_offset += shift
+		for path in self.paths:
+			path.applyTransform((1, 0, 0, 1, shift, 0))
+		for component in self.components:
+			a, b, c, d, tx, ty = component.transform
+			component.transform = (a, b, c, d, tx + shift, ty)
+		self.width += shift
+		self.changed()
+
+	@property
+	def RSB(self):
+		extremes = self.sidebearing_extremes()
+		return self.width - extremes[1] if extremes else 0
+
+	@RSB.setter
+	def RSB(self, value):
+		extremes = self.sidebearing_extremes()
+		if extremes is None:
+			return
+		self.width = extremes[1] + value
+
+	def syncMetrics(self):
+		pass
+
+	def beginChanges(self):
+		pass
+
+	def endChanges(self):
+		self.changed()
+
+
+class GSGlyph:
+	def __init__(self, name, category=None, subCategory=None, case=GSNoCase, unicode=None):
+		self.name = name
+		self.id = str(uuid.uuid4()).upper()
+		self.parent = None
+		self.category = category
+		self.subCategory = subCategory
+		self.case = case
+		self.unicode = unicode
+		self.leftMetricsKey = None
+		self.rightMetricsKey = None
+		self.widthMetricsKey = None
+		self.lastChange = None
+		self.userData = UserData()
+		self.layers = {}
+		# the parsed glyph of a .glyphs file, and its .glyph file in a .glyphspackage
+		self.source_data = None
+		self.source_file = None
+
+	def add_layer(self, layer):
+		layer.parent = self
+		self.layers[layer.associatedMasterId] = layer
+
+	def beginUndo(self):
+		pass
+
+	def endUndo(self):
+		pass
+
+
+class GSFontMaster:
+	def __init__(self, name="Regular", xHeight=500, italicAngle=0, id=None, axes=None):
+		self.id = id or str(uuid.uuid4()).upper()
+		self.name = name
+		self.font = None
+		self.xHeight = xHeight
+		self.italicAngle = italicAngle
+		self.axes = list(axes or [])
+		self.customParameters = UserData()
+		self.userData = UserData()
+
+
+class MasterList(list):
+	def __getitem__(self, key):
+		if isinstance(key, int):
+			return list.__getitem__(self, key)
+		for master in self:
+			if master.id == key or master.name == key:
+				return master
+		return None
+
+
+class GSFont:
+	def __init__(self, upm=1000, familyName="Untitled"):
+		self.upm = upm
+		self.familyName = familyName
+		self.masters = MasterList()
+		self.glyphs = GlyphList(self)
+		self.customParameters = UserData()
+		self.userData = UserData()
+		self.axes = []
+		self.selectedLayers = []
+		self.selectedFontMaster = None
+		self.currentTab = None
+		self.filepath = None
+		# the parsed .glyphs file or fontinfo.plist of a package, for writing the source back
+		self.source_data = None
+
+	def add_master(self, master):
+		master.font = self
+		self.masters.append(master)
+		if self.selectedFontMaster is None:
+			self.selectedFontMaster = master
+		return master
+
+	def add_glyph(self, glyph):
+		self.glyphs.append(glyph)
+		return glyph
+
+	def disableUpdateInterface(self):
+		pass
+
+	def enableUpdateInterface(self):
+		pass
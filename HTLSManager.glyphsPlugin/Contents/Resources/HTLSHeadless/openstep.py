@@ -0,0 +1,266 @@
+from __future__ import division, print_function, unicode_literals
+import re
+
+# bare (unquoted) strings, numbers and glyph names
+BARE = re.compile(r"[A-Za-z0-9_.$/:+\-]+")
+INTEGER = re.compile(r"-?(0|[1-9][0-9]*)$")
+# Glyphs never writes exponents, and hexadecimal unicode values like 1E00 must not become numbers
+FLOAT = re.compile(r"-?[0-9]*\.[0-9]+$")
+ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "\"": "\"", "\\": "\\", "a": "\a", "b": "\b", "f": "\f", "v": "\v"}
+
+
+class OpenStepError(ValueError):
+	pass
+
+
+class QuotedString(str):
+	# a string with escapes, remembering how it was written so it is written back the same way
+	raw = None
+
+
+class OpenStepParser:
+	"""
+	Parser for the old-style (OpenStep) property lists .glyphs files are written in. Bare integers and decimals
+	become numbers, except integers with leading zeros such as the hexadecimal unicode values of the Glyphs 2
+	format, which stay strings.
+	"""
+
+	def __init__(self, text):
+		self.text = text
+		self.index = 0
+
+	def parse(self):
+		self.skip_whitespace()
+		value = self.parse_value()
+		self.skip_whitespace()
+		if self.index < len(self.text):
+			raise OpenStepError("Unexpected content at offset %s" % self.index)
+		return value
+
+	def skip_whitespace(self):
+		text = self.text
+		while self.index < len(text):
+			character = text[self.index]
+			if character in " \t\r\n":
+				self.index += 1
+			elif text.startswith("//", self.index):
+				end = text.find("\n", self.index)
+				self.index = len(text) if end < 0 else end + 1
+			elif text.startswith("/*", self.index):
+				end = text.find("*/", self.index)
+				if end < 0:
+					raise OpenStepError("Unterminated comment")
+				self.index = end + 2
+			else:
+				break
+
+	def expect(self, character):
+		self.skip_whitespace()
+		if self.text[self.index:self.index + 1] != character:
+			raise OpenStepError("Expected %r at offset %s" % (character, self.index))
+		self.index += 1
+
+	def parse_value(self):
+		self.skip_whitespace()
+		if self.index >= len(self.text):
+			raise OpenStepError("Unexpected end of file")
+		character = self.text[self.index]
+		if character == "{":
+			return self.parse_dict()
+		if character == "(":
+			return self.parse_array()
+		if character == "\"":
+			return self.parse_quoted()
+		if character == "<":
+			return self.parse_data()
+		return self.parse_bare()
+
+	def parse_dict(self):
+		self.index += 1
+		result = {}
+		while True:
+			self.skip_whitespace()
+			if self.text[self.index:self.index + 1] == "}":
+				self.index += 1
+				return result
+			start = self.index
+			key = self.parse_value()
+			# keys are quoted inconsistently across Glyphs versions, keep them the way they were written
+			raw = self.text[start:self.index]
+			if not isinstance(key, str):
+				key = raw
+			if raw != dump_key(key):
+				key = QuotedString(key)
+				key.raw = raw
+			self.expect("=")
+			result[key] = self.parse_value()
+			self.expect(";")
+
+	def parse_array(self):
+		self.index += 1
+		result = []
+		while True:
+			self.skip_whitespace()
+			if self.text[self.index:self.index + 1] == ")":
+				self.index += 1
+				return result
+			result.append(self.parse_value())
+			self.skip_whitespace()
+			if self.text[self.index:self.index + 1] == ",":
+				self.index += 1
+
+	def parse_quoted(self):
+		text = self.text
+		start = self.index
+		self.index += 1
+		characters = []
+		while True:
+			if self.index >= len(text):
+				raise OpenStepError("Unterminated string")
+			character = text[self.index]
+			if character == "\"":
+				self.index += 1
+				value = "".join(characters)
+				raw = text[start:self.index]
+				if raw != dump_string(value):
+					value = QuotedString(value)
+					value.raw = raw
+				return value
+			if character == "\\":
+				self.index += 1
+				escape = text[self.index]
+				if escape in ESCAPES:
+					characters.append(ESCAPES[escape])
+					self.index += 1
+				elif escape in "Uu":
+					characters.append(chr(int(text[self.index + 1:self.index + 5], 16)))
+					self.index += 5
+				elif escape in "01234567":
+					end = self.index
+					while end < self.index + 3 and text[end] in "01234567":
+						end += 1
+					characters.append(chr(int(text[self.index:end], 8)))
+					self.index = end
+				else:
+					characters.append(escape)
+					self.index += 1
+				continue
+			characters.append(character)
+			self.index += 1
+
+	def parse_data(self):
+		end = self.text.find(">", self.index)
+		if end < 0:
+			raise OpenStepError("Unterminated data")
+		data = re.sub(r"\s", "", self.text[self.index + 1:end])
+		self.index = end + 1
+		return bytes(bytearray.fromhex(data))
+
+	def parse_bare(self):
+		match = BARE.match(self.text, self.index)
+		if not match:
+			raise OpenStepError("Unexpected %r at offset %s" % (self.text[self.index], self.index))
+		self.index = match.end()
+		return bare_value(match.group())
+
+
+def bare_value(token):
+	if INTEGER.match(token):
+		return int(token)
+	if FLOAT.match(token):
+		return float(token)
+	return token
+
+
+def loads(text):
+	return OpenStepParser(text).parse()
+
+
+def load(path):
+	with open(path, encoding="utf-8") as f:
+		return loads(f.read())
+
+
+# strings written without quotes, as long as they would not be read back as numbers
+UNQUOTED = re.compile(r"[A-Za-z0-9_./]+$")
+
+
+def dump_string(value):
+	if getattr(value, "raw", None):
+		return value.raw
+	if UNQUOTED.match(value) and not isinstance(bare_value(value), (int, float)):
+		return value
+	return "\"%s\"" % value.replace("\\", "\\\\").replace("\"", "\\\"")
+
+
+def dump_number(value):
+	if isinstance(value, float) and value.is_integer():
+		return str(int(value))
+	if isinstance(value, float):
+		return repr(round(value, 5))
+	return str(value)
+
+
+# keys whose lists of numbers Glyphs writes on one line, like points
+INLINE_KEYS = {
+	"pos", "origin", "scale", "target", "place", "slant", "crop", "start", "end", "unicode", "color", "fillColor",
+	"strokeColor", "other1", "other2",
+}
+
+
+def dump_key(key):
+	if getattr(key, "raw", None):
+		return key.raw
+	return key if UNQUOTED.match(key) else dump_string(key)
+
+
+def dump_value(value, lines, prefix="", key=None, in_nodes=False, in_array=False):
+	# appends the lines of a value, the first line starts with the prefix, for example "key = "
+	if isinstance(value, dict):
+		lines.append(prefix + "{")
+		for item_key, item in value.items():
+			dump_value(item, lines, "%s = " % dump_key(item_key), item_key)
+			lines[-1] += ";"
+		lines.append("}")
+	elif isinstance(value, (list, tuple)):
+		# points, node tuples and lists of numbers within lists (like colors in palettes) stay on one line
+		scalars = value[:-1] if in_nodes and value and isinstance(value[-1], dict) else value
+		numbers = in_array and all(isinstance(item, (int, float)) for item in value)
+		if scalars and all(not isinstance(item, (dict, list)) for item in scalars) and (key in INLINE_KEYS or in_nodes or numbers):
+			line = prefix + "(" + ",".join(dump_scalar(item) for item in scalars)
+			if len(scalars) < len(value):
+				# node tuples can end with the node's user data
+				dump_value(value[-1], lines, line + ",")
+				lines[-1] += ")"
+			else:
+				lines.append(line + ")")
+			return
+		lines.append(prefix + "(")
+		for index, item in enumerate(value):
+			dump_value(item, lines, in_nodes=key == "nodes", in_array=True)
+			if index < len(value) - 1:
+				lines[-1] += ","
+		lines.append(")")
+	else:
+		lines.append(prefix + dump_scalar(value))
+
+
+def dump_scalar(value):
+	if isinstance(value, bool):
+		return "1" if value else "0"
+	if isinstance(value, (int, float)):
+		return dump_number(value)
+	if isinstance(value, bytes):
+		return "<%s>" % value.hex()
+	return dump_string(value)
+
+
+def dumps(value):
+	lines = []
+	dump_value(value, lines)
+	return "\n".join(lines) + "\n"
+
+
+def dump(value, path):
+	with open(path, "w", encoding="utf-8") as f:
+		f.write(dumps(value))
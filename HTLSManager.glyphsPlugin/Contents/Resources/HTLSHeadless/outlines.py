@@ -0,0 +1,139 @@
+from __future__ import division, print_function, unicode_literals
+import math
+from HTLSHeadless.model import GSFont, GSFontMaster, GSGlyph, GSLayer, GSPath, GSNode, GSComponent, GSUppercase, \
+	GSLowercase, GSNoCase
+
+# circle approximation with cubic curves
+KAPPA = 0.5522847498
+
+
+def rectangle(x0, y0, x1, y1):
+	return GSPath([GSNode(x0, y0), GSNode(x1, y0), GSNode(x1, y1), GSNode(x0, y1)])
+
+
+def ellipse(cx, cy, rx, ry, clockwise=False):
+	kx, ky = rx * KAPPA, ry * KAPPA
+	nodes = [
+		GSNode(cx + kx, cy - ry, "offcurve"), GSNode(cx + rx, cy - ky, "offcurve"), GSNode(cx + rx, cy, "curve"),
+		GSNode(cx + rx, cy + ky, "offcurve"), GSNode(cx + kx, cy + ry, "offcurve"), GSNode(cx, cy + ry, "curve"),
+		GSNode(cx - kx, cy + ry, "offcurve"), GSNode(cx - rx, cy + ky, "offcurve"), GSNode(cx - rx, cy, "curve"),
+		GSNode(cx - rx, cy - ky, "offcurve"), GSNode(cx - kx, cy - ry, "offcurve"), GSNode(cx, cy - ry, "curve"),
+	]
+	if clockwise:
+		nodes = reverse_nodes(nodes)
+	return GSPath(nodes)
+
+
+def polygon_ring(cx, cy, rx, ry, count, wobble=0, clockwise=False):
+	# many short curves around an ellipse, for outlines with a high node count
+	nodes = []
+	step = 2 * math.pi / count
+	for i in range(count):
+		angle = i * step
+		radius = 1 + wobble * math.sin(angle * 7)
+		next_angle = angle + step
+		nodes.append(GSNode(cx + rx * radius * math.cos(angle + step / 3), cy + ry * radius * math.sin(angle + step / 3), "offcurve"))
+		nodes.append(GSNode(cx + rx * radius * math.cos(angle + 2 * step / 3), cy + ry * radius * math.sin(angle + 2 * step / 3), "offcurve"))
+		nodes.append(GSNode(cx + rx * radius * math.cos(next_angle), cy + ry * radius * math.sin(next_angle), "curve"))
+	if clockwise:
+		nodes = reverse_nodes(nodes)
+	return GSPath(nodes)
+
+
+def reverse_nodes(nodes):
+	# reverse the direction of a closed path, an on-curve node takes the type of the segment that now ends on it
+	on_curve = [i for i, node in enumerate(nodes) if node.type != "offcurve"]
+	types = {}
+	for index, i in enumerate(on_curve):
+		types[i] = nodes[on_curve[(index + 1) % len(on_curve)]].type
+	return [GSNode(nodes[i].x, nodes[i].y, types.get(i, "offcurve")) for i in reversed(range(len(nodes)))]
+
+
+def arch(left, right, stem, top, shoulder):
+	# stem with an arch, the shape of n and h
+	middle = (left + right) / 2
+	return GSPath([
+		GSNode(left, 0), GSNode(left + stem, 0), GSNode(left + stem, shoulder),
+		GSNode(left + stem + 30, shoulder + 50, "offcurve"), GSNode(middle - 30, top - 70, "offcurve"),
+		GSNode(middle, top - 70, "curve"),
+		GSNode(right - stem - 10, top - 70, "offcurve"), GSNode(right - stem, top - 90, "offcurve"),
+		GSNode(right - stem, shoulder - 20, "curve"),
+		GSNode(right - stem, 0), GSNode(right, 0), GSNode(right, shoulder),
+		GSNode(right, top - 30, "offcurve"), GSNode(right - 60, top + 10, "offcurve"), GSNode(middle + 10, top + 10, "curve"),
+		GSNode(middle - 70, top + 10, "offcurve"), GSNode(left + stem + 20, top - 30, "offcurve"),
+		GSNode(left + stem, top - 70, "curve"),
+		GSNode(left + stem, top), GSNode(left, top),
+	])
+
+
+# name: (category, subcategory, case, function returning (paths, components, width))
+GLYPHS = {
+	"H": ("Letter", None, GSUppercase, lambda: (
+		[rectangle(60, 0, 150, 700), rectangle(150, 320, 510, 390), rectangle(510, 0, 600, 700)], [], 660
+	)),
+	"O": ("Letter", None, GSUppercase, lambda: (
+		[ellipse(350, 350, 310, 360), ellipse(350, 350, 220, 290, clockwise=True)], [], 700
+	)),
+	"l": ("Letter", None, GSLowercase, lambda: ([rectangle(60, 0, 150, 720)], [], 210)),
+	"n": ("Letter", None, GSLowercase, lambda: ([arch(60, 480, 90, 500, 380)], [], 540)),
+	"o": ("Letter", None, GSLowercase, lambda: (
+		[ellipse(270, 250, 230, 260), ellipse(270, 250, 145, 190, clockwise=True)], [], 540
+	)),
+	"zero": ("Number", "Decimal Digit", GSNoCase, lambda: (
+		[ellipse(280, 350, 230, 360), ellipse(280, 350, 145, 290, clockwise=True)], [], 560
+	)),
+	"acutecomb": ("Mark", "Nonspacing", GSNoCase, lambda: (
+		[GSPath([GSNode(-30, 560), GSNode(30, 560), GSNode(110, 720), GSNode(20, 720)])], [], 0
+	)),
+	"oacute": ("Letter", None, GSLowercase, lambda: (
+		[], [GSComponent("o"), GSComponent("acutecomb", (250, 0))], 540
+	)),
+	"bracketleft": ("Punctuation", "Parenthesis", GSNoCase, lambda: (
+		[rectangle(80, -200, 160, 800), rectangle(160, -200, 300, -130), rectangle(160, 730, 300, 800)], [], 330
+	)),
+	"registered": ("Symbol", None, GSNoCase, lambda: (
+		[polygon_ring(400, 350, 380, 380, 96), polygon_ring(400, 350, 310, 310, 96, wobble=0.05, clockwise=True)],
+		[],
+		800
+	)),
+}
+
+
+def scaled(paths, components, scale, slant, x_height):
+	skew = math.tan(math.radians(slant))
+	transform = (scale, 0, skew * scale, scale, -skew * scale * x_height / 2, 0)
+	for path in paths:
+		path.applyTransform(transform)
+	for component in components:
+		a, b, c, d, tx, ty = component.transform
+		component.transform = (a, b, c, d, tx * scale + skew * ty * scale, ty * scale)
+	return paths, components
+
+
+def build_font(upm=1000, italic_angles=(0,), copies=1, parameters=None):
+	"""
+	Synthetic font with stems, bowls, a composite, a tall bracket and a high node count outline, in one master per
+	italic angle. With copies, the glyph set is repeated under suffixed names to measure throughput on larger fonts.
+	"""
+	scale = upm / 1000
+	font = GSFont(upm=upm, familyName="Synthetic %s" % upm)
+	for angle in italic_angles:
+		master = font.add_master(GSFontMaster(
+			name="Italic %s" % angle if angle else "Regular",
+			xHeight=500 * scale,
+			italicAngle=angle
+		))
+		for key, value in (parameters or {}).items():
+			master.customParameters[key] = value
+
+	for copy in range(copies):
+		suffix = ".%03d" % copy if copy else ""
+		for name, (category, sub_category, case, outline) in GLYPHS.items():
+			glyph = font.add_glyph(GSGlyph(name + suffix, category, sub_category, case))
+			for master in font.masters:
+				paths, components, width = outline()
+				for component in components:
+					component.componentName += suffix
+				paths, components = scaled(paths, components, scale, master.italicAngle, 500)
+				glyph.add_layer(GSLayer(master.id, width * scale, paths, components, name=master.name))
+	return font
@@ -0,0 +1,509 @@
+from __future__ import division, print_function, unicode_literals
+import hashlib
+import math
+import os
+import plistlib
+import re
+import shutil
+import xml.etree.ElementTree as ElementTree
+from HTLSHeadless import openstep
+from HTLSHeadless.glyphinfo import glyph_info
+from HTLSHeadless.model import GSFont, GSFontMaster, GSGlyph, GSLayer, GSPath, GSNode, GSComponent, UserData, \
+	GSUppercase, GSLowercase, GSSmallcaps, GSMinor, GSOther
+
+# node types of the Glyphs 3 format
+NODE_TYPES = {"l": "line", "c": "curve", "o": "offcurve", "q": "qcurve"}
+
+CASES = {"upper": GSUppercase, "lower": GSLowercase, "smallCaps": GSSmallcaps, "minor": GSMinor, "other": GSOther}
+
+# glyphsLib stores Glyphs data in the UFO lib under these keys
+UFO_CUSTOM_PARAMETER = "com.schriftgestaltung.customParameter.GSFontMaster."
+UFO_MASTER_USER_DATA = "com.schriftgestaltung.fontMaster.userData"
+UFO_MASTER_ID = "com.schriftgestaltung.fontMasterID"
+UFO_GLYPH_CATEGORY = "com.schriftgestaltung.Glyphs.category"
+UFO_GLYPH_SUB_CATEGORY = "com.schriftgestaltung.Glyphs.subCategory"
+UFO_GLYPH_CASE = "com.schriftgestaltung.Glyphs.case"
+
+
+def load_font(path):
+	"""Load a .glyphs file, .glyphspackage, UFO or designspace into the in-memory model."""
+	path = os.path.normpath(path)
+	extension = os.path.splitext(path)[1].lower()
+	if extension == ".glyphs":
+		font = glyphs_font(openstep.load(path))
+	elif extension == ".glyphspackage":
+		data, glyph_files = read_glyphs_package(path)
+		font = glyphs_font(data)
+		for glyph in font.glyphs:
+			glyph.source_file = glyph_files.get(glyph.name)
+	elif extension == ".ufo":
+		font = ufo_font([(path, None)])
+	elif extension == ".designspace":
+		font = ufo_font(read_designspace(path))
+	else:
+		raise ValueError("Unsupported source format: %s" % path)
+	font.filepath = path
+	return font
+
+
+def source_files(path):
+	"""Every file a source is read from: the file itself, or all files in the UFOs it consists of."""
+	if path.lower().endswith(".designspace"):
+		folders = [ufo_path for ufo_path, location in read_designspace(path)]
+		files = [path]
+	elif os.path.isdir(path):
+		folders = [path]
+		files = []
+	else:
+		return [path]
+	for folder in folders:
+		for root, directories, file_names in os.walk(folder):
+			files += [os.path.join(root, file_name) for file_name in file_names]
+	return files
+
+
+def source_digest(path):
+	"""Hash of the contents of a source, the same on every machine for the same source."""
+	path = os.path.normpath(path)
+	folder = path if os.path.isdir(path) else os.path.dirname(path)
+	digest = hashlib.sha1()
+	for file_path in sorted(source_files(path)):
+		digest.update(os.path.relpath(file_path, folder).replace(os.sep, "/").encode("utf-8"))
+		with open(file_path, "rb") as f:
+			digest.update(f.read())
+	return digest.hexdigest()
+
+
+def open_font(path):
+	"""Load a source and make it the current font of the Glyphs stand-in, as Glyphs.font."""
+	from GlyphsApp import Glyphs
+
+	font = load_font(path)
+	Glyphs.fonts.append(font)
+	Glyphs.font = font
+	return font
+
+
+def user_data(value):
+	data = UserData()
+	data.update(value or {})
+	return data
+
+
+def transform_from_glyphs(shape):
+	# Glyphs 3 stores components as position, scale and rotation angle
+	x, y = shape.get("pos", (0, 0))
+	scale_x, scale_y = shape.get("scale", (1, 1))
+	angle = math.radians(shape.get("angle", 0))
+	cos, sin = math.cos(angle), math.sin(angle)
+	return scale_x * cos, scale_x * sin, -scale_y * sin, scale_y * cos, x, y
+
+
+def parse_transform(text):
+	# Glyphs 2 stores component transforms as "{a, b, c, d, tx, ty}"
+	return tuple(float(value) for value in text.strip("{} ").split(","))
+
+
+def read_glyphs_package(path):
+	"""The contents of a package as one .glyphs file, and the .glyph file of every glyph."""
+	with open(os.path.join(path, "fontinfo.plist"), encoding="utf-8") as f:
+		data = openstep.loads(f.read())
+	order = []
+	order_path = os.path.join(path, "order.plist")
+	if os.path.exists(order_path):
+		order = openstep.load(order_path)
+
+	glyphs = {}
+	glyph_files = {}
+	glyphs_folder = os.path.join(path, "glyphs")
+	for file_name in sorted(os.listdir(glyphs_folder)):
+		if file_name.endswith(".glyph"):
+			glyph = openstep.load(os.path.join(glyphs_folder, file_name))
+			glyphs[str(glyph["glyphname"])] = glyph
+			glyph_files[str(glyph["glyphname"])] = os.path.join(glyphs_folder, file_name)
+	data["glyphs"] = [glyphs.pop(name) for name in order if name in glyphs] + list(glyphs.values())
+	return data, glyph_files
+
+
+def glyphs_master(data, master_data, version):
+	master = GSFontMaster(name=master_data.get("name", "Regular"), id=master_data["id"])
+	if version >= 3:
+		# metric values are stored in the order of the font's metric definitions, a metric without a filter wins
+		metrics = data.get("metrics", [])
+		values = master_data.get("metricValues", [])
+		for metric, value in sorted(zip(metrics, values), key=lambda item: "filter" not in item[0]):
+			if metric.get("type") == "x-height":
+				master.xHeight = value.get("pos", 0)
+			elif metric.get("type") == "italic angle":
+				master.italicAngle = value.get("pos", 0)
+		master.axes = list(master_data.get("axesValues", []))
+	else:
+		master.xHeight = master_data.get("xHeight", 500)
+		master.italicAngle = master_data.get("italicAngle", 0)
+		# without an Axes parameter, Glyphs 2 fonts have weight and width axes
+		axes_count = len(parameter_value(data, "Axes") or [None, None])
+		master.axes = [
+			master_data.get(key, default) for key, default in
+			[("weightValue", 100), ("widthValue", 100), ("customValue", 0), ("customValue1", 0), ("customValue2", 0)]
+		][:axes_count]
+		master.name = master_data.get("name") or " ".join(
+			str(master_data[key]) for key in ("weight", "width", "custom") if master_data.get(key)
+		) or "Regular"
+
+	for parameter in master_data.get("customParameters", []):
+		master.customParameters[parameter["name"]] = parameter["value"]
+	master.userData = user_data(master_data.get("userData"))
+	return master
+
+
+def parameter_value(data, name):
+	for parameter in data.get("customParameters", []):
+		if parameter["name"] == name:
+			return parameter["value"]
+	return None
+
+
+def glyphs_path(path_data, version):
+	nodes = []
+	for node in path_data.get("nodes", []):
+		if version >= 3:
+			x, y, node_type = node[0], node[1], node[2]
+			nodes.append(GSNode(x, y, NODE_TYPES.get(node_type[0], "line")))
+		else:
+			parts = node.split()
+			nodes.append(GSNode(float(parts[0]), float(parts[1]), parts[2].lower()))
+	return GSPath(nodes, bool(path_data.get("closed", 1)))
+
+
+def glyphs_layer(layer_data, version):
+	# Glyphs always writes the width of master layers, 600 is the width of new glyphs
+	layer = GSLayer(layer_data["layerId"], layer_data.get("width", 600), name=layer_data.get("name"))
+	if version >= 3:
+		for shape in layer_data.get("shapes", []):
+			if "ref" in shape:
+				layer.add_component(GSComponent(shape["ref"], transform=transform_from_glyphs(shape)))
+			else:
+				layer.paths.append(glyphs_path(shape, version))
+		layer.leftMetricsKey = layer_data.get("metricLeft")
+		layer.rightMetricsKey = layer_data.get("metricRight")
+		layer.widthMetricsKey = layer_data.get("metricWidth")
+	else:
+		for path_data in layer_data.get("paths", []):
+			layer.paths.append(glyphs_path(path_data, version))
+		for component in layer_data.get("components", []):
+			transform = parse_transform(component["transform"]) if "transform" in component else None
+			layer.add_component(GSComponent(component["name"], transform=transform))
+		layer.leftMetricsKey = layer_data.get("leftMetricsKey")
+		layer.rightMetricsKey = layer_data.get("rightMetricsKey")
+		layer.widthMetricsKey = layer_data.get("widthMetricsKey")
+	return layer
+
+
+def glyphs_unicode(value, version):
+	if value is None or value == "":
+		return None
+	if isinstance(value, list):
+		value = value[0]
+	if version >= 3:
+		return int(value)
+	return int(str(value).split(",")[0], 16)
+
+
+def glyphs_font(data):
+	version = data.get(".formatVersion", 2)
+	font = GSFont(upm=data.get("unitsPerEm", 1000), familyName=data.get("familyName", "Untitled"))
+	font.source_data = data
+	font.userData = user_data(data.get("userData"))
+	for parameter in data.get("customParameters", []):
+		font.customParameters[parameter["name"]] = parameter["value"]
+	font.axes = [dict(axis) for axis in data.get("axes", parameter_value(data, "Axes") or [])]
+
+	for master_data in data.get("fontMaster", []):
+		font.add_master(glyphs_master(data, master_data, version))
+	master_ids = set(master.id for master in font.masters)
+
+	for glyph_data in data.get("glyphs", []):
+		name = str(glyph_data["glyphname"])
+		unicode_value = glyphs_unicode(glyph_data.get("unicode"), version)
+		category, sub_category, case = glyph_info(name, unicode_value)
+		glyph = GSGlyph(
+			name,
+			glyph_data.get("category") or category,
+			glyph_data.get("subCategory") or sub_category,
+			CASES.get(glyph_data.get("case"), case),
+			unicode_value
+		)
+		if version >= 3:
+			glyph.leftMetricsKey = glyph_data.get("metricLeft")
+			glyph.rightMetricsKey = glyph_data.get("metricRight")
+			glyph.widthMetricsKey = glyph_data.get("metricWidth")
+		else:
+			glyph.leftMetricsKey = glyph_data.get("leftMetricsKey")
+			glyph.rightMetricsKey = glyph_data.get("rightMetricsKey")
+			glyph.widthMetricsKey = glyph_data.get("widthMetricsKey")
+		glyph.lastChange = glyph_data.get("lastChange")
+		glyph.source_data = glyph_data
+		glyph.userData = user_data(glyph_data.get("userData"))
+
+		for layer_data in glyph_data.get("layers", []):
+			# only master layers are spaced, brace and backup layers have an associated master ID of their own
+			if layer_data.get("layerId") not in master_ids or "associatedMasterId" in layer_data:
+				continue
+			layer = glyphs_layer(layer_data, version)
+			layer.source_data = layer_data
+			# master layers are named after their master
+			layer.name = layer.name or font.masters[layer.associatedMasterId].name
+			glyph.add_layer(layer)
+		font.add_glyph(glyph)
+	return font
+
+
+def read_designspace(path):
+	"""(UFO path, axis location) of every source in a designspace file."""
+	root = ElementTree.parse(path).getroot()
+	folder = os.path.dirname(path)
+	axes = [axis.get("name") for axis in root.iter("axis")]
+	sources = []
+	for source in root.iter("source"):
+		location = {}
+		for dimension in source.iter("dimension"):
+			location[dimension.get("name")] = float(dimension.get("xvalue", 0))
+		sources.append((os.path.join(folder, source.get("filename")), [location.get(axis, 0) for axis in axes]))
+	return sources
+
+
+def read_plist(path):
+	if not os.path.exists(path):
+		return {}
+	with open(path, "rb") as f:
+		return plistlib.load(f)
+
+
+def glif_outline(root, layer):
+	outline = root.find("outline")
+	if outline is None:
+		return
+	for element in outline:
+		if element.tag == "contour":
+			nodes = []
+			closed = True
+			for point in element.iter("point"):
+				point_type = point.get("type", "offcurve")
+				if point_type == "move":
+					closed = False
+					point_type = "line"
+				nodes.append(GSNode(float(point.get("x")), float(point.get("y")), point_type))
+			layer.paths.append(GSPath(nodes, closed))
+		elif element.tag == "component":
+			transform = (
+				float(element.get("xScale", 1)), float(element.get("xyScale", 0)),
+				float(element.get("yxScale", 0)), float(element.get("yScale", 1)),
+				float(element.get("xOffset", 0)), float(element.get("yOffset", 0)),
+			)
+			layer.add_component(GSComponent(element.get("base"), transform=transform))
+
+
+def glif_lib(root):
+	lib = root.find("lib")
+	if lib is None or not len(lib):
+		return {}
+	return plistlib.loads(b"<plist version=\"1.0\">" + ElementTree.tostring(lib[0]) + b"</plist>")
+
+
+def ufo_font(sources):
+	"""One font from one or more UFOs, every UFO becomes a master."""
+	font = None
+	glyphs = {}
+	for ufo_path, location in sources:
+		if not os.path.isdir(ufo_path):
+			raise ValueError("UFO not found: %s" % ufo_path)
+		info = read_plist(os.path.join(ufo_path, "fontinfo.plist"))
+		lib = read_plist(os.path.join(ufo_path, "lib.plist"))
+		if font is None:
+			font = GSFont(upm=info.get("unitsPerEm", 1000), familyName=info.get("familyName", "Untitled"))
+			font.userData = user_data({key: value for key, value in lib.items() if key.startswith("com.eweracs.")})
+
+		# masters keep the same ID every time the UFO is loaded, so results can refer to them
+		file_name = os.path.splitext(os.path.basename(ufo_path))[0]
+		master = font.add_master(GSFontMaster(
+			name=info.get("styleName") or file_name,
+			id=lib.get(UFO_MASTER_ID) or file_name,
+			xHeight=info.get("xHeight", 500),
+			italicAngle=-info.get("italicAngle", 0),
+			axes=location
+		))
+		for key, value in lib.items():
+			if key.startswith(UFO_CUSTOM_PARAMETER):
+				master.customParameters[key[len(UFO_CUSTOM_PARAMETER):]] = value
+		master.userData = user_data(lib.get(UFO_MASTER_USER_DATA))
+
+		glyphs_folder = os.path.join(ufo_path, "glyphs")
+		contents = read_plist(os.path.join(glyphs_folder, "contents.plist"))
+		order = lib.get("public.glyphOrder", [])
+		names = [name for name in order if name in contents] + sorted(name for name in contents if name not in order)
+		for name in names:
+			root = ElementTree.parse(os.path.join(glyphs_folder, contents[name])).getroot()
+			glyph = glyphs.get(name)
+			if glyph is None:
+				unicode_element = root.find("unicode")
+				unicode_value = int(unicode_element.get("hex"), 16) if unicode_element is not None else None
+				category, sub_category, case = glyph_info(name, unicode_value)
+				glyph_lib = glif_lib(root)
+				glyph = GSGlyph(
+					name,
+					glyph_lib.get(UFO_GLYPH_CATEGORY, category),
+					glyph_lib.get(UFO_GLYPH_SUB_CATEGORY, sub_category),
+					CASES.get(glyph_lib.get(UFO_GLYPH_CASE), case),
+					unicode_value
+				)
+				glyphs[name] = font.add_glyph(glyph)
+			advance = root.find("advance")
+			layer = GSLayer(master.id, float(advance.get("width", 0)) if advance is not None else 0, name=master.name)
+			glyph.add_layer(layer)
+			glif_outline(root, layer)
+			layer.source_file = os.path.join(glyphs_folder, contents[name])
+
+	# glyphs missing from some of the UFOs get empty layers, like new glyphs in Glyphs
+	for glyph in font.glyphs:
+		for master in font.masters:
+			if master.id not in glyph.layers:
+				glyph.add_layer(GSLayer(master.id, name=master.name))
+	return font
+
+
+def save_font(font, path=None):
+	"""
+	Write the widths and horizontal outline positions of all master layers back into the source the font was
+	loaded from, or into a copy of it at another path. Everything else is written back the way it was read.
+	"""
+	source = font.filepath
+	if source is None:
+		raise ValueError("The font was not loaded from a source")
+	path = os.path.normpath(path or source)
+	extension = os.path.splitext(source)[1].lower()
+
+	if extension == ".glyphs":
+		version = font.source_data.get(".formatVersion", 2)
+		for glyph in font.glyphs:
+			for layer in glyph.layers.values():
+				patch_glyphs_layer(layer, version)
+		openstep.dump(font.source_data, path)
+		return path
+
+	if extension == ".designspace" and path != source:
+		raise ValueError("Designspace sources can only be written in place")
+	if path != source:
+		shutil.copytree(source, path, dirs_exist_ok=True)
+
+	def target(file_path):
+		return os.path.join(path, os.path.relpath(file_path, source)) if path != source else file_path
+
+	if extension == ".glyphspackage":
+		# only the .glyph files of glyphs that changed are written
+		version = font.source_data.get(".formatVersion", 2)
+		for glyph in font.glyphs:
+			changed = [patch_glyphs_layer(layer, version) for layer in glyph.layers.values()]
+			if any(changed) and glyph.source_file:
+				openstep.dump(glyph.source_data, target(glyph.source_file))
+	else:
+		for glyph in font.glyphs:
+			for layer in glyph.layers.values():
+				if layer.source_file:
+					patch_glif(layer, target(layer.source_file))
+	return path
+
+
+# the x coordinate at the start of a Glyphs 2 node like "354 0 LINE"
+NODE_X = re.compile(r"^(-?[0-9.]+)")
+
+
+def shifted(value, offset):
+	value = float(value) + offset
+	return int(value) if value.is_integer() else round(value, 5)
+
+
+def shift_point_string(text, offset):
+	# Glyphs 2 points and transforms like "{354, 0}" or "{1, 0, 0, 1, 10, 0}", x is the second to last value
+	values = [value.strip() for value in text.strip("{} ").split(",")]
+	values[-2] = openstep.dump_number(shifted(values[-2], offset))
+	return "{%s}" % ", ".join(values)
+
+
+def set_sorted(data, key, value):
+	# Glyphs writes the keys of shapes and anchors in alphabetical order, keys that were left out are inserted there
+	if key in data:
+		data[key] = value
+		return
+	data[key] = value
+	items = sorted(data.items())
+	data.clear()
+	data.update(items)
+
+
+def patch_glyphs_layer(layer, version):
+	"""Update the parsed .glyphs layer a layer was read from, returns whether anything changed."""
+	layer_data = layer.source_data
+	if layer_data is None or (not layer.x_offset and layer_data.get("width", 600) == layer.width):
+		return False
+	offset = layer.x_offset
+	layer_data["width"] = shifted(layer.width, 0)
+
+	if offset and version >= 3:
+		for shape in layer_data.get("shapes", []):
+			if "ref" in shape:
+				x, y = shape.get("pos", (0, 0))
+				set_sorted(shape, "pos", [shifted(x, offset), y])
+			for node in shape.get("nodes", []):
+				node[0] = shifted(node[0], offset)
+		for anchor in layer_data.get("anchors", []):
+			x, y = anchor.get("pos", (0, 0))
+			set_sorted(anchor, "pos", [shifted(x, offset), y])
+	elif offset:
+		for path_data in layer_data.get("paths", []):
+			path_data["nodes"] = [
+				NODE_X.sub(lambda match: openstep.dump_number(shifted(match.group(1), offset)), node, 1)
+				for node in path_data.get("nodes", [])
+			]
+		for component in layer_data.get("components", []):
+			transform = shift_point_string(component.get("transform", "{1, 0, 0, 1, 0, 0}"), offset)
+			set_sorted(component, "transform", transform)
+		for anchor in layer_data.get("anchors", []):
+			set_sorted(anchor, "position", shift_point_string(anchor.get("position", "{0, 0}"), offset))
+
+	# the layer now matches the source, so saving again does not shift it twice
+	layer.x_offset = 0
+	return True
+
+
+def patch_glif(layer, file_path):
+	"""Update the .glif file a layer was read from, returns whether anything changed."""
+	tree = ElementTree.parse(file_path)
+	root = tree.getroot()
+	advance = root.find("advance")
+	width = float(advance.get("width", 0)) if advance is not None else 0
+	offset = layer.x_offset
+	if not offset and width == layer.width:
+		return False
+
+	if advance is None:
+		advance = ElementTree.Element("advance")
+		root.insert(0, advance)
+	advance.set("width", openstep.dump_number(shifted(layer.width, 0)))
+	if offset:
+		outline = root.find("outline")
+		for element in outline if outline is not None else []:
+			if element.tag == "contour":
+				for point in element.iter("point"):
+					point.set("x", openstep.dump_number(shifted(point.get("x"), offset)))
+			elif element.tag == "component":
+				element.set("xOffset", openstep.dump_number(shifted(element.get("xOffset", 0), offset)))
+		for anchor in root.iter("anchor"):
+			anchor.set("x", openstep.dump_number(shifted(anchor.get("x", 0), offset)))
+
+	with open(file_path, "w", encoding="utf-8") as f:
+		f.write("<?xml version=\"1.0\" encoding=\"UTF-8\"?>\n")
+		# empty elements are closed like ufoLib does
+		f.write(ElementTree.tostring(root, encoding="unicode").replace(" />", "/>"))
+		f.write("\n")
+	layer.x_offset = 0
+	return True
@@ -0,0 +1,223 @@
+from __future__ import division, print_function, unicode_literals
+import gzip
+import json
+import multiprocessing
+import zlib
+import HTLSHeadless
+
+HTLSHeadless.install()
+
+from HTLSLibrary import HTLSEngine, HTLSDiagnostics, set_sidebearings
+from HTLSHeadless.sources import load_font, source_digest
+
+# the font of a worker process, loaded once when the process starts
+worker_font = None
+
+
+def select_layers(font, glyph_names=None, master_names=None):
+	"""(glyph name, master ID) of every master layer to space, all glyphs and masters if none are given."""
+	masters = [master for master in font.masters if not master_names or master.name in master_names or master.id in master_names]
+	glyphs = [glyph for glyph in font.glyphs if not glyph_names or glyph.name in glyph_names]
+	return [(glyph.name, master.id) for glyph in glyphs for master in masters if glyph.layers.get(master.id)]
+
+
+def space_layers(font, keys, rule_index=None, profiles=None):
+	"""
+	Compute the sidebearings of the given layers without changing them. Returns a result per layer and the
+	problems found, as a list of diagnostics entries. A rule index and a profile cache (see HTLSEngine) can be
+	shared by several calls for the same font.
+	"""
+	diagnostics = HTLSDiagnostics()
+	results = []
+	for glyph_name, master_id in keys:
+		layer = font.glyphs[glyph_name].layers[master_id]
+		result = {
+			"glyph": glyph_name,
+			"master": layer.master.name,
+			"masterId": master_id,
+			"LSB": layer.LSB,
+			"RSB": layer.RSB,
+			"newLSB": None,
+			"newRSB": None,
+			"rule": None,
+			"reference": None,
+			"referenceGlyph": None,
+			"factor": None,
+			"skipReason": None,
+		}
+		results.append(result)
+		try:
+			engine = HTLSEngine(layer, diagnostics=diagnostics, rule_index=rule_index, profiles=profiles)
+			new_lsb, new_rsb = engine.current_layer_sidebearings() or [None, None]
+		except Exception as e:
+			diagnostics.add("engine-error", glyph_name, layer.master.name, repr(e))
+			result["status"] = "failed"
+			result["skipReason"] = "engine-error"
+			continue
+		result["newLSB"], result["newRSB"] = new_lsb, new_rsb
+		# the glyph the layer was measured against, glyphs depend on their reference glyph's outline
+		result["reference"] = engine.reference_layer.parent.name
+		# the reference glyph the rule names, which may not be in the font yet
+		result["referenceGlyph"] = (engine.rule["referenceGlyph"] or None) if engine.rule else None
+		result["factor"] = engine.factor
+		result["rule"] = engine.rule_id
+		result["skipReason"] = engine.skip_reason
+		# the same outcomes the spacing job counts
+		if new_lsb is None and new_rsb is None:
+			result["status"] = "skipped"
+		elif new_lsb == layer.LSB and new_rsb == layer.RSB:
+			result["status"] = "unchanged"
+		else:
+			result["status"] = "spaced"
+	return results, diagnostics.entries
+
+
+def init_worker(path):
+	global worker_font
+	worker_font = load_font(path)
+
+
+def space_chunk(keys):
+	return space_layers(worker_font, keys)
+
+
+def space_font(font, keys, processes=1, chunk_size=20, rule_index=None, profiles=None):
+	"""
+	Compute the sidebearings of the given layers, in several processes if asked to. Every process loads the
+	source itself, so fonts that were not loaded from a file are always spaced in this process, and the rule index
+	and profile cache are only used in this process.
+	"""
+	if processes <= 1 or not font.filepath or len(keys) <= chunk_size:
+		return space_layers(font, keys, rule_index, profiles)
+
+	chunks = [keys[i:i + chunk_size] for i in range(0, len(keys), chunk_size)]
+	results = []
+	entries = []
+	pool = multiprocessing.Pool(processes, initializer=init_worker, initargs=(font.filepath,))
+	try:
+		for chunk_results, chunk_entries in pool.imap(space_chunk, chunks):
+			results += chunk_results
+			entries += chunk_entries
+	finally:
+		pool.close()
+		pool.join()
+	return results, entries
+
+
+def component_depth(layer, depth=0):
+	# how deeply a layer nests components, plain outlines are 0
+	if not layer.components or depth > 20:
+		return depth
+	font = layer.font
+	depths = [depth + 1]
+	for component in layer.components:
+		glyph = font.glyphs[component.componentName]
+		if glyph and glyph.layers.get(layer.associatedMasterId):
+			depths.append(component_depth(glyph.layers[layer.associatedMasterId], depth + 1))
+	return max(depths)
+
+
+def apply_results(font, results):
+	"""
+	Write the computed sidebearings into the font. Moving a glyph moves the composites that use it, so base
+	glyphs are written before the composites built from them.
+	"""
+	layers = []
+	for result in results:
+		if result["status"] != "spaced":
+			continue
+		layer = font.glyphs[result["glyph"]].layers[result["masterId"]]
+		layers.append((component_depth(layer), layer, result))
+	for depth, layer, result in sorted(layers, key=lambda item: item[0]):
+		set_sidebearings(layer, result["newLSB"], result["newRSB"])
+	return len(layers)
+
+
+def summarize(results):
+	summary = {"total": len(results), "spaced": 0, "unchanged": 0, "skipped": 0, "failed": 0}
+	for result in results:
+		summary[result["status"]] += 1
+	return summary
+
+
+def parse_shard(text):
+	# "3/8" is the third of eight shards
+	index, count = (int(value) for value in text.split("/"))
+	if not 1 <= index <= count:
+		raise ValueError("Invalid shard %s, expected INDEX/COUNT with 1 <= INDEX <= COUNT" % text)
+	return index, count
+
+
+def shard_keys(keys, index, count, by="hash"):
+	"""
+	The layers of one of count shards. By hash, layers are spread by a hash of glyph name and master ID, which
+	stays the same when glyphs are added. By range, every shard gets a contiguous range of glyphs with all their
+	masters.
+	"""
+	if by == "hash":
+		return [
+			key for key in keys
+			if zlib.crc32(("%s/%s" % key).encode("utf-8")) % count == index - 1
+		]
+	names = []
+	for glyph_name, master_id in keys:
+		if not names or names[-1] != glyph_name:
+			names.append(glyph_name)
+	start = len(names) * (index - 1) // count
+	end = len(names) * index // count
+	selected = set(names[start:end])
+	return [key for key in keys if key[0] in selected]
+
+
+def write_results(path, font, results, shard=None):
+	"""Write results to a JSON file, compressed if the path ends with .gz."""
+	data = {
+		"source": font.filepath,
+		"digest": source_digest(font.filepath) if font.filepath else None,
+		"shard": shard,
+		"summary": summarize(results),
+		"results": results,
+	}
+	text = json.dumps(data, separators=(",", ":"))
+	if path.endswith(".gz"):
+		with gzip.open(path, "wt", encoding="utf-8") as f:
+			f.write(text)
+	else:
+		with open(path, "w", encoding="utf-8") as f:
+			f.write(text)
+
+
+def read_results(path):
+	if path.endswith(".gz"):
+		with gzip.open(path, "rt", encoding="utf-8") as f:
+			return json.load(f)
+	with open(path, encoding="utf-8") as f:
+		return json.load(f)
+
+
+def merge_results(font, paths):
+	"""
+	The results of several result files, in the order of the font's glyphs and masters, so merging gives the same
+	font whatever order the shards finished in. Files computed from another version of the source, and layers with
+	different results in two files, are errors.
+	"""
+	digest = source_digest(font.filepath) if font.filepath else None
+	merged = {}
+	for path in paths:
+		data = read_results(path)
+		if digest and data.get("digest") and data["digest"] != digest:
+			raise ValueError("%s was computed from a different version of the source" % path)
+		for result in data["results"]:
+			key = (result["glyph"], result["masterId"])
+			if key in merged and merged[key] != result:
+				raise ValueError("%s has a different result for %s in %s" % (path, result["glyph"], result["master"]))
+			merged[key] = result
+
+	order = {}
+	for glyph_index, glyph in enumerate(font.glyphs):
+		for master_index, master in enumerate(font.masters):
+			order[(glyph.name, master.id)] = (glyph_index, master_index)
+	missing = [key for key in merged if key not in order]
+	if missing:
+		raise ValueError("Results for layers that are not in the source: %s" % ", ".join("%s/%s" % key for key in missing[:10]))
+	return [merged[key] for key in sorted(merged, key=lambda key: order[key])]
@@ -0,0 +1,210 @@
+from __future__ import division, print_function, unicode_literals
+import os
+import time
+import HTLSHeadless
+
+HTLSHeadless.install()
+
+from HTLSLibrary import HTLSDiagnostics, HTLSRuleIndex, read_config
+from HTLSHeadless.sources import load_font, save_font, source_files
+from HTLSHeadless.spacer import select_layers, space_font, apply_results, write_results
+
+
+def snapshot(path):
+	state = {}
+	for file_path in source_files(path):
+		try:
+			stat = os.stat(file_path)
+		except OSError:
+			continue
+		state[file_path] = (stat.st_mtime, stat.st_size)
+	return state
+
+
+def layer_fingerprint(layer):
+	# everything about a layer the engine measures
+	return (
+		layer.width,
+		layer.leftMetricsKey, layer.rightMetricsKey, layer.widthMetricsKey,
+		tuple(
+			(path.closed, tuple((node.x, node.y, node.type) for node in path.nodes)) for path in layer.paths
+		),
+		tuple((component.componentName, component.transform) for component in layer.components),
+	)
+
+
+def glyph_fingerprint(glyph, master_id):
+	layer = glyph.layers.get(master_id)
+	return (
+		glyph.category, glyph.subCategory, glyph.case,
+		glyph.leftMetricsKey, glyph.rightMetricsKey, glyph.widthMetricsKey,
+		layer_fingerprint(layer) if layer else None,
+	)
+
+
+def master_fingerprint(master):
+	return (
+		master.xHeight, master.italicAngle,
+		master.customParameters["paramArea"], master.customParameters["paramDepth"],
+		repr(master.userData["HTLSManagerMasterRules"]),
+	)
+
+
+def font_fingerprint(font):
+	return font.upm, font.customParameters["isFixedPitch"], repr(read_config(font))
+
+
+class SourceWatcher:
+	"""
+	Spaces a source whenever it changes on disk. The results of the previous run are kept, and only layers whose
+	outline, glyph info, rules or master parameters changed are spaced again, together with the composites built
+	from them and the glyphs that use them as reference glyph. The margin profiles and flattened outlines of the
+	other layers, and the rule index while the rules do not change, are carried over from the previous run.
+	"""
+
+	def __init__(self, path, master_names=None, processes=1, sidecar=None, output=None):
+		self.path = os.path.normpath(path)
+		self.master_names = master_names
+		self.processes = processes
+		self.sidecar = sidecar
+		self.output = output
+		self.state = None
+		self.font_fingerprint = None
+		# key: master ID, value: master fingerprint
+		self.master_fingerprints = {}
+		# key: (glyph name, master ID), value: glyph fingerprint
+		self.glyph_fingerprints = {}
+		# key: (glyph name, master ID), value: result
+		self.results = {}
+		# the font of the previous run, its layers hold the flattened outlines
+		self.font = None
+		self.rule_index = None
+		# key: (glyph name, master ID), value: margin profile, see HTLSEngine
+		self.profiles = {}
+
+	def poll(self):
+		"""Space the source again if any of its files changed, returns whether it did."""
+		state = snapshot(self.path)
+		if state == self.state:
+			return False
+		try:
+			self.update()
+		except Exception as e:
+			# editors often write sources in several steps, the next change is tried again
+			print("Could not space %s: %r" % (self.path, e))
+			return False
+		self.state = state
+		return True
+
+	def dirty_keys(self, font, keys):
+		"""
+		The keys of the layers to space again, and the fingerprints to keep once they are spaced. The fingerprints
+		are only stored by commit, so layers of a run that fails are spaced again by the next one.
+		"""
+		new_font_fingerprint = font_fingerprint(font)
+		font_changed = new_font_fingerprint != self.font_fingerprint
+		if font_changed:
+			self.rule_index = None
+
+		changed_masters = set()
+		master_fingerprints = dict(self.master_fingerprints)
+		for master in font.masters:
+			fingerprint = master_fingerprint(master)
+			if font_changed or self.master_fingerprints.get(master.id) != fingerprint:
+				changed_masters.add(master.id)
+			master_fingerprints[master.id] = fingerprint
+
+		changed = set()
+		fingerprints = {}
+		for glyph_name, master_id in keys:
+			fingerprint = glyph_fingerprint(font.glyphs[glyph_name], master_id)
+			fingerprints[(glyph_name, master_id)] = fingerprint
+			if master_id in changed_masters or self.glyph_fingerprints.get((glyph_name, master_id)) != fingerprint:
+				changed.add((glyph_name, master_id))
+		# removed glyphs change the glyphs that referred to them
+		removed = set(self.glyph_fingerprints) - set(fingerprints)
+
+		# composites change with the glyphs they are built from
+		users = {}
+		for glyph_name, master_id in keys:
+			for component in font.glyphs[glyph_name].layers[master_id].components:
+				users.setdefault((component.componentName, master_id), []).append((glyph_name, master_id))
+		outlines = set()
+		pending = list(changed | removed)
+		while pending:
+			key = pending.pop()
+			if key in outlines:
+				continue
+			outlines.add(key)
+			pending += users.get(key, [])
+
+		dirty = outlines & set(fingerprints)
+		# by the reference glyph the rule names, so glyphs measured against themselves because it did not exist
+		# yet are spaced again once it is added
+		for key, result in self.results.items():
+			if (result.get("referenceGlyph"), key[1]) in outlines:
+				dirty.add(key)
+		for key in dirty | removed:
+			self.profiles.pop(key, None)
+		fingerprints = (new_font_fingerprint, master_fingerprints, fingerprints, removed)
+		return [key for key in keys if key in dirty], fingerprints
+
+	def commit(self, font, fingerprints):
+		self.font_fingerprint, self.master_fingerprints, self.glyph_fingerprints, removed = fingerprints
+		for key in removed:
+			self.results.pop(key, None)
+		self.font = font
+
+	def keep_outlines(self, font, keys, dirty):
+		# the watched layers that did not change keep the flattened outlines of the previous run
+		if self.font is None:
+			return
+		for glyph_name, master_id in set(keys) - set(dirty):
+			old_glyph = self.font.glyphs[glyph_name]
+			old_layer = old_glyph.layers.get(master_id) if old_glyph else None
+			layer = font.glyphs[glyph_name].layers[master_id]
+			# the outlines of layers moved by writing the output are no longer those on disk
+			if old_layer is not None and not layer.components and not old_layer.x_offset:
+				layer.cached_segments = old_layer.cached_segments
+				layer.cached_bounds = old_layer.cached_bounds
+
+	def update(self):
+		start = time.time()
+		font = load_font(self.path)
+		keys = select_layers(font, master_names=self.master_names)
+		dirty, fingerprints = self.dirty_keys(font, keys)
+		self.keep_outlines(font, keys, dirty)
+		if self.rule_index is None:
+			self.rule_index = HTLSRuleIndex(read_config(font))
+
+		results, entries = space_font(font, dirty, self.processes, rule_index=self.rule_index, profiles=self.profiles)
+		for result in results:
+			self.results[(result["glyph"], result["masterId"])] = result
+		all_results = [self.results[key] for key in keys if key in self.results]
+
+		diagnostics = HTLSDiagnostics()
+		diagnostics.entries = entries
+		if diagnostics:
+			print(diagnostics.report())
+
+		if self.sidecar:
+			write_results(self.sidecar, font, all_results)
+		if self.output:
+			apply_results(font, all_results)
+			save_font(font, self.output)
+		self.commit(font, fingerprints)
+
+		names = sorted(set(glyph_name for glyph_name, master_id in dirty))
+		print("Spaced %s of %s layers in %.2f s%s" % (
+			len(dirty), len(keys), time.time() - start, (": " + ", ".join(names[:20])) if names else ""
+		))
+		return results
+
+	def run(self, interval=0.5):
+		print("Watching %s, press Ctrl-C to stop." % self.path)
+		try:
+			while True:
+				self.poll()
+				time.sleep(interval)
+		except KeyboardInterrupt:
+			pass
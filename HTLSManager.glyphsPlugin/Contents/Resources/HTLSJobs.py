@@ -0,0 +1,217 @@
+from __future__ import division, print_function, unicode_literals
+import time
+from PyObjCTools.AppHelper import callAfter
+from HTLSLibrary import HTLSEngine, HTLSDiagnostics, HTLSRuleIndex, read_config, set_sidebearings, TRACE_OFF
+
+
+class HTLSDryRun:
+	"""
+	Computes the sidebearings every glyph of a master would get with the master's current parameters. Glyphs objects
+	are only safe to use on the main thread, so the layers are measured there in time-sliced chunks, returning to the
+	run loop between chunks so the interface stays responsive. Nothing is written to the font.
+	"""
+
+	def __init__(self, font, master, progress_callback, finished_callback, chunk_duration=0.05, font_index=None):
+		self.font = font
+		self.master = master
+		self.font_index = font_index
+		# the rules do not change during the run, so they are read and indexed once for all layers
+		self.rule_index = HTLSRuleIndex(read_config(font))
+		self.progress_callback = progress_callback
+		self.finished_callback = finished_callback
+		self.chunk_duration = chunk_duration
+		self.cancelled = False
+		self.index = 0
+		self.results = []
+		self.diagnostics = HTLSDiagnostics()
+
+		# collect the layers up front, the chunks only measure them
+		self.layers = [glyph.layers[self.master.id] for glyph in self.font.glyphs if glyph.layers[self.master.id]]
+
+	def start(self):
+		callAfter(self.run_chunk)
+
+	def cancel(self):
+		self.cancelled = True
+
+	def run_chunk(self):
+		if self.cancelled:
+			self.finished_callback(self.results, True, self.diagnostics)
+			return
+
+		chunk_end = time.time() + self.chunk_duration
+		while self.index < len(self.layers) and time.time() < chunk_end:
+			self.measure_layer(self.layers[self.index])
+			self.index += 1
+
+		self.progress_callback(self.index, len(self.layers))
+
+		if self.index < len(self.layers):
+			callAfter(self.run_chunk)
+		else:
+			self.finished_callback(self.results, False, self.diagnostics)
+
+	def measure_layer(self, layer):
+		try:
+			engine = HTLSEngine(
+				layer, font_index=self.font_index, diagnostics=self.diagnostics, rule_index=self.rule_index
+			)
+			layer_lsb, layer_rsb = engine.current_layer_sidebearings() or [None, None]
+		except Exception as e:
+			self.diagnostics.add("engine-error", layer.parent.name, self.master.name, repr(e))
+			return
+		if layer_lsb is None or layer_rsb is None:
+			return
+		# the values the engine computes, so the preview shows exactly what applying writes, including the half
+		# units of tabular glyphs
+		self.results.append({
+			"glyph": layer.parent.name,
+			"LSB": layer.LSB,
+			"newLSB": layer_lsb,
+			"deltaLSB": layer_lsb - layer.LSB,
+			"RSB": layer.RSB,
+			"newRSB": layer_rsb,
+			"deltaRSB": layer_rsb - layer.RSB,
+		})
+
+
+class HTLSSpacingJob:
+	"""
+	Spaces a list of layers on the main thread in time-sliced chunks, returning to the run loop between chunks so
+	the interface stays responsive. A cancelled job restores the sidebearings of every layer it already wrote.
+	"""
+
+	def __init__(
+			self, font, layers, progress_callback, finished_callback, chunk_duration=0.05, trace_level=TRACE_OFF,
+			profiler=None
+	):
+		self.font = font
+		self.trace_level = trace_level
+		self.profiler = profiler
+		self.layers = layers
+		self.progress_callback = progress_callback
+		self.finished_callback = finished_callback
+		self.chunk_duration = chunk_duration
+		self.cancelled = False
+		self.finished = False
+		self.index = 0
+		self.start_time = None
+		self.diagnostics = HTLSDiagnostics()
+
+		# list of (layer, LSB, RSB) from before each write, used for the rollback
+		self.written = []
+		self.summary = {
+			"total": len(self.layers),
+			"spaced": 0,
+			"unchanged": 0,
+			"skipped": 0,
+			"failed": 0,
+			"rolledBack": 0,
+			"cancelled": False,
+			"duration": 0,
+			"slowestGlyphs": [],
+		}
+
+	def start(self):
+		self.start_time = time.time()
+		# the font view only redraws once the whole job is done
+		self.font.disableUpdateInterface()
+		callAfter(self.run_chunk)
+
+	def cancel(self):
+		self.cancelled = True
+
+	def run_chunk(self):
+		try:
+			if self.cancelled:
+				self.rollback()
+				self.finish()
+				return
+
+			chunk_end = time.time() + self.chunk_duration
+			while self.index < len(self.layers) and time.time() < chunk_end:
+				self.space_layer(self.layers[self.index])
+				self.index += 1
+
+			self.progress_callback(self.index, len(self.layers), self.eta())
+		except Exception:
+			# restore the layers already written and end the job, the font view must not stay frozen
+			self.cancelled = True
+			if not self.finished:
+				try:
+					self.rollback()
+				finally:
+					self.finish()
+			raise
+
+		if self.index < len(self.layers):
+			callAfter(self.run_chunk)
+		else:
+			self.finish()
+
+	def space_layer(self, layer):
+		try:
+			engine = HTLSEngine(
+				layer, diagnostics=self.diagnostics, trace_level=self.trace_level, profiler=self.profiler
+			)
+			layer_lsb, layer_rsb = engine.current_layer_sidebearings() or [None, None]
+		except Exception as e:
+			self.diagnostics.add("engine-error", layer.parent.name, layer.master.name, repr(e))
+			self.summary["failed"] += 1
+			return
+		if self.trace_level:
+			print(engine.output)
+		if layer_lsb is None and layer_rsb is None:
+			self.summary["skipped"] += 1
+			return
+		if layer_lsb == layer.LSB and layer_rsb == layer.RSB:
+			self.summary["unchanged"] += 1
+			return
+
+		self.written.append((layer, layer.LSB, layer.RSB))
+		set_sidebearings(layer, layer_lsb, layer_rsb)
+		self.summary["spaced"] += 1
+
+	def rollback(self):
+		for layer, layer_lsb, layer_rsb in reversed(self.written):
+			set_sidebearings(layer, layer_lsb, layer_rsb)
+		self.summary["rolledBack"] = len(self.written)
+		self.summary["spaced"] = 0
+		self.written = []
+
+	def eta(self):
+		# remaining time in seconds, extrapolated from the average time per layer so far
+		if not self.index:
+			return None
+		elapsed = time.time() - self.start_time
+		return elapsed / self.index * (len(self.layers) - self.index)
+
+	def finish(self):
+		self.finished = True
+		try:
+			self.summary["cancelled"] = self.cancelled
+			self.summary["duration"] = time.time() - self.start_time
+		finally:
+			self.font.enableUpdateInterface()
+		if self.profiler:
+			self.summary["slowestGlyphs"] = self.profiler.slowest_glyphs()
+		self.finished_callback(self.summary, self.diagnostics)
+
+
+def format_summary(summary):
+	lines = ["%s of %s layers spaced, %s unchanged, %s skipped in %.1f s." % (
+		summary["spaced"],
+		summary["total"],
+		summary["unchanged"],
+		summary["skipped"],
+		summary["duration"]
+	)]
+	if summary["cancelled"]:
+		lines.insert(0, "Cancelled, %s layers restored." % summary["rolledBack"])
+	if summary["failed"]:
+		lines.append("%s layers could not be spaced." % summary["failed"])
+	if summary["slowestGlyphs"]:
+		lines.append("Slowest glyphs:")
+		for glyph_name, master_name, seconds in summary["slowestGlyphs"]:
+			lines.append("    %s (%s): %.1f ms" % (glyph_name, master_name, seconds * 1000))
+	return "\n".join(lines)
@@ -5,11 +5,18 @@ from __future__ import division, print_function, unicode_literals
 
 # program dependencies
 from GlyphsApp import Glyphs, Message
+import json
 import math
+import time
 from Foundation import NSMinX, NSMaxX, NSMinY, NSMaxY, NSMakePoint
 
 paramFreq = 4
 
+# trace levels of HTLSEngine
+TRACE_OFF = 0
+TRACE_SUMMARY = 1
+TRACE_DETAIL = 2
+
 
 # point list area
 def area(points):
@@ -157,11 +164,326 @@ def read_config(font):
 	return font_rules
 
 
+class HTLSDiagnostics:
+	"""
+	Problems found by the engine during a run, collected so they can be shown once at the end instead of
+	interrupting every layer.
+	"""
+
+	def __init__(self):
+		self.entries = []
+
+	def __len__(self):
+		return len(self.entries)
+
+	def add(self, code, glyph, master, detail):
+		self.entries.append({"code": code, "glyph": glyph, "master": master, "detail": detail})
+
+	def report(self):
+		# the same problem usually affects many glyphs, so list each problem once with the glyphs it occurred in
+		problems = {}
+		for entry in self.entries:
+			problems.setdefault((entry["code"], entry["master"], entry["detail"]), []).append(entry["glyph"])
+
+		lines = []
+		for (code, master, detail), glyph_names in problems.items():
+			lines.append("%s in %s: %s" % (code, master, detail))
+			lines.append("    " + ", ".join(glyph_names))
+		return "\n".join(lines)
+
+	def show(self, title="Problems while spacing"):
+		if not self.entries:
+			return
+		print(self.report())
+		Message(title=title, message="%s problems were found, see the Macro panel for details." % len(self.entries))
+
+
+class HTLSTrace:
+	"""
+	Record of the decisions the engine made for one layer. Events are only kept if their level is enabled, and
+	text is only rendered on request.
+	"""
+
+	templates = {
+		"start": "Spacing...\nLayer: {glyph} ({master})",
+		"fixedWidth": "Using fixed width: {width}.",
+		"ruleFound": "Found spacing rule.",
+		"noRule": "No spacing rule found.",
+		"reference": "Reference: {reference}\nFactor: {factor}",
+		"alignedWidth": "Glyph {glyph} has aligned width. Skipping.",
+		"leftMetricsKey": "Glyph {glyph} has left metrics key.",
+		"rightMetricsKey": "Glyph {glyph} has right metrics key.",
+		"fraction": "Glyph fraction should be spaced manually. Skipping.",
+	}
+
+	def __init__(self, level=TRACE_OFF):
+		self.level = level
+		# list of (event, values)
+		self.events = []
+
+	def add(self, level, event, **values):
+		if level <= self.level:
+			self.events.append((event, values))
+
+	def render(self):
+		lines = []
+		for event, values in self.events:
+			if "width" in values:
+				values["width"] = int(values["width"])
+			if "factor" in values:
+				values["factor"] = float(values["factor"])
+			lines.append(self.templates[event].format(**values))
+		return "\n".join(lines) + "\n__________________\n"
+
+
+class HTLSStageTimer:
+	def __init__(self, profiler, key, stage):
+		self.profiler = profiler
+		self.key = key
+		self.stage = stage
+		self.start = None
+
+	def __enter__(self):
+		self.start = time.perf_counter()
+
+	def __exit__(self, *args):
+		self.profiler.record(self.key, self.stage, time.perf_counter() - self.start)
+
+
+class HTLSNullTimer:
+	# used when profiling is off, so the engine does not need to check at every stage
+	def __enter__(self):
+		pass
+
+	def __exit__(self, *args):
+		pass
+
+
+null_timer = HTLSNullTimer()
+
+
+class HTLSProfiler:
+	"""
+	Wall time and call count of every engine stage, per glyph and for the whole run.
+	"""
+
+	def __init__(self):
+		# key: stage, value: [calls, seconds]
+		self.stages = {}
+		# key: (glyph name, master name), value: dictionary with key: stage, value: [calls, seconds]
+		self.glyphs = {}
+
+	def stage(self, glyph_name, master_name, stage):
+		return HTLSStageTimer(self, (glyph_name, master_name), stage)
+
+	def record(self, key, stage, duration):
+		for stages in [self.stages, self.glyphs.setdefault(key, {})]:
+			timing = stages.setdefault(stage, [0, 0.0])
+			timing[0] += 1
+			timing[1] += duration
+
+	def slowest_glyphs(self, count=10):
+		totals = [
+			(glyph_name, master_name, sum(timing[1] for timing in stages.values()))
+			for (glyph_name, master_name), stages in self.glyphs.items()
+		]
+		return sorted(totals, key=lambda total: total[2], reverse=True)[:count]
+
+	def to_dict(self):
+		return {
+			"stages": {stage: {"calls": calls, "seconds": seconds} for stage, (calls, seconds) in self.stages.items()},
+			"glyphs": [
+				{
+					"glyph": glyph_name,
+					"master": master_name,
+					"stages": {stage: {"calls": calls, "seconds": seconds} for stage, (calls, seconds) in stages.items()},
+				}
+				for (glyph_name, master_name), stages in self.glyphs.items()
+			],
+		}
+
+	def export_json(self, path):
+		with open(path, "w") as f:
+			json.dump(self.to_dict(), f, indent=4)
+
+
+# write both sidebearings of a layer as one undo step instead of one per property
+def set_sidebearings(layer, lsb, rsb):
+	glyph = layer.parent
+	glyph.beginUndo()
+	try:
+		layer.LSB, layer.RSB = lsb, rsb
+		layer.syncMetrics()
+	finally:
+		glyph.endUndo()
+
+
+class HTLSRuleIndex:
+	"""
+	Font rules grouped by category, subcategory and case, so glyphs can be resolved and rules checked without
+	comparing every rule with every other rule.
+	"""
+
+	def __init__(self, font_rules):
+		self.font_rules = font_rules
+
+		# key: category, value: dictionary with key: (subcategory, case), value: (filtered rule IDs, other rule IDs)
+		self.rules = {}
+		for category in font_rules:
+			self.rules[category] = {}
+			for rule_id in font_rules[category]:
+				rule = font_rules[category][rule_id]
+				filtered_rules, other_rules = self.rules[category].setdefault(
+					(rule["subcategory"], rule["case"]), ([], [])
+				)
+				if rule["filter"]:
+					filtered_rules.append(rule_id)
+				else:
+					other_rules.append(rule_id)
+
+	def tiers(self, category, subcategory, case):
+		# the rule groups in the order they are checked by HTLSEngine.find_exception
+		for key in [(subcategory, case), ("Any", case), ("Any", "Any")]:
+			if key in self.rules[category]:
+				yield self.rules[category][key]
+
+	def resolve(self, category, name, subcategory, case):
+		if category not in self.rules:
+			return None
+
+		for filtered_rules, other_rules in self.tiers(category, subcategory, case):
+			for rule_id in filtered_rules:
+				if self.font_rules[category][rule_id]["filter"] in name:
+					return rule_id
+			if other_rules:
+				return other_rules[0]
+
+	def conflicts(self):
+		# all groups of rules with the same subcategory, case and filter, of which only the first is ever used
+		conflicts = []
+		for category in self.rules:
+			for (subcategory, case), (filtered_rules, other_rules) in self.rules[category].items():
+				rules_by_filter = {}
+				for rule_id in filtered_rules:
+					rules_by_filter.setdefault(self.font_rules[category][rule_id]["filter"], []).append(rule_id)
+				for rule_filter, rule_ids in rules_by_filter.items():
+					if len(rule_ids) > 1:
+						conflicts.append((category, subcategory, case, rule_filter, rule_ids))
+				if len(other_rules) > 1:
+					conflicts.append((category, subcategory, case, None, other_rules))
+		return conflicts
+
+	def used_rules(self, glyph_groups):
+		"""
+		Resolve the glyphs of a font, grouped by (category, subcategory, case). Glyphs of a group only need to be
+		looked at one by one as long as a filter has to be checked.
+		"""
+		used_rules = set()
+		for (category, subcategory, case), names in glyph_groups.items():
+			if category not in self.rules:
+				continue
+			remaining_names = names
+			for filtered_rules, other_rules in self.tiers(category, subcategory, case):
+				for rule_id in filtered_rules:
+					rule_filter = self.font_rules[category][rule_id]["filter"]
+					matching_names = [name for name in remaining_names if rule_filter in name]
+					if matching_names:
+						used_rules.add(rule_id)
+						remaining_names = [name for name in remaining_names if rule_filter not in name]
+				if other_rules and remaining_names:
+					used_rules.add(other_rules[0])
+					remaining_names = []
+				if not remaining_names:
+					break
+		return used_rules
+
+	def unused_rules(self, glyph_groups):
+		# rules no glyph of the font resolves to, because no glyph matches or a rule checked earlier always wins
+		used_rules = self.used_rules(glyph_groups)
+		return [
+			(category, rule_id) for category in self.font_rules for rule_id in self.font_rules[category]
+			if rule_id not in used_rules
+		]
+
+
+class HTLSRuleResolver:
+	"""
+	Resolves the spacing rule and factor of a glyph in a master, the same way HTLSEngine does, but without building
+	an engine or touching any outlines. Results are cached until invalidate() is called.
+	"""
+
+	def __init__(self, font, font_index=None):
+		self.categories = ["Letter", "Number", "Punctuation", "Symbol", "Mark"]
+		self.font = font
+		self.font_index = font_index
+		self.font_rules = None
+		self.rule_index = None
+		# key: (glyph name, master ID), value: (rule, factor)
+		self.cache = {}
+
+	def invalidate(self):
+		# call whenever the font rules, master rules or glyph attributes have changed
+		self.font_rules = None
+		self.rule_index = None
+		self.cache = {}
+
+	def glyph_info(self, glyph_name):
+		if self.font_index and glyph_name in self.font_index:
+			return self.font_index.info(glyph_name)
+		glyph = self.font.glyphs[glyph_name]
+		if glyph is None:
+			return None
+		return glyph.category, glyph.subCategory, glyph.case
+
+	def resolve(self, glyph_name, master):
+		"""Returns the rule of the glyph in the master, or None, and the factor used for it."""
+		key = (glyph_name, master.id)
+		if key in self.cache:
+			return self.cache[key]
+
+		if self.rule_index is None:
+			self.font_rules = read_config(self.font)
+			self.rule_index = HTLSRuleIndex(self.font_rules)
+
+		rule = None
+		factor = 1.0
+		info = self.glyph_info(glyph_name)
+		if info and info[0] in self.categories:
+			category, subcategory, case = info
+			rule_id = self.rule_index.resolve(category, glyph_name, subcategory, case)
+			if rule_id:
+				rule = dict(self.font_rules[category][rule_id])
+				master_rules = master.userData["HTLSManagerMasterRules"]
+				if master_rules and rule_id in master_rules:
+					rule["value"] = master_rules[rule_id]
+				factor = float(rule["value"])
+
+		self.cache[key] = rule, factor
+		return self.cache[key]
+
+
 class HTLSEngine:
 
-	def __init__(self, layer, parent=None):
+	# the measurements of a layer that do not depend on area, depth or factor, see calculate_polygons
+	profile_attributes = [
+		"minYref", "maxYref", "minY", "maxY", "l_full_extreme", "r_full_extreme", "distance_l", "distance_r",
+		"l_total_margins", "r_total_margins", "l_zone_margins", "r_zone_margins", "l_extreme", "r_extreme",
+	]
+
+	def __init__(
+			self, layer, parent=None, font_index=None, diagnostics=None, trace_level=TRACE_OFF, profiler=None,
+			rule_index=None, profiles=None
+	):
 		self.categories = ["Letter", "Number", "Punctuation", "Symbol", "Mark"]
 		self.parent = parent
+		self.font_index = font_index
+		# a rule index shared by many engines of one font, instead of reading the rules for every layer
+		self.rule_index = rule_index
+		# cache shared by many engines, key: (glyph name, master ID), value: profile
+		self.profiles = profiles
+		self.diagnostics = diagnostics if diagnostics is not None else HTLSDiagnostics()
+		self.trace = HTLSTrace(trace_level)
+		self.profiler = profiler
 		self.font = layer.parent.parent
 		self.master = layer.master
 		self.layer = layer
@@ -182,18 +504,23 @@ class HTLSEngine:
 		self.angle = layer.italicAngle
 		self.upm = int(self.master.font.upm)
 		self.factor = 1
-		self.output = "Spacing...\nLayer: %s (%s)\n" % (self.layer.parent.name, self.master.name)
+		self.rule_id = None
+		# why the layer, or one of its sides, was not spaced
+		self.skip_reason = None
+		self.trace.add(TRACE_SUMMARY, "start", glyph=self.glyph.name, master=self.master.name)
 
-		self.config = read_config(self.font)
+		self.config = rule_index.font_rules if rule_index else read_config(self.font)
 		self.master_rules = self.master.userData["HTLSManagerMasterRules"]
 
 		try:
 			self.paramArea = int(self.master.customParameters["paramArea"] or 400)
 			self.paramDepth = int(self.master.customParameters["paramDepth"] or 12)
 		except:
-			Message(
-				title="Error reading master parameters",
-				message="Please only use integer values with no decimals for area and depth parameters. Using default values instead."
+			self.diagnostics.add(
+				"invalid-parameters",
+				self.glyph.name,
+				self.master.name,
+				"Area and depth must be integers with no decimals, using default values instead."
 			)
 			self.paramArea = 400
 			self.paramDepth = 12
@@ -202,20 +529,29 @@ class HTLSEngine:
 
 		self.l_polygon = None
 		self.r_polygon = None
+		self.l_total_margins = None
+		self.r_total_margins = None
+		self.l_zone_margins = None
+		self.r_zone_margins = None
+		self.l_extreme = None
+		self.r_extreme = None
+		self.l_value = None
+		self.r_value = None
 		if ".tosf" in self.glyph.name or ".tf" in self.glyph.name \
 			or self.glyph.widthMetricsKey or self.layer.widthMetricsKey \
 			or self.font.customParameters["isFixedPitch"]:
 			self.tabular_width = True
-			self.output += "Using fixed width: %s.\n" % int(self.layer.width)
+			self.trace.add(TRACE_DETAIL, "fixedWidth", width=self.layer.width)
 
-		self.rule = self.find_exception()
+		with self.stage("find_exception"):
+			self.rule = self.find_exception()
 		if self.rule:
 			self.factor = float(self.rule["value"])
 			reference_glyph = self.font.glyphs[self.rule["referenceGlyph"]]
 			if reference_glyph:
 				self.reference_layer = reference_glyph.layers[self.layer.associatedMasterId]
 
-		self.output += "Reference: %s\nFactor: %s" % (self.reference_layer.parent.name, float(self.factor))
+		self.trace.add(TRACE_DETAIL, "reference", reference=self.reference_layer.parent.name, factor=self.factor)
 
 		if parent:
 			if self.parent.leftGlyphView.glyph.name == self.glyph.name:
@@ -226,13 +562,34 @@ class HTLSEngine:
 	def find_exception(self):
 		glyph = self.glyph
 		name = glyph.name
-		category = glyph.category
-		subcategory = glyph.subCategory
-		case = glyph.case
+		# read the glyph attributes from the font index if there is one, instead of asking the glyph
+		if self.font_index and name in self.font_index:
+			category, subcategory, case = self.font_index.info(name)
+		else:
+			category = glyph.category
+			subcategory = glyph.subCategory
+			case = glyph.case
 
 		if category not in self.categories:
 			return
 
+		if self.rule_index:
+			rule = None
+			rule_id = self.rule_index.resolve(category, name, subcategory, case)
+			if rule_id:
+				rule = dict(self.config[category][rule_id])
+		else:
+			rule, rule_id = self.match_rule(category, name, subcategory, case)
+
+		if rule_id and self.master_rules and rule_id in self.master_rules:
+			rule["value"] = self.master_rules[rule_id]
+		self.rule_id = rule_id
+
+		self.trace.add(TRACE_DETAIL, "ruleFound" if rule else "noRule")
+
+		return rule
+
+	def match_rule(self, category, name, subcategory, case):
 		rule = None
 		rule_id = None
 
@@ -321,15 +678,16 @@ class HTLSEngine:
 							rule_id = id
 							break
 
-		if rule_id and self.master_rules and rule_id in self.master_rules:
-			rule["value"] = self.master_rules[rule_id]
+		return rule, rule_id
 
-		if rule:
-			self.output += "Found spacing rule.\n"
-		else:
-			self.output += "No spacing rule found.\n"
+	def stage(self, stage):
+		if self.profiler is None:
+			return null_timer
+		return self.profiler.stage(self.glyph.name, self.master.name, stage)
 
-		return rule
+	@property
+	def output(self):
+		return self.trace.render()
 
 	def overshoot(self):
 		return self.xHeight * self.paramOver / 100
@@ -398,30 +756,53 @@ class HTLSEngine:
 
 			valor = prop_area - area(polygon)
 			return valor / amplitude_y
-		except:
-			import traceback
-			print(traceback.format_exc())
+		except Exception as e:
+			self.diagnostics.add("calculation-error", self.glyph.name, self.master.name, repr(e))
 
 	def calculate_polygons(self):
 		if not self.layer.name or len(self.layer.components) + len(self.layer.paths) == 0:
+			self.skip_reason = "empty-layer"
 			return
 		elif self.layer.hasAlignedWidth():
-			self.output = "Glyph %s has aligned width. Skipping.\n__________________\n" % self.glyph.name
+			self.skip_reason = "aligned-width"
+			self.trace.add(TRACE_SUMMARY, "alignedWidth", glyph=self.glyph.name)
 			return
 		elif self.glyph.leftMetricsKey:
 			self.skip_LSB = True
-			self.output += "Glyph %s has left metrics key." % self.glyph.name
+			self.skip_reason = "left-metrics-key"
+			self.trace.add(TRACE_SUMMARY, "leftMetricsKey", glyph=self.glyph.name)
 		elif self.glyph.rightMetricsKey:
 			self.skip_RSB = True
-			self.output += "Glyph %s has right metrics key." % self.glyph.name
+			self.skip_reason = "right-metrics-key"
+			self.trace.add(TRACE_SUMMARY, "rightMetricsKey", glyph=self.glyph.name)
 		elif "fraction" in self.glyph.name:
-			self.output = "Glyph fraction should be spaced manually. Skipping.\n__________________\n"
+			self.skip_reason = "fraction"
+			self.trace.add(TRACE_SUMMARY, "fraction")
 			return
 
-		self.output += "\n__________________\n"
+		# the profile only depends on the outlines, so it is measured once for all parameters if there is a cache
+		key = (self.glyph.name, self.master.id)
+		if self.profiles is not None and key in self.profiles:
+			for attribute, value in zip(self.profile_attributes, self.profiles[key]):
+				setattr(self, attribute, value)
+		elif not self.measure_profile():
+			return
+		elif self.profiles is not None:
+			self.profiles[key] = [getattr(self, attribute) for attribute in self.profile_attributes]
+
+		# create a closed polygon
+		with self.stage("process_margins"):
+			self.l_polygon, self.r_polygon = self.process_margins(
+				self.l_zone_margins, self.r_zone_margins, self.l_extreme, self.r_extreme
+			)
+
+		return self.l_polygon, self.r_polygon
+
+	def measure_profile(self):
 		# Decompose layer for analysis, as the deeper plumbing assumes to be looking at outlines.
-		layer_decomposed = self.layer.copyDecomposedLayer()
-		layer_decomposed.parent = self.glyph
+		with self.stage("decompose"):
+			layer_decomposed = self.layer.copyDecomposedLayer()
+			layer_decomposed.parent = self.glyph
 		# get reference glyph maximum points
 		overshoot = self.overshoot()
 
@@ -435,50 +816,65 @@ class HTLSEngine:
 		# get the margins for the full outline
 		# will take measure from minY to maxY. minYref and maxYref are passed to check reference match
 		# totalMarginList(layer,minY,maxY,angle,minYref,maxYref)
-		l_total_margins, r_total_margins = total_margin_list(
-			layer_decomposed,
-			self.minY,
-			self.maxY,
-			self.angle,
-			self.minYref,
-			self.maxYref
-		)
+		with self.stage("total_margin_list"):
+			l_total_margins, r_total_margins = total_margin_list(
+				layer_decomposed,
+				self.minY,
+				self.maxY,
+				self.angle,
+				self.minYref,
+				self.maxYref
+			)
 
 		# margins will be False, False if there is no measure in the reference zone, and then function stops
 		if not l_total_margins and not r_total_margins:
-			return
+			self.skip_reason = "outside-reference-zone"
+			return False
 
 		# filtes all the margins to the reference zone
-		l_zone_margins, r_zone_margins = zone_margins(l_total_margins, r_total_margins, self.minYref, self.maxYref)
+		with self.stage("zone_margins"):
+			l_zone_margins, r_zone_margins = zone_margins(l_total_margins, r_total_margins, self.minYref, self.maxYref)
 
 		# if the font has an angle, we need to deslant
 		if self.angle:
-			l_zone_margins = self.deslant(l_zone_margins)
-			r_zone_margins = self.deslant(r_zone_margins)
+			with self.stage("deslant"):
+				l_zone_margins = self.deslant(l_zone_margins)
+				r_zone_margins = self.deslant(r_zone_margins)
 
-			l_total_margins = self.deslant(l_total_margins)
-			r_total_margins = self.deslant(r_total_margins)
+				l_total_margins = self.deslant(l_total_margins)
+				r_total_margins = self.deslant(r_total_margins)
 
 		# full shape extreme points
-		self.l_full_extreme, self.r_full_extreme = max_points([l_total_margins, r_total_margins])
-		# get zone extreme points
-		l_extreme, r_extreme = max_points([l_zone_margins, r_zone_margins])
+		with self.stage("max_points"):
+			self.l_full_extreme, self.r_full_extreme = max_points([l_total_margins, r_total_margins])
+			# get zone extreme points
+			l_extreme, r_extreme = max_points([l_zone_margins, r_zone_margins])
 
 		# dif between extremes full and zone
 		self.distance_l = math.ceil(l_extreme.x - self.l_full_extreme.x)
 		self.distance_r = math.ceil(self.r_full_extreme.x - r_extreme.x)
 
-		# create a closed polygon
-		self.l_polygon, self.r_polygon = self.process_margins(l_zone_margins, r_zone_margins, l_extreme, r_extreme)
+		# the stage results, kept so they can be compared between engine versions
+		self.l_total_margins, self.r_total_margins = l_total_margins, r_total_margins
+		self.l_zone_margins, self.r_zone_margins = l_zone_margins, r_zone_margins
+		self.l_extreme, self.r_extreme = l_extreme, r_extreme
 
-		return self.l_polygon, self.r_polygon
+		return True
 
 	def current_layer_sidebearings(self):
 		if not self.calculate_polygons():
 			return
 
-		self.newL = math.ceil(0 - self.distance_l + self.calculate_sb_value(self.l_polygon))
-		self.newR = math.ceil(0 - self.distance_r + self.calculate_sb_value(self.r_polygon))
+		with self.stage("calculate_sb_value"):
+			l_value = self.calculate_sb_value(self.l_polygon)
+			r_value = self.calculate_sb_value(self.r_polygon)
+		self.l_value, self.r_value = l_value, r_value
+		if l_value is None or r_value is None:
+			self.skip_reason = "calculation-error"
+			return
+
+		self.newL = math.ceil(0 - self.distance_l + l_value)
+		self.newR = math.ceil(0 - self.distance_r + r_value)
 
 		if self.tabular_width:
 			width_shape = self.r_full_extreme.x - self.l_full_extreme.x
@@ -497,8 +893,261 @@ class HTLSEngine:
 		return self.newL, self.newR
 
 
+class HTLSParameterFit:
+	"""
+	Finds the paramArea and paramDepth of a master, or the factor of a rule, that come closest to target sidebearings
+	of a few control glyphs, by least squares. The margin profiles of the glyphs do not depend on the parameters, so
+	they are measured once, and every evaluation only closes the polygons at another depth. For a given depth, the
+	sidebearings are linear in the area and in the factor, which are solved directly.
+	"""
+
+	def __init__(self, master, targets, diagnostics=None):
+		# targets, key: glyph name, value: (LSB, RSB), either can be None to leave that side out
+		self.master = master
+		self.font = master.font
+		self.targets = targets
+		self.diagnostics = diagnostics if diagnostics is not None else HTLSDiagnostics()
+		# key: glyph name, value: engine holding the margin profile
+		self.profiles = {}
+		# key: glyph name, value: why the glyph cannot be used
+		self.excluded = {}
+
+		for glyph_name in targets:
+			glyph = self.font.glyphs[glyph_name]
+			if not glyph:
+				self.excluded[glyph_name] = "missing"
+				continue
+			engine = HTLSEngine(glyph.layers[master.id], diagnostics=self.diagnostics)
+			if engine.tabular_width:
+				self.excluded[glyph_name] = "fixed-width"
+			elif not engine.calculate_polygons():
+				self.excluded[glyph_name] = engine.skip_reason or "no-profile"
+			else:
+				self.profiles[glyph_name] = engine
+
+	def sides(self, depth, profiles=None):
+		"""
+		(glyph name, side, target, offset, scale, factor) of every target side, where
+		sidebearing = offset + scale * factor * area.
+		"""
+		sides = []
+		for glyph_name, engine in (profiles or self.profiles).items():
+			engine.paramDepth = depth
+			l_polygon, r_polygon = engine.process_margins(
+				engine.l_zone_margins, engine.r_zone_margins, engine.l_extreme, engine.r_extreme
+			)
+			amplitude_y = engine.maxYref - engine.minYref
+			scale = ((engine.upm / 1000) ** 2) * 100 / engine.xHeight
+			target_lsb, target_rsb = self.targets[glyph_name]
+			if target_lsb is not None and not engine.skip_LSB:
+				offset = -engine.distance_l - area(l_polygon) / amplitude_y
+				sides.append((glyph_name, 0, target_lsb, offset, scale, engine.factor))
+			if target_rsb is not None and not engine.skip_RSB:
+				offset = -engine.distance_r - area(r_polygon) / amplitude_y
+				sides.append((glyph_name, 1, target_rsb, offset, scale, engine.factor))
+		return sides
+
+	@staticmethod
+	def sloped(sides, excluded):
+		# sides with a slope of 0, from a factor or area of 0, do not depend on the value that is fitted
+		for glyph_name, side, target, offset, slope in sides:
+			if not slope:
+				excluded[glyph_name] = "zero-slope"
+		return [side for side in sides if side[4]]
+
+	@staticmethod
+	def solve(sides, step, lowest):
+		"""
+		Error and value of x that brings sidebearing = ceil(offset + slope * x) closest to the targets of
+		(target, offset, slope) sides, with x a multiple of step. No slope may be 0.
+		"""
+		# least squares solution, the engine rounds sidebearings up, so half a unit less on average
+		value = sum(slope * (target - 0.5 - offset) for target, offset, slope in sides) \
+			/ sum(slope ** 2 for target, offset, slope in sides)
+		# the engine rounds the sidebearings, try the values within one unit of sidebearing from the solution
+		window = int(math.ceil(1 / (step * min(abs(slope) for target, offset, slope in sides))))
+		best = None
+		for steps in range(int(value / step) - window, int(value / step) + window + 1):
+			candidate = max(lowest, round(steps * step, 6))
+			error = sum((math.ceil(offset + slope * candidate) - target) ** 2 for target, offset, slope in sides)
+			# of equally good values, the one closest to the solution
+			score = error, abs(candidate - value)
+			if best is None or score < best[0]:
+				best = score, candidate
+		return best[0][0], best[1]
+
+	def result(self, sides, error, value):
+		# sidebearings and residuals (computed minus target) per glyph, value is multiplied with each side's slope
+		sidebearings = {}
+		residuals = {}
+		for glyph_name, side, target, offset, slope in sides:
+			sidebearing = math.ceil(offset + slope * value)
+			sidebearings.setdefault(glyph_name, [None, None])[side] = sidebearing
+			residuals.setdefault(glyph_name, [None, None])[side] = sidebearing - target
+		return {
+			"rms": math.sqrt(error / len(sides)),
+			"sidebearings": sidebearings,
+			"residuals": residuals,
+			"excluded": dict(self.excluded),
+		}
+
+	def fit(self, depths=range(1, 41)):
+		"""
+		The best whole-number area and depth, with the sidebearings the engine computes with them and the residuals
+		(computed minus target) per glyph, or None if there are not enough targets to fit.
+		"""
+		best = None
+		for depth in depths:
+			sides = self.sloped([
+				(glyph_name, side, target, offset, scale * factor)
+				for glyph_name, side, target, offset, scale, factor in self.sides(depth)
+			], self.excluded)
+			if not sides:
+				return None
+			error, area_value = self.solve([(target, offset, slope) for _, _, target, offset, slope in sides], 1, 1)
+			if best is None or error < best[0]:
+				best = error, area_value, depth, sides
+
+		error, area_value, depth, sides = best
+		fit = self.result(sides, error, area_value)
+		fit.update({"paramArea": area_value, "paramDepth": depth})
+		return fit
+
+	def fit_factor(self, rule_id):
+		"""
+		The factor of a rule, to two decimals, that spaces the control glyphs using the rule closest to their targets
+		at the area and depth of the master, or None if there are not enough targets to fit.
+		"""
+		profiles = {}
+		excluded = dict(self.excluded)
+		for glyph_name, engine in self.profiles.items():
+			if engine.rule_id == rule_id:
+				profiles[glyph_name] = engine
+			else:
+				excluded[glyph_name] = "other-rule"
+		if not profiles:
+			return None
+
+		area_value = int(self.master.customParameters["paramArea"] or 400)
+		depth = int(self.master.customParameters["paramDepth"] or 12)
+		sides = self.sloped([
+			(glyph_name, side, target, offset, scale * area_value)
+			for glyph_name, side, target, offset, scale, factor in self.sides(depth, profiles)
+		], excluded)
+		if not sides:
+			return None
+		error, factor = self.solve([(target, offset, slope) for _, _, target, offset, slope in sides], 0.01, 0.01)
+		fit = self.result(sides, error, factor)
+		fit.update({
+			"rule": rule_id, "factor": factor, "paramArea": area_value, "paramDepth": depth, "excluded": excluded
+		})
+		return fit
+
+
+def format_fit(fit):
+	if "factor" in fit:
+		lines = ["Factor %(factor)s at area %(paramArea)s and depth %(paramDepth)s, RMS error %(rms).2f" % fit]
+	else:
+		lines = ["Area %(paramArea)s, depth %(paramDepth)s, RMS error %(rms).2f" % fit]
+	for glyph_name, (lsb, rsb) in fit["residuals"].items():
+		lines.append("    %-20s LSB %s (%s), RSB %s (%s)" % (
+			glyph_name,
+			fit["sidebearings"][glyph_name][0], "-" if lsb is None else "%+d" % lsb,
+			fit["sidebearings"][glyph_name][1], "-" if rsb is None else "%+d" % rsb,
+		))
+	for glyph_name, reason in fit["excluded"].items():
+		lines.append("    %-20s not used: %s" % (glyph_name, reason))
+	return "\n".join(lines)
+
+
+def designspace_terms(point, pairs):
+	# constant, one term per axis and, if enough sources are known, one per pair of axes
+	terms = [1.0] + list(point)
+	if pairs:
+		terms += [point[i] * point[j] for i in range(len(point)) for j in range(i + 1, len(point))]
+	return terms
+
+
+def solve_linear(matrix, right):
+	"""Solves matrix * x = right for every column of right by Gauss-Jordan elimination."""
+	size = len(matrix)
+	rows = [list(matrix[i]) + list(right[i]) for i in range(size)]
+	for column in range(size):
+		pivot = max(range(column, size), key=lambda row: abs(rows[row][column]))
+		rows[column], rows[pivot] = rows[pivot], rows[column]
+		for row in range(size):
+			if row != column and rows[row][column]:
+				ratio = rows[row][column] / rows[column][column]
+				rows[row] = [a - ratio * b for a, b in zip(rows[row], rows[column])]
+	return [[value / rows[i][i] for value in rows[i][size:]] for i in range(size)]
+
+
+def interpolate_parameters(sources, locations, parameters=("paramArea", "paramDepth")):
+	"""
+	Values of the parameters at every location, from source masters given as (axis coordinates, {parameter: value}).
+	All parameters are fitted at once, by least squares, as a linear function of the axes the sources differ on,
+	with products of axes once there are enough sources for them. The sources' residuals are added back by inverse
+	distance, so every source keeps its own values. Returns None without sources.
+	"""
+	if not sources:
+		return None
+
+	axes = [i for i in range(len(sources[0][0])) if len(set(location[i] for location, _ in sources)) > 1]
+	lows = [min(location[i] for location, _ in sources) for i in axes]
+	spans = [max(location[i] for location, _ in sources) - low for i, low in zip(axes, lows)]
+
+	def normalize(location):
+		# 0 to 1 between the smallest and largest coordinate of the sources on every axis
+		return [(location[i] - low) / span for i, low, span in zip(axes, lows, spans)]
+
+	pairs = len(axes) > 1 and len(sources) >= 1 + len(axes) + len(axes) * (len(axes) - 1) // 2
+	points = [normalize(location) for location, _ in sources]
+	design = [designspace_terms(point, pairs) for point in points]
+	values = [[float(source_values[parameter]) for parameter in parameters] for _, source_values in sources]
+
+	# normal equations, slightly regularized so that axes or products the sources do not determine stay at 0
+	size = len(design[0])
+	normal = [
+		[sum(terms[i] * terms[j] for terms in design) + (1e-6 if i == j and i else 0) for j in range(size)]
+		for i in range(size)
+	]
+	right = [
+		[sum(terms[i] * value[k] for terms, value in zip(design, values)) for k in range(len(parameters))]
+		for i in range(size)
+	]
+	coefficients = solve_linear(normal, right)
+
+	def model(terms):
+		return [sum(term * row[k] for term, row in zip(terms, coefficients)) for k in range(len(parameters))]
+
+	residuals = [[a - b for a, b in zip(value, model(terms))] for terms, value in zip(design, values)]
+
+	results = []
+	for location in locations:
+		point = normalize(location)
+		fitted = model(designspace_terms(point, pairs))
+		distances = [sum((a - b) ** 2 for a, b in zip(point, source_point)) for source_point in points]
+		if min(distances) < 1e-12:
+			correction = residuals[distances.index(min(distances))]
+		else:
+			weights = [1 / distance for distance in distances]
+			correction = [
+				sum(weight * residual[k] for weight, residual in zip(weights, residuals)) / sum(weights)
+				for k in range(len(parameters))
+			]
+		results.append({
+			parameter: max(1, int(round(value + offset)))
+			for parameter, value, offset in zip(parameters, fitted, correction)
+		})
+	return results
+
+
 class HTLSScript:
-	def __init__(self, all_masters):
+	"""
+	Spaces the selected glyphs in a progress window, HTLSSpacingProgress unless another one is given.
+	"""
+
+	def __init__(self, all_masters, progress_window=None, trace_level=TRACE_OFF, profiler=None):
 		self.font = Glyphs.font
 
 		if self.font is None:
@@ -512,6 +1161,7 @@ class HTLSScript:
 				message="Please set up parameters in HTLS Manager. Using default values."
 			)
 
+		layers = []
 		for glyph in self.font.selectedLayers:
 			parent = glyph.parent
 			for layer in parent.layers:
@@ -519,12 +1169,10 @@ class HTLSScript:
 					continue
 				if not all_masters and layer.associatedMasterId != self.font.selectedFontMaster.id:
 					continue
-				self.engine = HTLSEngine(layer)
-
-				layer_lsb, layer_rsb = self.engine.current_layer_sidebearings() or [None, None]
-				if layer_lsb is None and layer_rsb is None:
-					continue
-				layer.LSB, layer.RSB = layer_lsb, layer_rsb
-				layer.syncMetrics()
+				layers.append(layer)
 
-				print(self.engine.output)
+		if progress_window is None:
+			# imported here, the interface module imports this one and the headless package cannot load it
+			from HTLSManagerUIElements import HTLSSpacingProgress
+			progress_window = HTLSSpacingProgress
+		self.progress = progress_window(self.font, layers, trace_level=trace_level, profiler=profiler)
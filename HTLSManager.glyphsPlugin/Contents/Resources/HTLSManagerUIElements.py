@@ -1,14 +1,90 @@
 
-from vanilla import Group, ComboBox, TextBox, Slider, EditText, PopUpButton, Button
+from vanilla import Group, ComboBox, TextBox, Slider, EditText, PopUpButton, Button, FloatingWindow, List, ProgressBar, \
+	CheckBoxListCell
 from GlyphsApp.UI import GlyphView
 from GlyphsApp import Message
-from AppKit import NSColor
-from HTLSLibrary import HTLSEngine
+from AppKit import NSColor, NSNotFound
+from Foundation import NSObject
+import objc
+from HTLSJobs import HTLSDryRun, HTLSSpacingJob, format_summary
+from HTLSLibrary import TRACE_OFF, interpolate_parameters
+
+
+class HTLSGlyphNameDataSource(NSObject):
+	"""
+	Combo box data source that serves glyph names from the font index. The combo box only asks for the rows it
+	displays, and the list is narrowed down to the matching names as the user types.
+	"""
+
+	@objc.python_method
+	def set_font_index(self, font_index):
+		self.font_index = font_index
+		self.results = None
+
+	@objc.python_method
+	def current_results(self):
+		# None stands for all glyphs of the font
+		if self.results is None:
+			return self.font_index.name_list()
+		return self.results
+
+	def numberOfItemsInComboBox_(self, combo_box):
+		return len(self.current_results())
+
+	def comboBox_objectValueForItemAtIndex_(self, combo_box, index):
+		results = self.current_results()
+		if index >= len(results):
+			return ""
+		return results[index]
+
+	@objc.python_method
+	def reset(self, combo_box):
+		# after picking a name, the list shows all glyphs again
+		if self.results is not None:
+			self.results = None
+			combo_box.reloadData()
+
+	def comboBox_indexOfItemWithStringValue_(self, combo_box, string):
+		results = self.current_results()
+		if string in self.font_index and string in results:
+			return results.index(string)
+		return NSNotFound
+
+	def comboBox_completedString_(self, combo_box, string):
+		self.results = self.font_index.search(string) if string else None
+		combo_box.reloadData()
+		prefix_matches = self.font_index.prefix_matches(string)
+		if prefix_matches:
+			return prefix_matches[0]
+		return string
+
+
+class HTLSGlyphPicker:
+	def __init__(self, font_index, glyph_name="", callback=None, sizeStyle="regular"):
+		self.font_index = font_index
+
+		self.callback = callback
+		self.combo_box = ComboBox("auto", [], sizeStyle=sizeStyle, callback=self.combo_box_callback)
+
+		# the combo box does not hold a list of all glyph names, it reads them from the data source as needed
+		self.data_source = HTLSGlyphNameDataSource.alloc().init()
+		self.data_source.set_font_index(self.font_index)
+		ns_combo_box = self.combo_box.getNSComboBox()
+		ns_combo_box.setUsesDataSource_(True)
+		ns_combo_box.setDataSource_(self.data_source)
+
+		self.combo_box.set(glyph_name)
+
+	def combo_box_callback(self, sender):
+		# the combo box is not continuous, so this is called when a name is picked or typing ends
+		self.data_source.reset(sender.getNSComboBox())
+		if self.callback:
+			self.callback(sender)
 
 
 class HTLSGlyphView:
 	def __init__(self, parent, glyph_name, glyphs, master):
-		if glyph_name not in glyphs:
+		if glyph_name not in parent.font_index:
 			glyph_name = glyphs[0].name
 		self.parent = parent
 		self.glyphs = glyphs
@@ -23,21 +99,21 @@ class HTLSGlyphView:
 			layer=self.glyph.layers[self.master.id],
 			backgroundColor=NSColor.clearColor()
 		)
-		self.view_group.glyphSelector = ComboBox(
-			"auto",
-			[glyph.name for glyph in self.glyphs],
+		self.glyphSelector = HTLSGlyphPicker(
+			self.parent.font_index,
+			self.glyph.name,
 			callback=self.glyph_selector_callback
 		)
-		self.view_group.glyphSelector.set(self.glyph.name)
+		self.view_group.glyphSelector = self.glyphSelector.combo_box
 
 		self.view_group.originalLeftSideBearing = TextBox(
 			"auto",
-			"(%s)" % self.parent.metricsDict[self.glyph.name][self.master.id][0],
+			"(%s)" % self.parent.original_sidebearings(self.glyph.name, self.master.id)[0],
 			alignment="left"
 		)
 		self.view_group.originalRightSideBearing = TextBox(
 			"auto",
-			"(%s)" % self.parent.metricsDict[self.glyph.name][self.master.id][1],
+			"(%s)" % self.parent.original_sidebearings(self.glyph.name, self.master.id)[1],
 			alignment="right"
 		)
 		self.view_group.padding1 = Group("auto")
@@ -74,37 +150,36 @@ class HTLSGlyphView:
 		self.view_group.addAutoPosSizeRules(view_group_rules, self.parent.metrics)
 
 	def glyph_selector_callback(self, sender):
-		if sender.get() in self.glyphs:
+		if sender.get() in self.parent.font_index:
 			self.set_glyph(sender.get())
 
 	def set_glyph(self, glyph_name):
-		if glyph_name in self.glyphs:
+		if glyph_name in self.parent.font_index:
 			self.glyph = self.glyphs[glyph_name]
 		self.view_group.glyphView.layer = self.glyph.layers[self.parent.font.selectedFontMaster.id]
 		self.view_group.glyphSelector.set(self.glyph.name)
-		self.view_group.originalLeftSideBearing.set("(%s)" % self.parent.metricsDict[self.glyph.name][
-			self.master.id][0])
-		self.view_group.originalRightSideBearing.set("(%s)" % self.parent.metricsDict[self.glyph.name][
-			self.master.id][1])
+		self.view_group.originalLeftSideBearing.set(
+			"(%s)" % self.parent.original_sidebearings(self.glyph.name, self.master.id)[0]
+		)
+		self.view_group.originalRightSideBearing.set(
+			"(%s)" % self.parent.original_sidebearings(self.glyph.name, self.master.id)[1]
+		)
 		self.view_group.currentLeftSideBearing.set(self.glyph.layers[self.master.id].LSB)
 		self.view_group.currentRightSideBearing.set(self.glyph.layers[self.master.id].RSB)
 
-		# update case, category and subcategory
-		self.view_group.glyphInfo.category.set("Category: %s" % self.glyph.category)
-		self.view_group.glyphInfo.subCategory.set("Subcategory: %s" % self.glyph.subCategory)
-		self.view_group.glyphInfo.case.set("Case: %s" % self.parent.cases[self.glyph.case])
-
+		self.glyphInfo.glyph = self.glyph
 		self.glyphInfo.layer = self.glyph.layers[self.master.id]
 		self.glyphInfo.set_exception_settings()
 
 	def update_layer(self, master):
 		self.master = master
 		self.view_group.glyphView.layer = self.glyph.layers[self.master.id]
+		self.glyphInfo.layer = self.glyph.layers[self.master.id]
 		self.view_group.originalLeftSideBearing.set(
-			"(%s)" % self.parent.metricsDict[self.glyph.name][self.master.id][0]
+			"(%s)" % self.parent.original_sidebearings(self.glyph.name, self.master.id)[0]
 		)
 		self.view_group.originalRightSideBearing.set(
-			"(%s)" % self.parent.metricsDict[self.glyph.name][self.master.id][1]
+			"(%s)" % self.parent.original_sidebearings(self.glyph.name, self.master.id)[1]
 		)
 
 	def update_sidebearings(self, master):
@@ -115,7 +190,7 @@ class HTLSGlyphView:
 
 class HTLSGlyphInfo:
 	def __init__(self, parent, glyph_name, glyphs, master):
-		if glyph_name not in glyphs:
+		if glyph_name not in parent.font_index:
 			glyph_name = glyphs[0].name
 		self.parent = parent
 		self.glyphs = glyphs
@@ -164,14 +239,17 @@ class HTLSGlyphInfo:
 		self.info_group.addAutoPosSizeRules(info_rules, self.parent.metrics)
 
 	def set_exception_settings(self):
-		self.info_group.category.set("Category: %s" % self.glyph.category)
-		self.info_group.subCategory.set("Subcategory: %s" % self.glyph.subCategory)
-		self.info_group.case.set("Case: %s" % self.parent.cases[self.glyph.case])
+		category, sub_category, case = self.parent.font_index.info(self.glyph.name) or (
+			self.glyph.category, self.glyph.subCategory, self.glyph.case
+		)
+		self.info_group.category.set("Category: %s" % category)
+		self.info_group.subCategory.set("Subcategory: %s" % sub_category)
+		self.info_group.case.set("Case: %s" % self.parent.cases[case])
 
-		rule = HTLSEngine(self.layer).find_exception()
+		rule, factor = self.parent.rule_resolver.resolve(self.glyph.name, self.layer.master)
 		if rule:
 			self.info_group.referenceGlyph.set("Reference Glyph: %s" % rule["referenceGlyph"])
-			self.info_group.factor.set("Factor: %s" % float(rule["value"]))
+			self.info_group.factor.set("Factor: %s" % factor)
 		else:
 			self.info_group.referenceGlyph.set("Reference glyph: None")
 			self.info_group.factor.set("Factor: 1.0")
@@ -263,6 +341,8 @@ class HTLSParameterSlider:
 
 
 class HTLSFontRuleGroup:
+	element_keys = ["subcategory", "case", "value", "referenceGlyph", "filter", "removeButton"]
+
 	def __init__(self, parent, font_rules, category, rule_id):
 		self.font_rules = font_rules
 		self.parent = parent
@@ -280,9 +360,9 @@ class HTLSFontRuleGroup:
 		self.reference_glyph = self.current_rule["referenceGlyph"]
 		self.factor = str(round(float(self.current_rule["value"]), 2)).replace(",", ".")
 
-		if self.sub_category not in parent.sub_categories:
+		if self.sub_category not in parent.sub_categories[self.category]:
 			parent.sub_categories[self.category].append(self.sub_category)
-		if self.reference_glyph and self.reference_glyph not in parent.font.glyphs:
+		if self.reference_glyph and self.reference_glyph not in parent.font_index:
 			self.reference_glyph = "(Invalid)"
 
 		self.rule_group = Group("auto")
@@ -314,11 +394,11 @@ class HTLSFontRuleGroup:
 			"Remove rule",
 			callback=self.parent.remove_font_rule_callback
 		)
-		self.rule_group.referenceGlyph = ComboBox(
-			"auto",
-			[glyph.name for glyph in self.parent.font.glyphs],
+		self.reference_glyph_picker = HTLSGlyphPicker(
+			self.parent.font_index,
 			callback=self.parent.update_font_rule
 		)
+		self.rule_group.referenceGlyph = self.reference_glyph_picker.combo_box
 
 		self.rule_group.subcategory.setItem(self.sub_category)
 		self.rule_group.case.set(self.case)
@@ -337,19 +417,22 @@ class HTLSFontRuleGroup:
 
 		self.rule_group.addAutoPosSizeRules(group_rules, self.parent.metrics)
 
-		# add all group elements to the elements set
-		self.parent.font_rules_elements.add(self.rule_group.subcategory)
-		self.parent.font_rules_elements.add(self.rule_group.case)
-		self.parent.font_rules_elements.add(self.rule_group.value)
-		self.parent.font_rules_elements.add(self.rule_group.referenceGlyph)
-		self.parent.font_rules_elements.add(self.rule_group.filter)
-		self.parent.font_rules_elements.add(self.rule_group.removeButton)
+		# register all group elements, so the rule can be looked up from the element in the callbacks
+		self.parent.register_rule_elements(
+			self.parent.font_rules_elements,
+			self.rule_group,
+			self.element_keys,
+			self.category,
+			self.rule_id
+		)
 
 		# add the group to the rule group dictionary with ID
 		self.parent.font_rules_groups[self.rule_id] = self.rule_group
 
 
 class HTLSMasterRuleGroup:
+	element_keys = ["subcategory", "case", "value", "filter", "resetButton"]
+
 	def __init__(self, parent, font_rules, category, rule):
 		self.font_rules = font_rules
 		self.parent = parent
@@ -393,12 +476,292 @@ class HTLSMasterRuleGroup:
 
 		self.rule_group.addAutoPosSizeRules(group_rules, self.parent.metrics)
 
-		# add all group elements to the elements set
-		self.parent.master_rules_elements.add(self.rule_group.subcategory)
-		self.parent.master_rules_elements.add(self.rule_group.case)
-		self.parent.master_rules_elements.add(self.rule_group.value)
-		self.parent.master_rules_elements.add(self.rule_group.filter)
-		self.parent.master_rules_elements.add(self.rule_group.resetButton)
+		# register all group elements, so the rule can be looked up from the element in the callbacks
+		self.parent.register_rule_elements(
+			self.parent.master_rules_elements,
+			self.rule_group,
+			self.element_keys,
+			self.category,
+			self.rule
+		)
 
 		# add the group to the rule group dictionary with ID
 		self.parent.master_rules_groups[self.rule] = self.rule_group
+
+
+class HTLSImpactReport:
+	"""
+	Window listing the sidebearing changes the current parameters of a master would cause in the whole font.
+	Rows can be sorted by any column, and the selected rows applied to the font.
+	"""
+
+	def __init__(self, parent, master):
+		self.parent = parent
+		self.master = master
+
+		self.w = FloatingWindow((620, 460), "Parameter impact: %s" % self.master.name, minSize=(500, 300))
+
+		self.w.status = TextBox("auto", "Measuring glyphs...")
+		self.w.progress = ProgressBar("auto", minValue=0, maxValue=1)
+		self.w.results = List(
+			"auto",
+			[],
+			columnDescriptions=[
+				dict(title="Glyph", key="glyph"),
+				dict(title="LSB", key="LSB"),
+				dict(title="New LSB", key="newLSB"),
+				dict(title="\u0394 LSB", key="deltaLSB"),
+				dict(title="RSB", key="RSB"),
+				dict(title="New RSB", key="newRSB"),
+				dict(title="\u0394 RSB", key="deltaRSB"),
+			],
+			allowsSorting=True,
+			selectionCallback=self.selection_callback
+		)
+		self.w.cancelButton = Button("auto", "Cancel", callback=self.cancel_callback)
+		self.w.applyButton = Button("auto", "Apply selected", callback=self.apply_callback)
+		self.w.applyButton.enable(False)
+
+		rules = [
+			"H:|-margin-[status]-margin-|",
+			"H:|-margin-[progress]-margin-|",
+			"H:|-margin-[results]-margin-|",
+			"H:|-margin-[cancelButton]",
+			"H:[applyButton]-margin-|",
+			"V:|-margin-[status]-margin-[progress]-margin-[results]-margin-[cancelButton]-margin-|",
+			"V:[applyButton]-margin-|",
+		]
+
+		self.w.addAutoPosSizeRules(rules, self.parent.metrics)
+		self.w.bind("close", self.close)
+		self.w.open()
+
+		self.job = HTLSDryRun(
+			self.parent.font, self.master, self.progress_callback, self.finished_callback,
+			font_index=self.parent.font_index
+		)
+		self.w.progress.setMaxValue(max(len(self.job.layers), 1))
+		self.job.start()
+
+	def progress_callback(self, done, total):
+		self.w.progress.set(done)
+		self.w.status.set("Measuring glyphs... %s of %s" % (done, total))
+
+	def finished_callback(self, results, cancelled, diagnostics):
+		self.job = None
+		changed_results = [result for result in results if result["deltaLSB"] or result["deltaRSB"]]
+		self.w.results.set(changed_results)
+		self.w.status.set("%s%s of %s measured glyphs would change." % (
+			"Cancelled. " if cancelled else "",
+			len(changed_results),
+			len(results)
+		))
+		self.w.cancelButton.setTitle("Close")
+		diagnostics.show()
+
+	def selection_callback(self, sender):
+		self.w.applyButton.enable(self.job is None and len(sender.getSelection()) > 0)
+
+	def cancel_callback(self, sender):
+		if self.job:
+			self.job.cancel()
+		else:
+			self.w.close()
+
+	def apply_callback(self, sender):
+		# the selection indexes refer to the rows as sorted in the list
+		results = self.w.results.getArrangedObjects()
+		selected_results = [results[index] for index in self.w.results.getSelection()]
+		# glyphs edited since they were measured would get sidebearings computed for their old outlines
+		sidebearings = []
+		stale = 0
+		for result in selected_results:
+			glyph = self.parent.font.glyphs[result["glyph"]]
+			layer = glyph.layers[self.master.id] if glyph else None
+			if not layer or layer.LSB != result["LSB"] or layer.RSB != result["RSB"]:
+				stale += 1
+				continue
+			sidebearings.append((result["glyph"], result["newLSB"], result["newRSB"]))
+		self.parent.apply_sidebearings(self.master, sidebearings)
+		if stale:
+			self.w.status.set(
+				"Applied %s glyphs, %s changed since they were measured and were left out." % (len(sidebearings), stale)
+			)
+		else:
+			self.w.status.set("Applied %s glyphs." % len(sidebearings))
+
+	def close(self, sender):
+		if self.job:
+			# the cancelled job still reports back, to a window that no longer exists
+			self.job.finished_callback = lambda results, cancelled, diagnostics: None
+			self.job.cancel()
+
+
+class HTLSDesignspaceInterpolation:
+	"""
+	Window filling the parameters of the checked masters from all other masters, by their axis coordinates. The
+	values the checked masters and the instances would get are previewed whenever the selection changes.
+	"""
+
+	def __init__(self, parent, fill_master_ids):
+		self.parent = parent
+		self.font = parent.font
+		self.masters = list(self.font.masters)
+		self.instances = [instance for instance in self.font.instances if instance.axes]
+
+		self.w = FloatingWindow((560, 380), "Interpolate parameters across all masters", minSize=(460, 260))
+		self.w.status = TextBox("auto", "")
+		self.w.rows = List(
+			"auto",
+			[],
+			columnDescriptions=[
+				dict(title="Fill", key="fill", cell=CheckBoxListCell(), width=30, editable=True),
+				dict(title="Name", key="name", editable=False),
+				dict(title="Location", key="location", editable=False),
+				dict(title="Area", key="paramArea", editable=False),
+				dict(title="Depth", key="paramDepth", editable=False),
+				dict(title="New area", key="newArea", editable=False),
+				dict(title="New depth", key="newDepth", editable=False),
+			],
+			editCallback=self.edit_callback
+		)
+		self.w.closeButton = Button("auto", "Close", callback=self.close_callback)
+		self.w.applyButton = Button("auto", "Fill checked masters", callback=self.apply_callback)
+
+		rules = [
+			"H:|-margin-[status]-margin-|",
+			"H:|-margin-[rows]-margin-|",
+			"H:|-margin-[closeButton]",
+			"H:[applyButton]-margin-|",
+			"V:|-margin-[status]-margin-[rows]-margin-[closeButton]-margin-|",
+			"V:[applyButton]-margin-|",
+		]
+
+		self.w.addAutoPosSizeRules(rules, self.parent.metrics)
+
+		self.fill = [master.id in fill_master_ids for master in self.masters]
+		# setting the rows calls the edit callback
+		self.updating = False
+		self.update()
+		self.w.open()
+
+	def master_parameters(self, master):
+		try:
+			return {parameter: int(master.customParameters[parameter]) for parameter in ["paramArea", "paramDepth"]}
+		except (TypeError, ValueError):
+			return None
+
+	def update(self):
+		# the masters that are not filled and have parameters are the sources
+		sources = []
+		for master, fill in zip(self.masters, self.fill):
+			parameters = self.master_parameters(master)
+			if not fill and parameters:
+				sources.append((list(master.axes), parameters))
+		locations = [list(master.axes) for master in self.masters] + [list(instance.axes) for instance in self.instances]
+		values = interpolate_parameters(sources, locations) or [{}] * len(locations)
+
+		rows = []
+		for index, (master, fill) in enumerate(zip(self.masters, self.fill)):
+			parameters = self.master_parameters(master) or {}
+			rows.append(dict(
+				fill=fill,
+				name=master.name,
+				location=", ".join("%g" % value for value in master.axes),
+				paramArea=parameters.get("paramArea", ""),
+				paramDepth=parameters.get("paramDepth", ""),
+				newArea=values[index].get("paramArea", "") if fill else "",
+				newDepth=values[index].get("paramDepth", "") if fill else "",
+			))
+		for index, instance in enumerate(self.instances, len(self.masters)):
+			# instances have no parameters of their own, their values are only shown
+			rows.append(dict(
+				fill=False,
+				name="%s (instance)" % instance.name,
+				location=", ".join("%g" % value for value in instance.axes),
+				paramArea="",
+				paramDepth="",
+				newArea=values[index].get("paramArea", ""),
+				newDepth=values[index].get("paramDepth", ""),
+			))
+
+		self.updating = True
+		self.w.rows.set(rows)
+		self.updating = False
+		if not sources:
+			self.w.status.set("Leave at least one master with parameters unchecked to interpolate from.")
+		else:
+			self.w.status.set("Interpolating from %s masters." % len(sources))
+		self.w.applyButton.enable(bool(sources) and any(self.fill))
+
+	def edit_callback(self, sender):
+		if self.updating:
+			return
+		rows = sender.get()
+		fill = [bool(row["fill"]) for row in rows[:len(self.masters)]]
+		if fill != self.fill or any(row["fill"] for row in rows[len(self.masters):]):
+			self.fill = fill
+			self.update()
+
+	def apply_callback(self, sender):
+		rows = self.w.rows.get()
+		filled = []
+		for master, fill, row in zip(self.masters, self.fill, rows):
+			if fill and row["newArea"] != "":
+				master.customParameters["paramArea"] = int(row["newArea"])
+				master.customParameters["paramDepth"] = int(row["newDepth"])
+				filled.append(master.id)
+		self.parent.parameters_filled(filled)
+		self.fill = [False] * len(self.masters)
+		self.update()
+		self.w.status.set("Filled %s masters." % len(filled))
+
+	def close_callback(self, sender):
+		self.w.close()
+
+
+class HTLSSpacingProgress:
+	"""
+	Progress window for a spacing job, with an estimate of the remaining time and a cancel button.
+	"""
+
+	def __init__(self, font, layers, title="Spacing", trace_level=TRACE_OFF, profiler=None):
+		self.w = FloatingWindow((360, 110), title)
+		self.w.status = TextBox((10, 10, -10, 34), "Spacing %s layers..." % len(layers))
+		self.w.progress = ProgressBar((10, 48, -10, 16), minValue=0, maxValue=max(len(layers), 1))
+		self.w.cancelButton = Button((-100, -30, -10, 20), "Cancel", callback=self.cancel_callback)
+		self.w.bind("close", self.close)
+		self.w.open()
+
+		self.job = HTLSSpacingJob(
+			font, layers, self.progress_callback, self.finished_callback, trace_level=trace_level, profiler=profiler
+		)
+		self.job.start()
+
+	def progress_callback(self, done, total, eta):
+		self.w.progress.set(done)
+		if eta is None:
+			self.w.status.set("Spacing layer %s of %s..." % (done, total))
+		else:
+			self.w.status.set("Spacing layer %s of %s, about %d s left..." % (done, total, round(eta)))
+
+	def finished_callback(self, summary, diagnostics):
+		self.job = None
+		text = format_summary(summary)
+		print(text)
+		self.w.status.set(text.splitlines()[0])
+		self.w.cancelButton.setTitle("Close")
+		diagnostics.show()
+
+	def cancel_callback(self, sender):
+		if self.job:
+			self.job.cancel()
+		else:
+			self.w.close()
+
+	def close(self, sender):
+		if self.job:
+			# the cancelled job still reports back, to a window that no longer exists
+			self.job.progress_callback = lambda done, total, eta: None
+			self.job.finished_callback = lambda summary, diagnostics: print(format_summary(summary))
+			self.job.cancel()
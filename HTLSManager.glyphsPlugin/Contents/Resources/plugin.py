@@ -9,11 +9,14 @@ from GlyphsApp import Glyphs, GLYPH_MENU, UPDATEINTERFACE, Message, AskString, G
 from GlyphsApp.plugins import GeneralPlugin
 from GlyphsApp.UI import GlyphView
 
-from vanilla import FloatingWindow, Tabs, TextBox, HelpButton, Group, PopUpButton, ActionButton, Button, VerticalStackView, HorizontalLine, CheckBox, EditText, ComboBox, Popover, Sheet, dialogs
+from vanilla import FloatingWindow, Tabs, TextBox, HelpButton, Group, PopUpButton, ActionButton, Button, VerticalStackView, HorizontalLine, CheckBox, EditText, Popover, Sheet, dialogs
 
-from HTLSManagerUIElements import HTLSFontRuleGroup, HTLSMasterRuleGroup, HTLSParameterSlider, HTLSGlyphView, HTLSGlyphInfo
+from HTLSManagerUIElements import HTLSFontRuleGroup, HTLSMasterRuleGroup, HTLSParameterSlider, HTLSGlyphView, HTLSGlyphInfo, \
+	HTLSGlyphPicker, HTLSImpactReport, HTLSDesignspaceInterpolation
 from HTLSConfigConverter import convert_config_to_dict, convert_dict_to_config
-from HTLSLibrary import HTLSEngine, read_config
+from HTLSLibrary import HTLSEngine, HTLSDiagnostics, HTLSRuleIndex, HTLSRuleResolver, HTLSParameterFit, read_config, \
+	set_sidebearings, format_fit
+from HTLSFontIndex import HTLSFontIndex
 
 
 # TODO: Fixed width option in rules?
@@ -67,24 +70,30 @@ class HTLSManager(GeneralPlugin):
 				"paramDepth": paramDepth,
 			}
 
-		self.metricsDict = {
-			glyph.name: {
-				layer.associatedMasterId: [int(layer.LSB), int(layer.RSB)] for layer in glyph.layers if
-				layer.isMasterLayer
-			} for glyph in self.font.glyphs
-		}
+		# original sidebearings of every glyph, taken when the window opens, before anything can change them. Master
+		# layers are looked up by ID instead of going through all layers of every glyph
+		master_ids = [master.id for master in self.font.masters]
+		self.metricsDict = {}
+		for glyph in self.font.glyphs:
+			glyph_layers = glyph.layers
+			self.metricsDict[glyph.name] = {}
+			for master_id in master_ids:
+				layer = glyph_layers[master_id]
+				if layer:
+					self.metricsDict[glyph.name][master_id] = [int(layer.LSB), int(layer.RSB)]
 
 		# Make a list of all categories of the glyphs in the font
 		self.categories = ["Letter", "Number", "Punctuation", "Symbol", "Mark"]
 
+		# index name, category, subcategory and case of all glyphs in the font in one pass
+		self.font_index = HTLSFontIndex(self.font, self.categories)
+		# resolves the rule and factor of a glyph for the glyph info groups
+		self.rule_resolver = HTLSRuleResolver(self.font, self.font_index)
+
 		# Make a list of all subcategories of the glyphs in the font
-		self.sub_categories = {}
-		for category in self.categories:
-			self.sub_categories[category] = ["Any"]
-			for glyph in self.font.glyphs:
-				if glyph.category == category:
-					if glyph.subCategory and glyph.subCategory not in self.sub_categories[category]:
-						self.sub_categories[category].append(glyph.subCategory)
+		self.sub_categories = {
+			category: ["Any"] + self.font_index.sub_categories[category] for category in self.categories
+		}
 
 		# Make a list of all cases
 		self.cases = ["Any", "Uppercase", "Lowercase", "Smallcaps", "Minor", "Other"]
@@ -93,11 +102,14 @@ class HTLSManager(GeneralPlugin):
 		# for every category, dictionary with keys: subcategory, case, value, referenceGlyph, filter
 		self.font_rules = read_config(self.font)
 
-		# add a default value for area and depth to every master if not present
+		# add a default value for area and depth to every master if not present, and remember those masters, so they
+		# can be filled by interpolation
+		self.unset_parameter_masters = set()
 		for master in self.font.masters:
 			for parameter in self.parameters_dict[master.id]:
 				if parameter not in master.customParameters:
 					master.customParameters[parameter] = self.parameters_dict[master.id][parameter]
+					self.unset_parameter_masters.add(master.id)
 
 		self.default_profile = {
 			"Letter": {
@@ -186,6 +198,62 @@ class HTLSManager(GeneralPlugin):
 		self.parametersTab = self.w.tabs[2]
 		self.glyphInspectorTab = self.w.tabs[3]
 
+		self.built_tabs = set()
+
+		self.font_rules_groups = {}
+		# key: rule group element, value: (category, rule ID, key) of the element
+		self.font_rules_elements = {}
+
+		self.master_rules_groups = {}
+		self.master_rules_elements = {}
+		# key: category, value: master rules tab of the category, once built
+		self.master_rules_category_groups = {}
+
+		self.leftGlyphView = None
+		self.rightGlyphView = None
+		self.InspectorTabGlyphInfo = None
+
+		# the state of the font seen by the last interface update
+		self.last_selection_state = None
+		self.last_selected_glyphs = None
+		self.last_parameters_state = None
+
+		rules = [
+			"H:|-margin-[tabs]-margin-|",
+			"V:|-margin-[tabs]-margin-|",
+		]
+
+		# the contents of every tab are only built once the tab is first shown
+		self.load_preferences()
+		self.switch_tabs(None, self.w.tabs.get())
+
+		self.w.addAutoPosSizeRules(rules, self.metrics)
+		self.w.open()
+		self.w.makeKey()
+		self.w.bind("close", self.close)
+		self.w.bind("became key", self.window_became_key)
+
+		Glyphs.addCallback(self.ui_update, UPDATEINTERFACE)
+		# Glyphs.addCallback(self.close_window, DOCUMENTOPENED)
+		# Glyphs.addCallback(self.close_window, DOCUMENTWILLCLOSE)
+
+	@objc.python_method
+	def build_tab(self, tab_index):
+		if tab_index in self.built_tabs:
+			return
+		self.built_tabs.add(tab_index)
+
+		if tab_index == 0:
+			self.build_font_rules_tab()
+		if tab_index == 1:
+			self.build_master_rules_tab()
+		if tab_index == 2:
+			self.build_parameters_tab()
+		if tab_index == 3:
+			self.build_inspector_tab()
+
+	@objc.python_method
+	def build_font_rules_tab(self):
 		#########################
 		#                       #
 		#   Font rules tab      #
@@ -235,9 +303,6 @@ class HTLSManager(GeneralPlugin):
 
 		self.fontRulesTab.profiles.addAutoPosSizeRules(profiles_rules, self.metrics)
 
-		self.font_rules_groups = {}
-		self.font_rules_elements = set()
-
 		# add one vanilla group per category in self.categories
 		# then add a vanilla group to self.w for each category
 		for category in self.categories:
@@ -299,6 +364,8 @@ class HTLSManager(GeneralPlugin):
 
 		self.check_for_conflicting_rules()
 
+	@objc.python_method
+	def build_master_rules_tab(self):
 		#########################
 		#                       #
 		#  Master rules tab     #
@@ -312,62 +379,56 @@ class HTLSManager(GeneralPlugin):
 			alignment="right"
 		)
 
-		self.master_rules_groups = {}
-		self.master_rules_elements = set()
+		# one tab per category, the rules of a category are only added once its tab is shown
+		self.masterRulesTab.categories = Tabs("auto", self.categories, callback=self.switch_master_rules_category)
 
-		# add one vanilla group per category in self.categories
-		# then add a vanilla group to self.w for each category
-		for category in self.categories:
-			category_group = Group("auto")
-			category_group.title = TextBox("auto", category)
+		master_tab_rules = [
+			"H:|-margin-[title]",
+			"H:[masterName]-margin-|",
+			"H:|-margin-[categories]-margin-|",
+			"V:|-margin-[masterName]",
+			"V:|-margin-[title]-margin-[categories]-margin-|"
+		]
 
-			stack_views = []
-			for rule in self.font_rules[category]:
-				stack_views.append(
-					dict(
-						view=HTLSMasterRuleGroup(
-							self,
-							self.font_rules,
-							category,
-							rule
-						).rule_group
-					)
-				)
+		self.masterRulesTab.addAutoPosSizeRules(master_tab_rules, self.metrics)
 
-			category_group.stackView = VerticalStackView(
-				"auto",
-				views=stack_views,
-				spacing=10,
-				edgeInsets=(10, 10, 10, 10)
-			)
+		self.switch_master_rules_category(self.masterRulesTab.categories)
 
-			group_rules = [
-				"H:|-margin-[title]-margin-|",
-				"H:|-margin-[stackView]|",
-				"V:|[title][stackView]-margin-|"
-			]
+	@objc.python_method
+	def build_master_rules_category(self, category):
+		category_tab = self.masterRulesTab.categories[self.categories.index(category)]
 
-			category_group.addAutoPosSizeRules(group_rules, self.metrics)
+		stack_views = []
+		for rule in self.font_rules[category]:
+			stack_views.append(
+				dict(
+					view=HTLSMasterRuleGroup(
+						self,
+						self.font_rules,
+						category,
+						rule
+					).rule_group
+				)
+			)
 
-			setattr(self.masterRulesTab, category, category_group)
+		category_tab.stackView = VerticalStackView(
+			"auto",
+			views=stack_views,
+			spacing=10,
+			edgeInsets=(10, 10, 10, 10)
+		)
 
-		font_tab_rules = [
-			"H:|-margin-[title]",
-			"H:[masterName]-margin-|",
-			"V:|-margin-[masterName]"
+		category_rules = [
+			"H:|-margin-[stackView]-margin-|",
+			"V:|-margin-[stackView]-margin-|"
 		]
 
-		# for each category group, add a rule to the font_tab_rules list
-		for category in self.categories:
-			font_tab_rules.append("H:|-margin-[%s]-margin-|" % category)
+		category_tab.addAutoPosSizeRules(category_rules, self.metrics)
 
-		# make a vertical rule combining all category groups
-		font_tab_rules.append(
-			"V:|-margin-[title]-margin-[%s]-margin-|" % "]-margin-[".join(self.categories)
-		)
-
-		self.masterRulesTab.addAutoPosSizeRules(font_tab_rules, self.metrics)
+		self.master_rules_category_groups[category] = category_tab
 
+	@objc.python_method
+	def build_parameters_tab(self):
 		#########################
 		#                       #
 		#    Parameters tab     #
@@ -419,9 +480,19 @@ class HTLSManager(GeneralPlugin):
 		self.parametersTab.divider = HorizontalLine("auto")
 
 		# add two HTLS glyph views to the Parameters tab
-		self.leftGlyphView = HTLSGlyphView(self, "n", self.font.glyphs, self.font.selectedFontMaster)
+		self.leftGlyphView = HTLSGlyphView(
+			self,
+			Glyphs.defaults["com.eweracs.HTLSManager.leftGlyph"] or "n",
+			self.font.glyphs,
+			self.font.selectedFontMaster
+		)
 		self.parametersTab.leftGlyphView = self.leftGlyphView.view_group
-		self.rightGlyphView = HTLSGlyphView(self, "o", self.font.glyphs, self.font.selectedFontMaster)
+		self.rightGlyphView = HTLSGlyphView(
+			self,
+			Glyphs.defaults["com.eweracs.HTLSManager.rightGlyph"] or "o",
+			self.font.glyphs,
+			self.font.selectedFontMaster
+		)
 		self.parametersTab.rightGlyphView = self.rightGlyphView.view_group
 
 		# add a checkbox at the botttom to toggle live preview in the current tab
@@ -449,6 +520,10 @@ class HTLSManager(GeneralPlugin):
 
 		self.parametersTab.addAutoPosSizeRules(parameters_tab_rules, self.metrics)
 
+		self.w.setDefaultButton(self.parametersTab.saveParameters)
+
+	@objc.python_method
+	def build_inspector_tab(self):
 		#########################
 		#                       #
 		#    Inspector tab      #
@@ -476,6 +551,12 @@ class HTLSManager(GeneralPlugin):
 		self.glyphInspectorTab.inspector.paddingTop = Group("auto")
 		self.glyphInspectorTab.inspector.paddingBottom = Group("auto")
 		self.glyphInspectorTab.inspector.glyphInfo = self.InspectorTabGlyphInfo.info_group
+		self.glyphInspectorTab.inspector.fitFactor = Button(
+			"auto",
+			"Fit rule factor to selection",
+			sizeStyle="small",
+			callback=self.fit_factor_callback
+		)
 		self.glyphInspectorTab.inspector.addRule = Group("auto")
 		self.glyphInspectorTab.inspector.addRule.title = TextBox("auto", "Add rule")
 		self.glyphInspectorTab.inspector.addRule.subCategory = Group("auto")
@@ -502,12 +583,12 @@ class HTLSManager(GeneralPlugin):
 			"Reference glyph",
 			sizeStyle="small"
 		)
-		self.glyphInspectorTab.inspector.addRule.referenceGlyph.select = ComboBox(
-			"auto",
-			[glyph.name for glyph in self.font.glyphs],
-			sizeStyle="small",
-			callback=self.check_reference_glyph
+		self.inspector_reference_glyph_picker = HTLSGlyphPicker(
+			self.font_index,
+			callback=self.check_reference_glyph,
+			sizeStyle="small"
 		)
+		self.glyphInspectorTab.inspector.addRule.referenceGlyph.select = self.inspector_reference_glyph_picker.combo_box
 		self.glyphInspectorTab.inspector.addRule.factor = Group("auto")
 		self.glyphInspectorTab.inspector.addRule.factor.title = TextBox("auto", "Factor", sizeStyle="small")
 		self.glyphInspectorTab.inspector.addRule.factor.select = EditText(
@@ -556,12 +637,13 @@ class HTLSManager(GeneralPlugin):
 
 		inspector_group_rules = [
 			"H:|[glyphView(200)]-margin-[glyphInfo(200)]|",
+			"H:|[glyphView(200)]-margin-[fitFactor]",
 			"H:|[glyphView(200)]-margin-[addRule(190)]|",
 			"H:[glyphName(190)]|",
 			"H:|[infoText(200)]",
 			"V:|[glyphView]|",
 			"V:|[paddingTop]-[infoText]-[paddingBottom(==paddingTop)]|",
-			"V:|[glyphName]-margin-[glyphInfo]-margin-[addRule]|",
+			"V:|[glyphName]-margin-[glyphInfo]-margin-[fitFactor]-margin-[addRule]|",
 		]
 
 		self.glyphInspectorTab.inspector.addAutoPosSizeRules(inspector_group_rules, self.metrics)
@@ -577,27 +659,6 @@ class HTLSManager(GeneralPlugin):
 		self.glyphInspectorTab.addAutoPosSizeRules(inspector_tab_rules, self.metrics)
 		self.update_inspector_view()
 
-		################################################################################################################
-
-		rules = [
-			"H:|-margin-[tabs]-margin-|",
-			"V:|-margin-[tabs]-margin-|",
-		]
-
-		self.load_preferences()
-		self.switch_tabs(None, self.w.tabs.get())
-
-		self.w.setDefaultButton(self.parametersTab.saveParameters)
-
-		self.w.addAutoPosSizeRules(rules, self.metrics)
-		self.w.open()
-		self.w.makeKey()
-		self.w.bind("close", self.close)
-
-		Glyphs.addCallback(self.ui_update, UPDATEINTERFACE)
-		# Glyphs.addCallback(self.close_window, DOCUMENTOPENED)
-		# Glyphs.addCallback(self.close_window, DOCUMENTWILLCLOSE)
-
 	@objc.python_method
 	def font_rules_help(self, sender):
 		self.fontRulesHelpView = Popover((1, 1))
@@ -645,192 +706,355 @@ class HTLSManager(GeneralPlugin):
 				"value": factor,
 			}
 
-		# find the stack view for the category and add a font rule in the font view, and a master rule in the
-		# master view
-		getattr(self.fontRulesTab, category).stackView.appendView(
-			HTLSFontRuleGroup(self, self.font_rules, category, rule_id).rule_group
-		)
-		getattr(self.masterRulesTab, category).stackView.appendView(
-			HTLSMasterRuleGroup(self, self.font_rules, category, rule_id).rule_group
-		)
+		self.add_rule_groups(category, rule_id)
+
+		if 0 in self.built_tabs:
+			self.fontRulesTab.profiles.selector.setItem("Choose...")
 
 		self.w.resize(632, 1)
 
 		self.write_font_rules()
 
-		self.fontRulesTab.profiles.selector.setItem("Choose...")
-
-		self.leftGlyphView.glyphInfo.set_exception_settings()
-		self.rightGlyphView.glyphInfo.set_exception_settings()
-		self.InspectorTabGlyphInfo.set_exception_settings()
+		self.update_exception_settings()
 
 		self.check_for_conflicting_rules()
 
 	@objc.python_method
 	def remove_font_rule_callback(self, sender):
-		for category in self.categories:
-			for rule in list(self.font_rules[category]):
-				if self.font_rules_groups[rule].removeButton == sender:
-					self.remove_font_rule(category, rule)
+		if sender in self.font_rules_elements:
+			category, rule, _ = self.font_rules_elements[sender]
+			self.remove_font_rule(category, rule)
 
 	@objc.python_method
-	def remove_font_rule(self, category, rule_id):
-		getattr(self.fontRulesTab, category).stackView.removeView(self.font_rules_groups[rule_id])
-		getattr(self.masterRulesTab, category).stackView.removeView(self.master_rules_groups[rule_id])
+	def add_rule_groups(self, category, rule_id):
+		# find the stack view for the category and add a font rule in the font view, and a master rule in the
+		# master view, if they have been built yet
+		if 0 in self.built_tabs:
+			getattr(self.fontRulesTab, category).stackView.appendView(
+				HTLSFontRuleGroup(self, self.font_rules, category, rule_id).rule_group
+			)
+		if category in self.master_rules_category_groups:
+			self.master_rules_category_groups[category].stackView.appendView(
+				HTLSMasterRuleGroup(self, self.font_rules, category, rule_id).rule_group
+			)
+
+	@objc.python_method
+	def remove_rule_groups(self, category, rule_id):
+		if rule_id in self.font_rules_groups:
+			self.unregister_rule_elements(
+				self.font_rules_elements,
+				self.font_rules_groups[rule_id],
+				HTLSFontRuleGroup.element_keys
+			)
+			getattr(self.fontRulesTab, category).stackView.removeView(self.font_rules_groups.pop(rule_id))
+		if rule_id in self.master_rules_groups:
+			self.unregister_rule_elements(
+				self.master_rules_elements,
+				self.master_rules_groups[rule_id],
+				HTLSMasterRuleGroup.element_keys
+			)
+			self.master_rules_category_groups[category].stackView.removeView(self.master_rules_groups.pop(rule_id))
+
+	@objc.python_method
+	def register_rule_elements(self, elements, rule_group, keys, category, rule_id):
+		for key in keys:
+			elements[getattr(rule_group, key)] = (category, rule_id, key)
+
+	@objc.python_method
+	def unregister_rule_elements(self, elements, rule_group, keys):
+		for key in keys:
+			elements.pop(getattr(rule_group, key), None)
 
+	@objc.python_method
+	def remove_master_rule_value(self, rule_id):
 		if self.font.selectedFontMaster.userData["HTLSManagerMasterRules"]:
 			if rule_id in self.font.selectedFontMaster.userData["HTLSManagerMasterRules"]:
 				del self.font.selectedFontMaster.userData["HTLSManagerMasterRules"][rule_id]
 			if len(self.font.selectedFontMaster.userData["HTLSManagerMasterRules"]) == 0:
 				del self.font.selectedFontMaster.userData["HTLSManagerMasterRules"]
+
+	@objc.python_method
+	def remove_font_rule(self, category, rule_id):
+		self.remove_rule_groups(category, rule_id)
+		self.remove_master_rule_value(rule_id)
 		del self.font_rules[category][rule_id]
 
 		self.w.resize(632, 1)
 
 		self.write_font_rules()
 
-		self.leftGlyphView.glyphInfo.set_exception_settings()
-		self.rightGlyphView.glyphInfo.set_exception_settings()
-		self.InspectorTabGlyphInfo.set_exception_settings()
-		self.fontRulesTab.profiles.selector.setItem("Choose...")
+		self.update_exception_settings()
+		if 0 in self.built_tabs:
+			self.fontRulesTab.profiles.selector.setItem("Choose...")
 		self.check_for_conflicting_rules()
 
 	@objc.python_method
 	def update_font_rule(self, sender):
-		for category in self.categories:
-			for rule in self.font_rules[category]:
-				for key in self.font_rules[category][rule]:
-					if getattr(self.font_rules_groups[rule], key) == sender:
-
-						self.font_rules[category][rule][key] = sender.get()
-
-						# if the sender is the referenceGlyph, check if the glyph exists.
-						if key == "referenceGlyph":
-							if sender.get() not in self.font.glyphs and len(sender.get()) > 0:
-								Message(
-									title="Glyph not found",
-									message="The glyph %s does not exist in the font." % sender.get()
-								)
-								sender.set("")
-							self.font_rules[category][rule][key] = sender.get()
-
-						# if the sender is for the value, make sure it is a number
-						if key == "value":
-							try:
-								float(sender.get())
-							except ValueError:
-								Message(
-									title="Value must be a number",
-									message="Please only use numbers, with periods for decimal points."
-								)
-								self.font_rules[category][rule][key] = 1
-								sender.set("1")
-							getattr(self.master_rules_groups[rule], key).setPlaceholder(sender.get())
-							self.font_rules[category][rule][key] = float(sender.get())
-
-						# update the text fields in the master tab
-						if key == "subcategory":
-							self.font_rules[category][rule][key] = self.sub_categories[category][sender.get()]
-							self.master_rules_groups[rule].subcategory.set(self.sub_categories[category][sender.get()])
-						elif key == "case":
-							self.master_rules_groups[rule].case.set(self.cases[sender.get()])
-						if key == "filter":
-							getattr(self.master_rules_groups[rule], key).set(sender.get() or "Any")
-
-						break
+		# look up which rule and setting the changed field belongs to
+		if sender not in self.font_rules_elements:
+			return
+		category, rule, key = self.font_rules_elements[sender]
+
+		self.font_rules[category][rule][key] = sender.get()
+
+		# if the sender is the referenceGlyph, check if the glyph exists.
+		if key == "referenceGlyph":
+			if sender.get() not in self.font_index and len(sender.get()) > 0:
+				Message(
+					title="Glyph not found",
+					message="The glyph %s does not exist in the font." % sender.get()
+				)
+				sender.set("")
+			self.font_rules[category][rule][key] = sender.get()
+
+		# if the sender is for the value, make sure it is a number
+		if key == "value":
+			try:
+				float(sender.get())
+			except ValueError:
+				Message(
+					title="Value must be a number",
+					message="Please only use numbers, with periods for decimal points."
+				)
+				self.font_rules[category][rule][key] = 1
+				sender.set("1")
+			self.font_rules[category][rule][key] = float(sender.get())
+
+		if key == "subcategory":
+			self.font_rules[category][rule][key] = self.sub_categories[category][sender.get()]
+
+		# update the text fields in the master tab
+		if rule in self.master_rules_groups:
+			if key == "value":
+				getattr(self.master_rules_groups[rule], key).setPlaceholder(sender.get())
+			if key == "subcategory":
+				self.master_rules_groups[rule].subcategory.set(self.font_rules[category][rule][key])
+			elif key == "case":
+				self.master_rules_groups[rule].case.set(self.cases[sender.get()])
+			if key == "filter":
+				getattr(self.master_rules_groups[rule], key).set(sender.get() or "Any")
 
 		self.write_font_rules()
 
-		self.leftGlyphView.glyphInfo.set_exception_settings()
-		self.rightGlyphView.glyphInfo.set_exception_settings()
-		self.InspectorTabGlyphInfo.set_exception_settings()
+		self.update_exception_settings()
 
 		self.check_for_conflicting_rules()
 
 	@objc.python_method
 	def rebuild_font_rules(self, new_rules):
+		# reconcile the current rules with the new ones instead of rebuilding all of them: rules that are in both
+		# are kept, and the groups of rules that are no longer needed are reused for new rules, preferably for
+		# rules with the same settings. Only the groups that actually change are touched.
 		for category in self.categories:
-			for rule in list(self.font_rules[category]):
-				self.remove_font_rule(category, rule)
+			old_rules = self.font_rules[category]
+			category_rules = new_rules.get(category) or {}
+			self.font_rules[category] = {rule_id: dict(category_rules[rule_id]) for rule_id in category_rules}
+
+			removed_rules = [rule_id for rule_id in old_rules if rule_id not in self.font_rules[category]]
+			added_rules = [rule_id for rule_id in self.font_rules[category] if rule_id not in old_rules]
+			changed_rules = [
+				rule_id for rule_id in self.font_rules[category] if rule_id in old_rules
+				and self.rule_key(old_rules[rule_id]) != self.rule_key(self.font_rules[category][rule_id])
+			]
 
-		for category in self.categories:
-			for rule_id in new_rules[category]:
-				self.add_font_rule(rule_id, category, font_rules=new_rules)
+			# pair removed and added rules with the same settings first, then whatever is left
+			removed_by_key = {}
+			for rule_id in removed_rules:
+				removed_by_key.setdefault(self.rule_key(old_rules[rule_id]), []).append(rule_id)
+			reused_rules = []
+			for rule_id in list(added_rules):
+				matching_rules = removed_by_key.get(self.rule_key(self.font_rules[category][rule_id]))
+				if matching_rules:
+					reused_rules.append((matching_rules.pop(0), rule_id))
+					added_rules.remove(rule_id)
+			unmatched_rules = set(rule_id for matching_rules in removed_by_key.values() for rule_id in matching_rules)
+			removed_rules = [rule_id for rule_id in removed_rules if rule_id in unmatched_rules]
+			while removed_rules and added_rules:
+				old_rule_id, new_rule_id = removed_rules.pop(0), added_rules.pop(0)
+				reused_rules.append((old_rule_id, new_rule_id))
+				changed_rules.append(new_rule_id)
+
+			for old_rule_id, new_rule_id in reused_rules:
+				self.remove_master_rule_value(old_rule_id)
+				if old_rule_id in self.font_rules_groups:
+					self.font_rules_groups[new_rule_id] = self.font_rules_groups.pop(old_rule_id)
+					self.register_rule_elements(
+						self.font_rules_elements,
+						self.font_rules_groups[new_rule_id],
+						HTLSFontRuleGroup.element_keys,
+						category,
+						new_rule_id
+					)
+				if old_rule_id in self.master_rules_groups:
+					self.master_rules_groups[new_rule_id] = self.master_rules_groups.pop(old_rule_id)
+					self.register_rule_elements(
+						self.master_rules_elements,
+						self.master_rules_groups[new_rule_id],
+						HTLSMasterRuleGroup.element_keys,
+						category,
+						new_rule_id
+					)
+					self.update_master_rule_group_value(new_rule_id)
+
+			for rule_id in removed_rules:
+				self.remove_rule_groups(category, rule_id)
+				self.remove_master_rule_value(rule_id)
+
+			for rule_id in changed_rules:
+				self.update_rule_groups(category, rule_id)
+
+			for rule_id in added_rules:
+				self.add_rule_groups(category, rule_id)
+
+		self.w.resize(632, 1)
+
+		# write the rules once all categories are done
+		self.write_font_rules()
+
+		self.update_exception_settings()
+		self.check_for_conflicting_rules()
+
+	@objc.python_method
+	def rule_key(self, rule):
+		return (
+			rule["subcategory"],
+			int(rule["case"]),
+			rule["filter"] or "",
+			rule["referenceGlyph"] or "",
+			float(rule["value"])
+		)
+
+	@objc.python_method
+	def update_rule_groups(self, category, rule_id):
+		# set the fields of the groups of a rule to the rule's settings
+		rule = self.font_rules[category][rule_id]
+		if rule_id in self.font_rules_groups:
+			if rule["subcategory"] not in self.sub_categories[category]:
+				self.sub_categories[category].append(rule["subcategory"])
+				self.font_rules_groups[rule_id].subcategory.setItems(self.sub_categories[category])
+			reference_glyph = rule["referenceGlyph"]
+			if reference_glyph and reference_glyph not in self.font_index:
+				reference_glyph = "(Invalid)"
+			self.font_rules_groups[rule_id].subcategory.setItem(rule["subcategory"])
+			self.font_rules_groups[rule_id].case.set(rule["case"])
+			self.font_rules_groups[rule_id].filter.set(rule["filter"])
+			self.font_rules_groups[rule_id].referenceGlyph.set(reference_glyph)
+			self.font_rules_groups[rule_id].value.set(str(round(float(rule["value"]), 2)).replace(",", "."))
+		if rule_id in self.master_rules_groups:
+			self.master_rules_groups[rule_id].subcategory.set(rule["subcategory"])
+			self.master_rules_groups[rule_id].case.set(self.cases[rule["case"]])
+			self.master_rules_groups[rule_id].filter.set(str(rule["filter"] or "Any"))
+			self.master_rules_groups[rule_id].value.setPlaceholder(str(round(float(rule["value"]), 2)).replace(",", "."))
+
+	@objc.python_method
+	def update_master_rule_group_value(self, rule_id):
+		# show the current master's value for the rule, if there is one
+		master_rules = self.font.selectedFontMaster.userData["HTLSManagerMasterRules"]
+		if master_rules and rule_id in master_rules:
+			self.master_rules_groups[rule_id].value.set(str(master_rules[rule_id]).replace(",", "."))
+			self.master_rules_groups[rule_id].resetButton.enable(True)
+		else:
+			self.master_rules_groups[rule_id].value.set("")
+			self.master_rules_groups[rule_id].resetButton.enable(False)
 
 	@objc.python_method
 	def update_master_rule(self, sender):
+		if sender not in self.master_rules_elements:
+			return
+		_, rule, _ = self.master_rules_elements[sender]
+
 		if not self.font.selectedFontMaster.userData["HTLSManagerMasterRules"]:
 			self.font.selectedFontMaster.userData["HTLSManagerMasterRules"] = {}
-		for rule in self.master_rules_groups:
-			if self.master_rules_groups[rule].value == sender:
-				if sender.get() != "":
-					try:
-						float(sender.get())
-					except ValueError:
-						Message(
-							title="Value must be a number",
-							message="Please only use numbers, with periods for decimal points."
-						)
-						sender.set("1")
-					self.font.selectedFontMaster.userData["HTLSManagerMasterRules"][rule] = sender.get()
-					# enable the reset button
-					self.master_rules_groups[rule].resetButton.enable(True)
-				else:
-					del self.font.selectedFontMaster.userData["HTLSManagerMasterRules"][rule]
-					# disable the reset button
-					self.master_rules_groups[rule].resetButton.enable(False)
-				break
+		if sender.get() != "":
+			try:
+				float(sender.get())
+			except ValueError:
+				Message(
+					title="Value must be a number",
+					message="Please only use numbers, with periods for decimal points."
+				)
+				sender.set("1")
+			self.font.selectedFontMaster.userData["HTLSManagerMasterRules"][rule] = sender.get()
+			# enable the reset button
+			self.master_rules_groups[rule].resetButton.enable(True)
+		else:
+			del self.font.selectedFontMaster.userData["HTLSManagerMasterRules"][rule]
+			# disable the reset button
+			self.master_rules_groups[rule].resetButton.enable(False)
 
-		self.leftGlyphView.glyphInfo.set_exception_settings()
-		self.rightGlyphView.glyphInfo.set_exception_settings()
-		self.InspectorTabGlyphInfo.set_exception_settings()
+		self.rule_resolver.invalidate()
+		self.update_exception_settings()
 
 	@objc.python_method
 	def reset_master_rule(self, sender):
-		for rule in self.master_rules_groups:
-			if self.master_rules_groups[rule].resetButton == sender:
-				self.master_rules_groups[rule].value.set("")
-				self.master_rules_groups[rule].resetButton.enable(False)
-				# remove the entry from the master's user data
-				del self.font.selectedFontMaster.userData["HTLSManagerMasterRules"][rule]
-				break
+		if sender not in self.master_rules_elements:
+			return
+		_, rule, _ = self.master_rules_elements[sender]
+
+		self.master_rules_groups[rule].value.set("")
+		self.master_rules_groups[rule].resetButton.enable(False)
+		# remove the entry from the master's user data
+		del self.font.selectedFontMaster.userData["HTLSManagerMasterRules"][rule]
 
-		self.leftGlyphView.glyphInfo.set_exception_settings()
-		self.rightGlyphView.glyphInfo.set_exception_settings()
-		self.InspectorTabGlyphInfo.set_exception_settings()
+		self.rule_resolver.invalidate()
+		self.update_exception_settings()
+
+	@objc.python_method
+	def update_exception_settings(self):
+		# update the rule info of all glyph info groups that have been built
+		if self.leftGlyphView:
+			self.leftGlyphView.glyphInfo.set_exception_settings()
+		if self.rightGlyphView:
+			self.rightGlyphView.glyphInfo.set_exception_settings()
+		if self.InspectorTabGlyphInfo:
+			self.InspectorTabGlyphInfo.set_exception_settings()
 
 	@objc.python_method
 	def write_font_rules(self):
 		self.font.userData["com.eweracs.HTLSManager.fontRules"] = self.font_rules
+		self.rule_resolver.invalidate()
 
 	@objc.python_method
 	def check_for_conflicting_rules(self):
-		for category in self.categories:
-			for source_rule_id in self.font_rules[category]:
-				source_rule = self.font_rules[category][source_rule_id]
-				for compare_rule_id in self.font_rules[category]:
-					compare_rule = self.font_rules[category][compare_rule_id]
-					if source_rule_id != compare_rule_id \
-						and source_rule["subcategory"] == compare_rule["subcategory"] \
-						and source_rule["case"] == compare_rule["case"] \
-						and source_rule["filter"] == compare_rule["filter"]:
-
-						conflict_text = "Conflicting rules in category %s: Subcategory: %s, case: %s, filter: %s" % (
-							category,
-							source_rule["subcategory"],
-							self.cases[source_rule["case"]],
-							source_rule["filter"] or "None"
-						)
-
-						self.fontRulesTab.conflictCheckText.set(conflict_text)
-						return False, conflict_text
+		if 0 not in self.built_tabs:
+			return
+		rule_index = HTLSRuleIndex(self.font_rules)
+
+		conflicts = rule_index.conflicts()
+
+		report = []
+		for category, subcategory, case, rule_filter, rule_ids in conflicts:
+			report.append("Conflicting rules in category %s: Subcategory: %s, case: %s, filter: %s" % (
+				category,
+				subcategory,
+				self.cases[case],
+				rule_filter or "None"
+			))
+		conflicting_rules = set(rule_id for conflict in conflicts for rule_id in conflict[4][1:])
+
+		# rules that no glyph in the font resolves to, leaving out the conflicting rules reported above
+		for category, rule_id in rule_index.unused_rules(self.font_index.groups()):
+			if rule_id in conflicting_rules:
+				continue
+			rule = self.font_rules[category][rule_id]
+			report.append("Rule never used in category %s: Subcategory: %s, case: %s, filter: %s" % (
+				category,
+				rule["subcategory"],
+				self.cases[rule["case"]],
+				rule["filter"] or "None"
+			))
+
+		if report:
+			conflict_text = "\n".join(report)
+			self.fontRulesTab.conflictCheckText.set(conflict_text)
+			return False, conflict_text
 
 		self.fontRulesTab.conflictCheckText.set("No conflicting rules detected.")
 		return True, None
 
 	@objc.python_method
 	def check_reference_glyph(self, sender):
-		if sender.get() not in self.font.glyphs and len(sender.get()) > 0:
+		if sender.get() not in self.font_index and len(sender.get()) > 0:
 			Message(
 				title="Glyph not found",
 				message="The glyph %s does not exist in the font." % sender.get()
@@ -1013,6 +1237,23 @@ class HTLSManager(GeneralPlugin):
 		self.apply_parameters_to_selection()
 		self.close_interpolation_sheet()
 
+	@objc.python_method
+	def designspace_interpolation_callback(self, sender):
+		if len(self.font.masters) < 2:
+			Message(title="Two masters needed", message="Interpolating parameters needs at least two masters.")
+			return
+		# masters without parameters of their own are filled, or the selected master if all have parameters
+		fill_master_ids = set(self.unset_parameter_masters) or {self.font.selectedFontMaster.id}
+		self.designspace_interpolation = HTLSDesignspaceInterpolation(self, fill_master_ids)
+
+	@objc.python_method
+	def parameters_filled(self, master_ids):
+		# called when the parameters of masters were set from other masters
+		self.unset_parameter_masters -= set(master_ids)
+		if self.currentMasterID in master_ids:
+			self.update_parameter_ui()
+			self.apply_parameters_to_selection()
+
 	@objc.python_method
 	def close_interpolation_sheet(self, sender=None):
 		self.interpolation_sheet.close()
@@ -1022,6 +1263,7 @@ class HTLSManager(GeneralPlugin):
 	def switch_tabs(self, sender, tab_index=None):
 		if not tab_index and sender:
 			tab_index = sender.get() or 0
+		self.build_tab(tab_index)
 		if tab_index == 0:
 			self.w.resize(632, 1)
 		if tab_index == 1:
@@ -1029,59 +1271,128 @@ class HTLSManager(GeneralPlugin):
 		if tab_index == 2:
 			self.w.resize(1, 1)
 		if tab_index == 3:
+			self.last_selection_state = self.selection_state()
 			self.update_inspector_view()
 
+	@objc.python_method
+	def switch_master_rules_category(self, sender):
+		category = self.categories[sender.get()]
+		if category not in self.master_rules_category_groups:
+			self.build_master_rules_category(category)
+		self.w.resize(522, 1)
+
+	@objc.python_method
+	def refresh_font_index(self, full=False, glyphs=None):
+		# with glyphs, only those are re-read instead of the whole font
+		changed = self.font_index.refresh_glyphs(glyphs) if glyphs is not None else self.font_index.refresh(full)
+		if changed:
+			self.rule_resolver.invalidate()
+			self.update_sub_categories()
+			self.update_exception_settings()
+
+	@objc.python_method
+	def window_became_key(self, sender):
+		# glyph info may have been changed by scripts or Update Glyph Info while the window was in the background
+		self.refresh_font_index(full=True)
+
 	@objc.python_method
 	def ui_update(self, sender):
 		# check if the font was switched
 		# if self.font != Glyphs.font:
 		# 	self.w.close()
 		# 	return
+		# only refresh what depends on something that has changed since the last call
+		selection_state = self.selection_state()
+		selection_changed = selection_state != self.last_selection_state
+		self.last_selection_state = selection_state
+
+		# pick up glyphs that were added or removed in the whole font, and renamed or recategorised among the selected,
+		# editing the outlines of the selected glyphs does not change the index
+		selected_glyphs = self.selected_glyphs_state()
+		if len(self.font.glyphs) != len(self.font_index):
+			self.refresh_font_index()
+		elif selected_glyphs != self.last_selected_glyphs:
+			self.refresh_font_index(glyphs=set(layer.parent for layer in self.font.selectedLayers or []))
+		self.last_selected_glyphs = selected_glyphs
+
 		# check if the master was switched
 		if self.currentMasterID != self.font.selectedFontMaster.id:
 			self.currentMasterID = self.font.selectedFontMaster.id
 
 			# update the master name in the master rules and parameters tab title
-			self.masterRulesTab.masterName.set("Master: %s" % self.font.selectedFontMaster.name)
-			self.parametersTab.masterName.set("Master: %s" % self.font.selectedFontMaster.name)
-
-			self.parametersTab.masterOptions.setItems(self.action_button_items())
-			self.update_parameter_ui()
-			self.leftGlyphView.glyphInfo.set_exception_settings()
-			self.rightGlyphView.glyphInfo.set_exception_settings()
-			self.InspectorTabGlyphInfo.set_exception_settings()
-
-			# read the current master's user data and update all fields in the master rules tab accordingly
-			for category in self.categories:
-				for rule in self.font_rules[category]:
-					for key in self.font_rules[category][rule]:
-						if key == "value":
-							getattr(self.master_rules_groups[rule], key).set(
-								self.font_rules[category][rule][key]
-							)
-					if self.font.selectedFontMaster.userData["HTLSManagerMasterRules"]:
-						if rule in self.font.selectedFontMaster.userData["HTLSManagerMasterRules"]:
-							getattr(self.master_rules_groups[rule], "value").set(
-								self.font.selectedFontMaster.userData["HTLSManagerMasterRules"][rule]
-							)
-							# enable the reset button
-							self.master_rules_groups[rule].resetButton.enable(True)
-						else:
-							getattr(self.master_rules_groups[rule], "value").set("")
-							# disable the reset button
-							self.master_rules_groups[rule].resetButton.enable(False)
-					else:
-						getattr(self.master_rules_groups[rule], "value").set("")
-						# disable the reset button
-						self.master_rules_groups[rule].resetButton.enable(False)
-
-		# if the parameters tab is open, update the LSB and RSB on the parameters
+			if 1 in self.built_tabs:
+				self.masterRulesTab.masterName.set("Master: %s" % self.font.selectedFontMaster.name)
+			if 2 in self.built_tabs:
+				self.parametersTab.masterName.set("Master: %s" % self.font.selectedFontMaster.name)
+				self.parametersTab.masterOptions.setItems(self.action_button_items())
+				self.update_parameter_ui()
+			self.update_exception_settings()
+
+			# read the current master's user data and update the fields in the master rules tab that differ
+			master_rules = self.font.selectedFontMaster.userData["HTLSManagerMasterRules"] or {}
+			for rule in self.master_rules_groups:
+				value = str(master_rules[rule]).replace(",", ".") if rule in master_rules else ""
+				if self.master_rules_groups[rule].value.get() != value:
+					self.update_master_rule_group_value(rule)
+
+		# if the parameters tab is open, update the LSB and RSB on the parameters when either glyph has changed
 		if self.w.tabs.get() == 2:
-			self.leftGlyphView.update_sidebearings(self.font.selectedFontMaster)
-			self.rightGlyphView.update_sidebearings(self.font.selectedFontMaster)
-		if self.w.tabs.get() == 3:
+			parameters_state = self.parameters_state()
+			if parameters_state != self.last_parameters_state:
+				self.last_parameters_state = parameters_state
+				self.leftGlyphView.update_sidebearings(self.font.selectedFontMaster)
+				self.rightGlyphView.update_sidebearings(self.font.selectedFontMaster)
+		if self.w.tabs.get() == 3 and selection_changed:
 			self.update_inspector_view()
 
+	@objc.python_method
+	def selected_glyphs_state(self):
+		# a single selected layer, or the number of selected layers and the first and last glyph
+		selected_layers = self.font.selectedLayers or []
+		if len(selected_layers) == 1:
+			layer = selected_layers[0]
+			return layer.parent.name, layer.layerId
+		if selected_layers:
+			return len(selected_layers), selected_layers[0].parent.name, selected_layers[-1].parent.name
+		return None
+
+	@objc.python_method
+	def selection_state(self):
+		# what the glyph inspector shows also depends on when a single selected glyph was last changed
+		selected_layers = self.font.selectedLayers or []
+		if len(selected_layers) == 1:
+			return self.selected_glyphs_state(), selected_layers[0].parent.lastChange
+		return self.selected_glyphs_state()
+
+	@objc.python_method
+	def parameters_state(self):
+		# the sidebearings in the parameters tab depend on the master and the two glyphs shown
+		return (
+			self.currentMasterID,
+			self.leftGlyphView.glyph.name,
+			self.leftGlyphView.glyph.lastChange,
+			self.rightGlyphView.glyph.name,
+			self.rightGlyphView.glyph.lastChange
+		)
+
+	@objc.python_method
+	def update_sub_categories(self):
+		# set the subcategory popups of the font rules to the subcategories in the font, and those the rules use
+		for category in self.categories:
+			sub_categories = ["Any"] + self.font_index.sub_categories[category]
+			for rule in self.font_rules[category].values():
+				if rule["subcategory"] not in sub_categories:
+					sub_categories.append(rule["subcategory"])
+			if sub_categories == self.sub_categories[category]:
+				continue
+			self.sub_categories[category] = sub_categories
+			for rule_id in self.font_rules[category]:
+				if rule_id not in self.font_rules_groups:
+					continue
+				popup = self.font_rules_groups[rule_id].subcategory
+				popup.setItems(self.sub_categories[category])
+				popup.setItem(self.font_rules[category][rule_id]["subcategory"])
+
 	@objc.python_method
 	def update_inspector_view(self):
 		if not self.font.selectedLayers:
@@ -1107,6 +1418,7 @@ class HTLSManager(GeneralPlugin):
 			self.glyphInspectorTab.inspector.addRule.factor.select.set("")
 			self.glyphInspectorTab.inspector.addRule.factor.select.enable(False)
 			self.glyphInspectorTab.inspector.addRule.addButton.enable(False)
+			self.glyphInspectorTab.inspector.fitFactor.enable(False)
 
 		elif len(self.font.selectedLayers) > 1:
 			self.glyphInspectorTab.inspector.infoText.set("Multiple layers selected")
@@ -1130,9 +1442,14 @@ class HTLSManager(GeneralPlugin):
 			self.glyphInspectorTab.inspector.addRule.factor.select.set("")
 			self.glyphInspectorTab.inspector.addRule.factor.select.enable(False)
 			self.glyphInspectorTab.inspector.addRule.addButton.enable(False)
+			# the samples for a factor fit can be several glyphs
+			self.glyphInspectorTab.inspector.fitFactor.enable(True)
 
 		elif len(self.font.selectedLayers) == 1:
 			layer = self.font.selectedLayers[0]
+			category, sub_category, case = self.font_index.info(layer.parent.name) or (
+				layer.parent.category, layer.parent.subCategory, layer.parent.case
+			)
 			self.glyphInspectorTab.inspector.infoText.set("")
 			self.glyphInspectorTab.inspector.glyphView.layer = layer
 			self.glyphInspectorTab.inspector.glyphName.set(layer.parent.name)
@@ -1143,30 +1460,32 @@ class HTLSManager(GeneralPlugin):
 			# set the add rule fields to the current layer values
 			# make a list with "Any" and the current layer's subcategory if the subcategory is not "None"
 			subcategory_list = ["Any"]
-			if layer.parent.subCategory:
-				subcategory_list.append(layer.parent.subCategory)
+			if sub_category:
+				subcategory_list.append(sub_category)
 
 			self.glyphInspectorTab.inspector.addRule.subCategory.select.setItems(subcategory_list)
-			if layer.parent.subCategory:
-				self.glyphInspectorTab.inspector.addRule.subCategory.select.setItem(layer.parent.subCategory)
+			if sub_category:
+				self.glyphInspectorTab.inspector.addRule.subCategory.select.setItem(sub_category)
 			self.glyphInspectorTab.inspector.addRule.subCategory.select.enable(True)
 			self.glyphInspectorTab.inspector.addRule.case.select.setItems(
-				["Any", self.cases[layer.parent.case]]
+				["Any", self.cases[case]]
 			)
-			self.glyphInspectorTab.inspector.addRule.case.select.setItem(self.cases[layer.parent.case])
+			self.glyphInspectorTab.inspector.addRule.case.select.setItem(self.cases[case])
 			self.glyphInspectorTab.inspector.addRule.case.select.enable(True)
 			self.glyphInspectorTab.inspector.addRule.factor.select.set(
 				self.glyphInspectorTab.inspector.glyphInfo.factor.get().replace("Factor: ", "")
 			)
 			self.glyphInspectorTab.inspector.addRule.factor.select.enable(True)
 			self.glyphInspectorTab.inspector.addRule.addButton.enable(True)
+			self.glyphInspectorTab.inspector.fitFactor.enable(True)
 
 	@objc.python_method
 	def add_font_rule_from_glyph_inspector(self, sender):
 		if not self.check_reference_glyph(self.glyphInspectorTab.inspector.addRule.referenceGlyph.select):
 			return
 		# call the add font rule method with the values selected in the addRule section of the glyph inspector
-		category = self.font.selectedLayers[0].parent.category
+		glyph = self.font.selectedLayers[0].parent
+		category = (self.font_index.info(glyph.name) or (glyph.category,))[0]
 		subcategory = self.glyphInspectorTab.inspector.addRule.subCategory.select.getItem()
 		case = self.cases.index(self.glyphInspectorTab.inspector.addRule.case.select.getItem())
 		reference_glyph = self.glyphInspectorTab.inspector.addRule.referenceGlyph.select.get()
@@ -1183,6 +1502,63 @@ class HTLSManager(GeneralPlugin):
 			factor=factor
 		)
 
+	@objc.python_method
+	def fit_factor_callback(self, sender):
+		# the selected glyphs are spaced the way they should be, the rule of the first one that has a rule is fitted
+		master = self.font.selectedFontMaster
+		glyph_names = []
+		targets = {}
+		for layer in self.font.selectedLayers or []:
+			master_layer = layer.parent.layers[master.id]
+			glyph_names.append(layer.parent.name)
+			targets[layer.parent.name] = (master_layer.LSB, master_layer.RSB)
+
+		diagnostics = HTLSDiagnostics()
+		parameter_fit = HTLSParameterFit(master, targets, diagnostics)
+		rule_id = None
+		for glyph_name in glyph_names:
+			if glyph_name in parameter_fit.profiles and parameter_fit.profiles[glyph_name].rule_id:
+				rule_id = parameter_fit.profiles[glyph_name].rule_id
+				break
+		category = None
+		for rule_category in self.categories:
+			if rule_id in self.font_rules[rule_category]:
+				category = rule_category
+		if not category:
+			diagnostics.show()
+			Message(title="No rule to fit", message="None of the selected glyphs is spaced with a rule.")
+			return
+
+		fit = parameter_fit.fit_factor(rule_id)
+		diagnostics.show()
+		if fit is None:
+			Message(
+				title="Factor not fitted",
+				message="Not enough targets: none of the selected glyphs using the rule could be measured."
+			)
+			return
+		rule = self.font_rules[category][rule_id]
+		if not dialogs.askYesNo(
+			messageText="Set the factor of the %s rule with reference glyph %s to %s?" % (
+				category, rule["referenceGlyph"] or "(none)", fit["factor"]
+			),
+			informativeText=format_fit(fit)
+		):
+			return
+
+		# the factor is changed where it comes from for this master
+		master_rules = master.userData["HTLSManagerMasterRules"]
+		if master_rules and rule_id in master_rules:
+			master_rules[rule_id] = str(fit["factor"])
+			if rule_id in self.master_rules_groups:
+				self.update_master_rule_group_value(rule_id)
+			self.rule_resolver.invalidate()
+		else:
+			self.font_rules[category][rule_id]["value"] = fit["factor"]
+			self.update_rule_groups(category, rule_id)
+			self.write_font_rules()
+		self.update_exception_settings()
+
 	@objc.python_method
 	def check_factor_is_float(self, sender):
 		try:
@@ -1200,11 +1576,84 @@ class HTLSManager(GeneralPlugin):
 					for master in self.font.masters if master is not self.font.selectedFontMaster
 				]
 			),
-			dict(title="Interpolate parameters...", callback=self.interpolate_parameters_callback)
+			dict(title="Interpolate parameters...", callback=self.interpolate_parameters_callback),
+			dict(
+				title="Interpolate parameters across all masters...",
+				callback=self.designspace_interpolation_callback
+			),
+			dict(title="Fit parameters to selected glyphs", callback=self.fit_parameters_callback),
+			"----",
+			dict(title="Preview impact on all glyphs...", callback=self.impact_report_callback)
 		]
 
 		return action_items
 
+	@objc.python_method
+	def fit_parameters_callback(self, sender):
+		# the selected glyphs are control glyphs spaced by hand, their current sidebearings are the targets
+		master = self.font.selectedFontMaster
+		targets = {}
+		for layer in self.font.selectedLayers or []:
+			master_layer = layer.parent.layers[master.id]
+			targets[layer.parent.name] = (master_layer.LSB, master_layer.RSB)
+		if not targets:
+			Message(
+				title="No glyphs selected",
+				message="Please select control glyphs spaced the way you want them, for example n, o, H and O."
+			)
+			return
+
+		diagnostics = HTLSDiagnostics()
+		fit = HTLSParameterFit(master, targets, diagnostics).fit()
+		diagnostics.show()
+		if fit is None:
+			Message(
+				title="Parameters not fitted",
+				message="Not enough targets: none of the selected glyphs could be measured with a factor other than 0."
+			)
+			return
+
+		if not dialogs.askYesNo(
+			messageText="Set area to %s and depth to %s for master %s?" % (
+				fit["paramArea"], fit["paramDepth"], master.name
+			),
+			informativeText=format_fit(fit)
+		):
+			return
+
+		master.customParameters["paramArea"] = fit["paramArea"]
+		master.customParameters["paramDepth"] = fit["paramDepth"]
+		self.update_parameter_ui()
+
+	@objc.python_method
+	def impact_report_callback(self, sender):
+		# check the parameters here, so the background measurement never has to ask
+		try:
+			int(self.font.selectedFontMaster.customParameters["paramArea"] or 400)
+			int(self.font.selectedFontMaster.customParameters["paramDepth"] or 12)
+		except:
+			Message(
+				title="Error reading master parameters",
+				message="Please only use integer values with no decimals for area and depth parameters."
+			)
+			return
+		self.impact_report = HTLSImpactReport(self, self.font.selectedFontMaster)
+
+	@objc.python_method
+	def apply_sidebearings(self, master, sidebearings):
+		# write precomputed sidebearings, a list of (glyph name, LSB, RSB), to the layers of a master
+		self.font.disableUpdateInterface()
+		try:
+			for glyph_name, layer_lsb, layer_rsb in sidebearings:
+				glyph = self.font.glyphs[glyph_name]
+				if not glyph:
+					continue
+				self.original_sidebearings(glyph_name, master.id)
+				set_sidebearings(glyph.layers[master.id], layer_lsb, layer_rsb)
+		finally:
+			self.font.enableUpdateInterface()
+		self.last_parameters_state = None
+
 	@objc.python_method
 	def toggle_reset_parameters_button(self):
 		# check whether the area and depth rules match the saved settings, only if not, enable the reset button
@@ -1225,6 +1674,16 @@ class HTLSManager(GeneralPlugin):
 	def toggle_live_preview(self, sender):
 		self.live_preview = sender.get()
 
+	@objc.python_method
+	def original_sidebearings(self, glyph_name, master_id):
+		# glyphs added or renamed after the window opened are read the first time they are needed
+		if glyph_name not in self.metricsDict:
+			self.metricsDict[glyph_name] = {
+				layer.associatedMasterId: [int(layer.LSB), int(layer.RSB)] for layer in
+				self.font.glyphs[glyph_name].layers if layer.isMasterLayer
+			}
+		return self.metricsDict[glyph_name][master_id]
+
 	@objc.python_method
 	def apply_parameters_to_selection(self):
 		# if live preview is enabled, run the HTLS engine for all glyphs in the current tab
@@ -1239,21 +1698,30 @@ class HTLSManager(GeneralPlugin):
 				if layer not in layers:
 					layers.append(layer)
 
-		for layer in layers:
-			layer_lsb, layer_rsb = HTLSEngine(layer, self).current_layer_sidebearings() or [None, None]
-			if not layer_lsb or not layer_rsb:
-				continue
+		diagnostics = HTLSDiagnostics()
+		if self.live_preview:
+			self.font.disableUpdateInterface()
+		try:
+			for layer in layers:
+				engine = HTLSEngine(layer, self, self.font_index, diagnostics)
+				layer_lsb, layer_rsb = engine.current_layer_sidebearings() or [None, None]
+				if not layer_lsb or not layer_rsb:
+					continue
+				if self.live_preview:
+					# remember the sidebearings from before the first change
+					self.original_sidebearings(layer.parent.name, self.currentMasterID)
+					set_sidebearings(layer, layer_lsb, layer_rsb)
+				if layer.parent.name == self.leftGlyphView.glyph.name:
+					self.parametersTab.leftGlyphView.currentLeftSideBearing.set(layer_lsb)
+					self.parametersTab.leftGlyphView.currentRightSideBearing.set(layer_rsb)
+				if layer.parent.name == self.rightGlyphView.glyph.name:
+					self.parametersTab.rightGlyphView.currentLeftSideBearing.set(layer_lsb)
+					self.parametersTab.rightGlyphView.currentRightSideBearing.set(layer_rsb)
+		finally:
 			if self.live_preview:
-				layer.LSB = layer_lsb
-				layer.RSB = layer_rsb
-				layer.syncMetrics()
+				self.font.enableUpdateInterface()
 				self.font.currentTab.forceRedraw()
-			if layer.parent.name == self.leftGlyphView.glyph.name:
-				self.parametersTab.leftGlyphView.currentLeftSideBearing.set(layer_lsb)
-				self.parametersTab.leftGlyphView.currentRightSideBearing.set(layer_rsb)
-			if layer.parent.name == self.rightGlyphView.glyph.name:
-				self.parametersTab.rightGlyphView.currentLeftSideBearing.set(layer_lsb)
-				self.parametersTab.rightGlyphView.currentRightSideBearing.set(layer_rsb)
+		diagnostics.show()
 
 	@objc.python_method
 	def load_profile(self, sender):
@@ -1262,8 +1730,9 @@ class HTLSManager(GeneralPlugin):
 			new_rules = self.user_profiles[profile_name]
 			self.rebuild_font_rules(new_rules)
 			self.fontRulesTab.profiles.selector.setItem(profile_name)
-			self.font_rules = new_rules
-			self.write_font_rules()
+			# respace the glyphs of the live preview with the rules of the profile, in one run with the interface off
+			if self.live_preview:
+				self.apply_parameters_to_selection()
 
 	@objc.python_method
 	def save_profile(self, sender):
@@ -1394,13 +1863,13 @@ class HTLSManager(GeneralPlugin):
 
 		new_rules = convert_config_to_dict(
 			config_file_path,
-			[glyph.name for glyph in self.font.glyphs],
+			self.font_index,
 			self.sub_categories
 		)
+		if new_rules is None:
+			return
 
 		self.rebuild_font_rules(new_rules)
-		self.font_rules = new_rules
-		self.write_font_rules()
 
 	@objc.python_method
 	def export_config_file(self, sender):
@@ -1424,24 +1893,19 @@ class HTLSManager(GeneralPlugin):
 
 	@objc.python_method
 	def load_preferences(self):
+		# the glyphs of the glyph views are read when the parameters tab is built
 		try:
 			self.w.tabs.set(Glyphs.defaults["com.eweracs.HTLSManager.tab"])
 		except:
 			pass
-		try:
-			self.leftGlyphView.set_glyph(Glyphs.defaults["com.eweracs.HTLSManager.leftGlyph"])
-		except:
-			pass
-		try:
-			self.rightGlyphView.set_glyph(Glyphs.defaults["com.eweracs.HTLSManager.rightGlyph"])
-		except:
-			pass
 
 	@objc.python_method
 	def write_preferences(self):
 		Glyphs.defaults["com.eweracs.HTLSManager.tab"] = self.w.tabs.get()
-		Glyphs.defaults["com.eweracs.HTLSManager.leftGlyph"] = self.leftGlyphView.glyph.name
-		Glyphs.defaults["com.eweracs.HTLSManager.rightGlyph"] = self.rightGlyphView.glyph.name
+		if self.leftGlyphView:
+			Glyphs.defaults["com.eweracs.HTLSManager.leftGlyph"] = self.leftGlyphView.glyph.name
+		if self.rightGlyphView:
+			Glyphs.defaults["com.eweracs.HTLSManager.rightGlyph"] = self.rightGlyphView.glyph.name
 		Glyphs.defaults["com.eweracs.HTLSManager.userProfiles"] = self.user_profiles
 
 	@objc.python_method